@@ -5,21 +5,32 @@
     "category": "Operations/Inventory",
     "author": "OCS",
     "license": "LGPL-3",
-    "depends": ["base", "web", "hr", "product"],
+    "depends": ["base", "web", "bus", "hr", "product"],
     "data": [
         "data/ir_sequence_data.xml",
         "data/transaction_type_data.xml",
+        "data/weighbridge_scale_data.xml",
+        "data/ir_cron_data.xml",
         "reports/weighbridge_transaction_report.xml",
         "views/weight_record_views.xml",
         "views/transaction_type_views.xml",
+        "views/weighbridge_scale_views.xml",
+        "views/weight_history_views.xml",
         "views/driver_views.xml",
         "views/mqtt_latest_views.xml",
         "views/weighbridge_transaction_views.xml",
+        "views/plate_lookup_views.xml",
+        "views/tonnage_report_views.xml",
+        "views/vehicle_tare_views.xml",
+        "views/transaction_export_views.xml",
+        "views/ingest_status_views.xml",
+        "views/sync_state_views.xml",
         "security/ir.model.access.csv"
     ],
     "assets": {
         "web.assets_backend": [
             "ocs_weight_master/static/src/js/mqtt_form_controller.js",
+            "ocs_weight_master/static/src/js/capture_form_controller.js",
         ],
     },
     "installable": True,
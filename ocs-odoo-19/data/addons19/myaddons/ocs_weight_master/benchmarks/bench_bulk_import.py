@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Scaling of weighbridge.transaction.bulk_create() with the number of rows.
+
+Imports synthetic historical tickets at doubling sizes and reports rows/s,
+time per row and SQL queries per row. Linear scaling shows up as a flat
+"us/row" and "queries/row" column; anything per-row (a type search, a
+voucher nextval) shows up as queries/row > 0.
+
+Every size runs in its own transaction that is rolled back, so the
+database is left as it was (sequence numbers handed out are not returned).
+Run it with Odoo importable, against a database with ocs_weight_master
+installed:
+
+    python3 benchmarks/bench_bulk_import.py -c /etc/odoo/odoo.conf -d bench --sizes 1000,2000,4000,8000,16000
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+TYPE_CODES = ("in", "out", "in_out", "visit")
+
+
+def tickets(count, seed=42):
+    rng = random.Random(seed)
+    start = datetime(2020, 1, 1)
+    rows = []
+    for i in range(count):
+        entrance = start + timedelta(minutes=7 * i)
+        entrance_weight = rng.uniform(8000.0, 42000.0)
+        rows.append({
+            "vehicle_no": "%s-%04d" % (rng.choice(("YGN", "MDY", "NPT")), rng.randint(1, 9999)),
+            "type": rng.choice(TYPE_CODES),
+            "entrance_weight": entrance_weight,
+            "exit_weight": entrance_weight - rng.uniform(0.0, 30000.0),
+            "entrance_date": entrance,
+            "exit_date": entrance + timedelta(minutes=rng.randint(5, 90)),
+            "state": "completed",
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-c", "--config", help="Odoo configuration file")
+    parser.add_argument("-d", "--database", required=True)
+    parser.add_argument("--sizes", default="1000,2000,4000,8000,16000")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    from odoo import api, SUPERUSER_ID
+    from odoo.modules.registry import Registry
+    from odoo.tools import config
+
+    config.parse_config(["-d", args.database] + (["-c", args.config] if args.config else []))
+    registry = Registry(args.database)
+
+    print(f"{'rows':>8} {'seconds':>9} {'rows/s':>9} {'us/row':>8} {'queries':>9} {'queries/row':>12}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        rows = tickets(size)
+        with registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {"tracking_disable": True})
+            Transaction = env["weighbridge.transaction"]
+            Transaction.bulk_create(rows[:10])  # warm the type and registry caches
+            queries_before = cr.sql_log_count
+            started = time.perf_counter()
+            created = Transaction.bulk_create(rows, batch_size=args.batch_size)
+            elapsed = time.perf_counter() - started
+            queries = cr.sql_log_count - queries_before
+            assert len(created) == size
+            cr.rollback()
+        print(f"{size:>8,} {elapsed:>9.2f} {size / elapsed:>9,.0f} {elapsed / size * 1e6:>8.0f} "
+              f"{queries:>9,} {queries / size:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
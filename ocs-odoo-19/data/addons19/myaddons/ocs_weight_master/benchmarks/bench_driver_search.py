@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""Latency of weighbridge.driver.name_search() on a large driver table.
+
+Inserts synthetic drivers (Burmese-style names, NRC numbers in mixed
+spellings, +95/09 phone numbers, license numbers), analyzes the table and
+times the driver autocomplete for name, NRC, phone and license fragments,
+reporting p50/p99/max per kind and the query plan of one search, which
+should show Bitmap Index Scans on the trigram indexes rather than a Seq Scan.
+
+Everything runs in one transaction that is rolled back. Run it with Odoo
+importable, against a database with ocs_weight_master installed and the
+pg_trgm extension available:
+
+    python3 benchmarks/bench_driver_search.py -c /etc/odoo/odoo.conf -d bench --drivers 50000
+"""
+import argparse
+import random
+import time
+
+SYLLABLES = ("Aung", "Kyaw", "Zaw", "Min", "Thant", "Htet", "Naing", "Soe", "Win", "Myint", "Tun", "Hla",
+             "Ko", "Maung", "Thura", "Zin", "Phyo", "Wai", "Yan", "Lin", "Oo", "Thein", "Nyein", "Khin")
+TOWNSHIPS = ("OuKaMa", "KaMaYa", "LaMaNa", "MaYaKa", "DaGaNa", "PaBaTa", "ThaKaTa", "BaHaNa")
+
+
+def drivers(count, seed=42):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        name = " ".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3)))
+        state, township, number = rng.randint(1, 14), rng.choice(TOWNSHIPS), rng.randint(100000, 999999)
+        nrc = rng.choice(("%d/%s(N)%06d", "%d/%s (N) %06d", "%d/%s(Naing)%06d")) % (state, township, number)
+        mobile = "9%09d" % rng.randint(0, 999999999)
+        phone = rng.choice(("0" + mobile, "+95 " + mobile, "+95-%s-%s" % (mobile[:4], mobile[4:])))
+        rows.append((name, nrc, phone, "%s/%05d/%02d" % (rng.choice("ABCDE"), i, rng.randint(10, 30))))
+    return rows
+
+
+def percentile(samples, pct):
+    return samples[min(int(len(samples) * pct), len(samples) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-c", "--config", help="Odoo configuration file")
+    parser.add_argument("-d", "--database", required=True)
+    parser.add_argument("--drivers", type=int, default=50000)
+    parser.add_argument("--searches", type=int, default=200, help="searches per kind")
+    parser.add_argument("--limit", type=int, default=8, help="autocomplete limit")
+    args = parser.parse_args()
+
+    from psycopg2.extras import execute_values
+
+    from odoo import api, SUPERUSER_ID
+    from odoo.modules.registry import Registry
+    from odoo.tools import config
+
+    config.parse_config(["-d", args.database] + (["-c", args.config] if args.config else []))
+    from odoo.addons.ocs_weight_master.models.driver import normalize_nrc, normalize_phone
+
+    registry = Registry(args.database)
+    rows = drivers(args.drivers)
+    rng = random.Random(7)
+    samples = [rng.choice(rows) for _ in range(args.searches)]
+    kinds = {
+        "name": [row[0].split()[0] + " " + row[0].split()[1][:2] for row in samples],
+        "nrc": [row[1].split("(")[0].strip().replace("/", " / ") + " (N) " + row[1][-6:-2] for row in samples],
+        "phone": [normalize_phone(row[2])[-6:] for row in samples],
+        "license": [row[3][:7] for row in samples],
+    }
+
+    with registry.cursor() as cr:
+        env = api.Environment(cr, SUPERUSER_ID, {})
+        Driver = env["weighbridge.driver"]
+        started = time.perf_counter()
+        execute_values(cr._obj, """
+            INSERT INTO weighbridge_driver (name, nrc, phone, license_no, nrc_key, phone_key, transaction_count)
+            VALUES %s
+        """, [(name, nrc, phone, license_no, normalize_nrc(nrc), normalize_phone(phone), 0)
+              for name, nrc, phone, license_no in rows], page_size=5000)
+        cr.execute("ANALYZE weighbridge_driver")
+        print(f"inserted {len(rows):,} drivers in {time.perf_counter() - started:.1f}s")
+
+        print(f"{'kind':<8} {'searches':>9} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'avg hits':>9}")
+        for kind, values in kinds.items():
+            timings, hits = [], 0
+            for value in values:
+                env.invalidate_all()
+                t0 = time.perf_counter()
+                hits += len(Driver.name_search(value, limit=args.limit))
+                timings.append((time.perf_counter() - t0) * 1000.0)
+            timings.sort()
+            print(f"{kind:<8} {len(values):>9} {percentile(timings, 0.5):>8.2f} {percentile(timings, 0.99):>8.2f} "
+                  f"{timings[-1]:>8.2f} {hits / len(values):>9.1f}")
+
+        value = kinds["phone"][0]
+        query = Driver._search(Driver._search_display_name("ilike", value))
+        sql = query.select("id")
+        cr.execute(b"EXPLAIN " + cr.mogrify(sql.code, sql.params))
+        print(f"\nplan for {value!r}:")
+        print("\n".join(row[0] for row in cr.fetchall()))
+        cr.rollback()
+
+
+if __name__ == "__main__":
+    main()
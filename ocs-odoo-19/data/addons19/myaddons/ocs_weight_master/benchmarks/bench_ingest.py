@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""End-to-end ingest benchmark: fake broker -> MqttWeightService -> PostgreSQL.
+
+Starts an in-process fake MQTT broker (benchmarks/fake_broker.py), loads the
+Odoo registry of a database with ocs_weight_master installed (which starts
+the MQTT service against the fake broker), replays XK3190 payloads at a fixed
+rate and reports:
+
+  * throughput: frames committed per second, publish of the first frame to
+    commit of the last
+  * p50/p99/max publish-to-commit latency, from the payload timestamp to the
+    writer commit that persisted the frame
+  * dropped frames: evicted from the ingest queue, or delivered by the broker
+    but never received
+  * DB transactions per second: writer commits, and xact_commit of the whole
+    database from pg_stat_database
+
+Run it with Odoo importable, on a dedicated database (a running Odoo server
+on the same database holds the ingest leader lock and the benchmark would
+never get it):
+
+    python3 benchmarks/bench_ingest.py -c /etc/odoo/odoo.conf -d bench \\
+        --scales 4 --rate 200 --duration 30 --burst 10
+
+``--burst N`` sends N frames per scale back to back every N/rate seconds,
+which is what a Node-RED restart or a flapping Wi-Fi link looks like.
+``--replay FILE`` replays recorded payloads (one Node-RED JSON message per
+line, e.g. from mosquitto_sub -t 'weight/#') instead of synthetic ones; their
+timestamps are rewritten to the publish time.
+``--qos 1`` runs the service with QoS 1 and a persistent session;
+``--disconnect-every S`` then cuts the connection every S seconds, and the
+report shows how many messages the broker redelivered and how many of
+those the service suppressed as duplicates.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+from bench_xk3190 import make_frame
+from fake_broker import FakeBroker
+
+
+def synthetic_payloads(seed=42):
+    """Endless Node-RED style payloads of a load that settles and drifts"""
+    rng = random.Random(seed)
+    weight = 0
+    while True:
+        weight = max(0, min(999999, weight + rng.randint(-50, 60)))
+        frame = make_frame(weight)
+        yield {"weight": weight, "raw": "%06d" % weight, "hex": frame.hex()}
+
+
+def recorded_payloads(path):
+    with open(path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    if not records:
+        sys.exit("%s holds no payloads" % path)
+    while True:
+        yield from records
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    return values[min(int(len(values) * pct), len(values) - 1)]
+
+
+def xact_commit(registry):
+    with registry.cursor() as cr:
+        cr.execute("SELECT xact_commit FROM pg_stat_database WHERE datname = current_database()")
+        return cr.fetchone()[0]
+
+
+def wait_for(predicate, timeout, interval=0.1):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(interval)
+    return predicate()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-c", "--config", help="Odoo configuration file")
+    parser.add_argument("-d", "--database", required=True)
+    parser.add_argument("--scales", type=int, default=1, help="scales publishing on weight/bench<N>")
+    parser.add_argument("--rate", type=float, default=100.0, help="frames per second per scale")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of publishing")
+    parser.add_argument("--burst", type=int, default=1, help="frames per scale sent back to back per tick")
+    parser.add_argument("--replay", help="file of recorded payloads, one JSON object per line")
+    parser.add_argument("--qos", type=int, choices=(0, 1), default=0, help="subscription QoS of the service")
+    parser.add_argument("--disconnect-every", type=float, default=0.0,
+                        help="drop the broker connections every S seconds while publishing")
+    parser.add_argument("--drain-timeout", type=float, default=60.0,
+                        help="seconds to wait for the writer to catch up after publishing")
+    args = parser.parse_args()
+
+    broker = FakeBroker().start()
+    host, port = broker.address
+    # Picked up by MqttWeightService._get_params() when the registry starts it; MQTT_INGEST=1
+    # because a script is not an ingest process by default
+    os.environ.update(MQTT_INGEST="1", MQTT_BROKER=host, MQTT_PORT=str(port), MQTT_TOPIC="weight/+",
+                      MQTT_QOS=str(args.qos))
+
+    from odoo import api, SUPERUSER_ID
+    from odoo.tools import config
+    from odoo.modules.registry import Registry
+
+    odoo_args = ["-d", args.database] + (["-c", args.config] if args.config else [])
+    config.parse_config(odoo_args)
+
+    from odoo.addons.ocs_weight_master.models.mqtt_service import MqttWeightService
+
+    total = int(args.rate * args.duration) * args.scales
+    MqttWeightService.latency_window = max(total, 1)
+    registry = Registry(args.database)  # _register_hook starts the MQTT service supervisor
+    codes = ["bench%d" % i for i in range(args.scales)]
+    with registry.cursor() as cr:
+        # Frames of unregistered scales are dropped
+        Scale = api.Environment(cr, SUPERUSER_ID, {})["weighbridge.scale"].with_context(active_test=False)
+        known = set(Scale.search([("code", "in", codes)]).mapped("code"))
+        Scale.create([{"name": code, "code": code} for code in codes if code not in known])
+    print("waiting for ingest leadership and the MQTT subscription...")
+    if not wait_for(lambda: MqttWeightService._lock_cr is not None and broker.subscribed.is_set(), 60):
+        sys.exit("MqttWeightService did not subscribe; is another Odoo process holding the leader lock?")
+    MqttWeightService._reset_stats()
+
+    topics = ["weight/%s" % code for code in codes]
+    payloads = recorded_payloads(args.replay) if args.replay else synthetic_payloads()
+    tick = args.burst / args.rate
+    ticks = max(int(args.duration / tick), 1)
+
+    commits_before = xact_commit(registry)
+    started = time.perf_counter()
+    next_drop = started + args.disconnect_every if args.disconnect_every else None
+    drops = 0
+    for n in range(ticks):
+        if next_drop and time.perf_counter() >= next_drop:
+            drops += broker.drop_connections()
+            next_drop += args.disconnect_every
+        for _ in range(args.burst):
+            for topic in topics:
+                message = dict(next(payloads), timestamp=int(time.time() * 1000))
+                broker.publish(topic, json.dumps(message))
+        delay = started + (n + 1) * tick - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    publish_elapsed = time.perf_counter() - started
+
+    # At QoS 1 every published frame must arrive once; at QoS 0 whatever the broker delivered
+    def expected():
+        return broker.published if args.qos else broker.delivered
+
+    def drained():
+        stats = MqttWeightService.stats()
+        unique = stats["received"] - stats["redelivered"]
+        return (unique >= expected() and not stats["queue_depth"]
+                and stats["history_rows"] + stats["dropped"] + stats["parse_failed"] >= unique)
+
+    caught_up = wait_for(drained, args.drain_timeout)
+    elapsed = time.perf_counter() - started
+    stats = MqttWeightService.stats()
+    commits = xact_commit(registry) - commits_before - 1  # minus our own snapshot query
+    latencies = sorted(MqttWeightService.latency_samples())
+
+    MqttWeightService.stop()
+    broker.stop()
+
+    lost = expected() - (stats["received"] - stats["redelivered"])
+    print()
+    print(f"scales x rate:     {args.scales} x {args.rate:g} frames/s, burst {args.burst}, {args.duration:g} s")
+    print(f"published:         {broker.published:,} in {publish_elapsed:.2f} s "
+          f"({broker.published / publish_elapsed:,.0f} frames/s offered)")
+    print(f"committed:         {stats['history_rows']:,} frames, {stats['written']:,} latest updates "
+          f"({stats['coalesced']:,} coalesced){'' if caught_up else '  [writer did not catch up]'}")
+    print(f"throughput:        {stats['history_rows'] / elapsed:,.0f} frames/s")
+    print(f"latency:           p50 {percentile(latencies, 0.50):.1f} ms, p99 {percentile(latencies, 0.99):.1f} ms, "
+          f"max {latencies[-1] if latencies else 0.0:.1f} ms")
+    print(f"dropped:           {stats['dropped']:,} evicted from the queue, {max(lost, 0):,} lost before the queue, "
+          f"{stats['parse_failed']:,} unparsable")
+    print(f"transactions:      {stats['transactions'] / elapsed:,.1f} writer commits/s, "
+          f"{commits / elapsed:,.1f} database commits/s (pg_stat_database)")
+    print(f"write errors:      {stats['write_errors']:,}")
+    if args.qos or drops:
+        print(f"redelivery:        {drops:,} connection(s) dropped, {broker.queued:,} frames queued while offline, "
+              f"{broker.redelivered:,} redelivered, {stats['redelivered']:,} suppressed as duplicates")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Throughput of the per-scale StabilityDetector on a synthetic truck trace.
+
+Runs without Odoo:
+
+    python3 benchmarks/bench_stability.py [--frames 1000000] [--window 10]
+
+A 12-byte XK3190-D10 frame at 9600 baud is ~1.25 ms on the wire, so one
+indicator in continuous mode tops out around 800 frames/s. The detector has
+to stay far above that per scale to be free in the ingest path.
+"""
+import argparse
+import importlib.util
+import os
+import random
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+INDICATOR_MAX_FPS = 800
+
+
+def load_stability():
+    path = os.path.join(HERE, os.pardir, "models", "stability.py")
+    spec = importlib.util.spec_from_file_location("ocs_weight_master_stability", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def truck_trace(frames, frame_ms=10, seed=42):
+    """Alternate empty deck, truck rolling on, settled load and rolling off."""
+    rng = random.Random(seed)
+    trace = []
+    ts = 1_700_000_000_000
+    load = 0.0
+    while len(trace) < frames:
+        target = rng.uniform(8000.0, 42000.0)
+        phases = (
+            (200, lambda i, n: 0.0, 2.0),                   # empty deck
+            (300, lambda i, n: target * i / n, 40.0),       # rolling on
+            (500, lambda i, n: target, 3.0),                # settled
+            (300, lambda i, n: target * (1 - i / n), 40.0),  # rolling off
+        )
+        for length, shape, noise in phases:
+            for i in range(length):
+                load = shape(i, length) + rng.gauss(0.0, noise)
+                trace.append((round(load), ts))
+                ts += frame_ms
+    return trace[:frames]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=1_000_000)
+    parser.add_argument("--window", type=int, default=10)
+    parser.add_argument("--tolerance", type=float, default=5.0)
+    parser.add_argument("--min-ms", type=int, default=500)
+    args = parser.parse_args()
+
+    stability = load_stability()
+    trace = truck_trace(args.frames)
+
+    # Baseline: the same loop without the detector
+    started = time.perf_counter()
+    for weight, ts in trace:
+        pass
+    baseline = time.perf_counter() - started
+
+    detector = stability.StabilityDetector(args.window, args.tolerance, args.min_ms)
+    add = detector.add
+    stable_frames = 0
+    transitions = 0
+    was_stable = False
+    started = time.perf_counter()
+    for weight, ts in trace:
+        is_stable = add(weight, ts)
+        stable_frames += is_stable
+        transitions += is_stable and not was_stable
+        was_stable = is_stable
+    elapsed = time.perf_counter() - started
+
+    per_frame_us = (elapsed - baseline) / len(trace) * 1e6
+    fps = len(trace) / elapsed
+    print(f"frames:            {len(trace):,}")
+    print(f"window/tolerance:  {args.window} samples / {args.tolerance} / hold {args.min_ms} ms")
+    print(f"detector time:     {elapsed:.3f} s ({per_frame_us:.2f} us/frame over the bare loop)")
+    print(f"throughput:        {fps:,.0f} frames/s ({fps / INDICATOR_MAX_FPS:,.0f}x one indicator at 9600 baud)")
+    print(f"stable frames:     {stable_frames:,} ({stable_frames / len(trace):.1%})")
+    print(f"stable periods:    {transitions:,} (expect ~2 per truck: empty deck and settled load)")
+
+
+if __name__ == "__main__":
+    main()
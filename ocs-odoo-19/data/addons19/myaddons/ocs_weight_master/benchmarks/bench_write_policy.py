@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""WAL and row churn of weight.latest with and without the scale write policy.
+
+Feeds the same trace through the ingest writer path
+(MqttWeightService._write_frames, one commit per frame as at a low frame
+rate) twice: once rewriting the latest row for every frame (heartbeat 0),
+once with the given deadband and heartbeat. For each run it reports the
+latest row updates, the WAL generated (pg_current_wal_lsn) and the
+updates/dead tuples PostgreSQL counted for weight_latest. Both runs append
+the same weight.history rows, so the WAL difference is what the policy saved.
+
+The trace is either recorded (``--replay FILE``: one Node-RED JSON message
+per line with weight and timestamp, e.g. from mosquitto_sub -t 'weight/#')
+or synthetic: an idle deck showing a steady 0 most of the time, with trucks
+rolling on, settling and rolling off, at the indicator's 10 kg division.
+
+Run it with Odoo importable, against a database with ocs_weight_master
+installed; it uses a scale with ID "bench-wal" and deletes its history rows
+afterwards:
+
+    python3 benchmarks/bench_write_policy.py -c /etc/odoo/odoo.conf -d bench \\
+        --minutes 30 --rate 10 --deadband 20 --heartbeat 10
+"""
+import argparse
+import json
+import random
+import sys
+import time
+
+SCALE_CODE = "bench-wal"
+DIVISION = 10  # kg per display step
+
+
+def synthetic_trace(minutes, rate, seed=42):
+    """(weight, epoch ms) pairs: mostly idle, a truck every few minutes"""
+    rng = random.Random(seed)
+    frames = int(minutes * 60 * rate)
+    step_ms = 1000.0 / rate
+    ts = 1_700_000_000_000
+    trace = []
+    while len(trace) < frames:
+        target = round(rng.uniform(8000.0, 42000.0) / DIVISION) * DIVISION
+        phases = (
+            (rng.uniform(120, 300), lambda f: 0),                                  # idle deck
+            (20, lambda f: round(target * f / DIVISION) * DIVISION),               # rolling on
+            (rng.uniform(30, 90), lambda f: target + DIVISION * rng.choice((-1, 0, 0, 0, 0, 1))),  # settled
+            (15, lambda f: round(target * (1 - f) / DIVISION) * DIVISION),         # rolling off
+        )
+        for seconds, shape in phases:
+            count = max(int(seconds * rate), 1)
+            for i in range(count):
+                trace.append((float(shape(i / count)), int(ts)))
+                ts += step_ms
+    return trace[:frames]
+
+
+def recorded_trace(path):
+    trace = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                message = json.loads(line)
+                trace.append((float(message.get("weight", 0)), int(message["timestamp"])))
+    if not trace:
+        sys.exit("%s holds no payloads" % path)
+    return trace
+
+
+def table_counters(cr):
+    cr.execute("SELECT n_tup_upd, n_tup_hot_upd, n_dead_tup FROM pg_stat_user_tables WHERE relname = 'weight_latest'")
+    return cr.fetchone() or (0, 0, 0)
+
+
+def flush_stats(cr):
+    """Make this backend's table counters visible (PostgreSQL 15+; older versions flush within ~1 s)"""
+    try:
+        cr.execute("SELECT pg_stat_force_next_flush()")
+        cr.commit()
+    except Exception:
+        cr.rollback()
+        time.sleep(1.0)
+    cr.execute("SELECT pg_stat_clear_snapshot()")
+
+
+def run(registry, service, frames, deadband, heartbeat):
+    from odoo import api, SUPERUSER_ID
+
+    with registry.cursor() as cr:
+        env = api.Environment(cr, SUPERUSER_ID, {})
+        Scale = env["weighbridge.scale"].with_context(active_test=False)
+        scale = Scale.search([("code", "=", SCALE_CODE)], limit=1) or Scale.create({"name": SCALE_CODE, "code": SCALE_CODE})
+        scale.write({"write_deadband": deadband, "write_heartbeat": heartbeat})
+        cr.commit()
+        service._persisted = {}
+        service._detectors = {}
+
+        flush_stats(cr)
+        before = table_counters(cr)
+        cr.execute("SELECT pg_current_wal_lsn()")
+        lsn_before = cr.fetchone()[0]
+        updates = 0
+        started = time.perf_counter()
+        for frame in frames:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            env.invalidate_all()
+            _newest, _appended, persisted = service._write_frames(env, [frame])
+            cr.commit()
+            updates += persisted
+        elapsed = time.perf_counter() - started
+        cr.execute("SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), %s)", (lsn_before,))
+        wal = int(cr.fetchone()[0])
+        flush_stats(cr)
+        after = table_counters(cr)
+
+        cr.execute("DELETE FROM weight_history WHERE scale_id = %s", (scale.id,))
+        cr.commit()
+    return {
+        "updates": updates,
+        "wal": wal,
+        "pg_updates": after[0] - before[0],
+        "hot_updates": after[1] - before[1],
+        "dead_tuples": after[2],
+        "elapsed": elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-c", "--config", help="Odoo configuration file")
+    parser.add_argument("-d", "--database", required=True)
+    parser.add_argument("--replay", help="file of recorded payloads, one JSON object per line")
+    parser.add_argument("--minutes", type=float, default=30.0, help="length of the synthetic trace")
+    parser.add_argument("--rate", type=float, default=10.0, help="frames per second of the synthetic trace")
+    parser.add_argument("--deadband", type=float, default=2 * DIVISION)
+    parser.add_argument("--heartbeat", type=int, default=10)
+    args = parser.parse_args()
+
+    from odoo.modules.registry import Registry
+    from odoo.tools import config
+
+    config.parse_config(["-d", args.database] + (["-c", args.config] if args.config else []))
+
+    from odoo.addons.ocs_weight_master.models.mqtt_service import Frame, MqttWeightService
+
+    registry = Registry(args.database)
+    MqttWeightService.stop()  # in case MQTT_INGEST=1 started it; the benchmark drives the writer path itself
+
+    trace = recorded_trace(args.replay) if args.replay else synthetic_trace(args.minutes, args.rate)
+    frames = [Frame(SCALE_CODE, weight, json.dumps({"weight": weight, "timestamp": ts}), ts / 1000.0, ts)
+              for weight, ts in trace]
+
+    results = [
+        ("every frame", run(registry, MqttWeightService, frames, 0.0, 0)),
+        ("deadband %g, heartbeat %ss" % (args.deadband, args.heartbeat),
+         run(registry, MqttWeightService, frames, args.deadband, args.heartbeat)),
+    ]
+
+    span = (trace[-1][1] - trace[0][1]) / 1000.0
+    print(f"trace: {len(frames):,} frames over {span / 60:.1f} min "
+          f"({'recorded: ' + args.replay if args.replay else 'synthetic'})")
+    print(f"{'policy':<28} {'latest writes':>14} {'WAL':>12} {'WAL/frame':>10} "
+          f"{'pg updates':>11} {'HOT':>9} {'dead tuples':>12}")
+    for label, r in results:
+        print(f"{label:<28} {r['updates']:>14,} {r['wal'] / 1024:>10,.0f} kB {r['wal'] / len(frames):>8,.0f} B "
+              f"{r['pg_updates']:>11,} {r['hot_updates']:>9,} {r['dead_tuples']:>12,}")
+    (_label, base), (_label, policy) = results
+    saved_writes = base["updates"] - policy["updates"]
+    saved_wal = base["wal"] - policy["wal"]
+    print(f"saved: {saved_writes:,} latest row writes ({saved_writes / max(base['updates'], 1):.0%}), "
+          f"{saved_wal / 1024:,.0f} kB WAL ({saved_wal / max(base['wal'], 1):.0%})"
+          + (f", ~{saved_wal / saved_writes:,.0f} B per skipped write" if saved_writes else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Throughput of the native XK3190-D10 decoder against the Node-RED JSON path.
+
+Runs without Odoo:
+
+    python3 benchmarks/bench_xk3190.py [--frames 1000000] [--chunk 64]
+
+The stream is fed in ``--chunk``-byte reads, so frames straddle read
+boundaries the way they do on a serial port. The JSON baseline only times
+``json.loads`` of the payload Node-RED would have published for the same
+frame, i.e. what on_message does before enqueueing.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import random
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+INDICATOR_MAX_FPS = 800
+
+
+def load_xk3190():
+    path = os.path.join(HERE, os.pardir, "models", "xk3190.py")
+    spec = importlib.util.spec_from_file_location("ocs_weight_master_xk3190", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_frame(weight, dp=0):
+    body = ("-" if weight < 0 else "+") + "%06d" % abs(weight) + chr(0x30 + dp)
+    xor = 0
+    for c in body.encode():
+        xor ^= c
+    return b"\x02" + body.encode() + b"%02X" % xor + b"\x03"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=1_000_000)
+    parser.add_argument("--chunk", type=int, default=64)
+    parser.add_argument("--noise", type=float, default=0.001, help="fraction of frames preceded by a garbage byte")
+    args = parser.parse_args()
+
+    xk3190 = load_xk3190()
+    rng = random.Random(42)
+    stream = bytearray()
+    payloads = []
+    for _ in range(args.frames):
+        weight = rng.randint(0, 60000)
+        if rng.random() < args.noise:
+            stream += b"\xff"
+        frame = make_frame(weight)
+        stream += frame
+        payloads.append(json.dumps({"weight": weight, "raw": "%06d" % weight, "hex": frame.hex(),
+                                    "timestamp": 1_700_000_000_000}))
+
+    view = memoryview(stream)
+    decoder = xk3190.Xk3190Decoder()
+    feed = decoder.feed
+    decoded = 0
+    started = time.perf_counter()
+    for pos in range(0, len(stream), args.chunk):
+        decoded += len(feed(view[pos:pos + args.chunk]))
+    native = time.perf_counter() - started
+    view.release()
+
+    loads = json.loads
+    started = time.perf_counter()
+    for payload in payloads:
+        float(loads(payload).get("weight", 0))
+    baseline = time.perf_counter() - started
+
+    fps = decoded / native
+    print(f"frames:            {args.frames:,} ({decoded:,} decoded, {decoder.resyncs:,} resyncs, {decoder.errors:,} rejected)")
+    print(f"native decoder:    {native:.3f} s ({native / decoded * 1e6:.2f} us/frame, {fps:,.0f} frames/s, "
+          f"{fps / INDICATOR_MAX_FPS:,.0f}x one indicator at 9600 baud)")
+    print(f"json.loads path:   {baseline:.3f} s ({baseline / len(payloads) * 1e6:.2f} us/frame)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""Just enough of an MQTT 3.1.1 broker to benchmark the ingest path locally.
+
+Accepts CONNECT, SUBSCRIBE (+ and # wildcards), PUBLISH, PUBACK, PINGREQ
+and DISCONNECT. Messages go out at the subscription's QoS (0 or 1). A
+client connecting without a clean session keeps its subscriptions and
+gets what was published while it was away, plus its unacknowledged QoS 1
+messages again (DUP set), on reconnect. ``FakeBroker.publish()`` injects a
+message straight into the subscriber sockets, so a replayer in the same
+process needs no publishing client of its own, and
+``FakeBroker.drop_connections()`` cuts every client off to simulate a
+network blip. No retained messages, will or authentication (credentials
+are ignored).
+
+Standalone use, e.g. to point Node-RED or mosquitto_pub at it:
+
+    python3 benchmarks/fake_broker.py --port 1883
+"""
+import argparse
+import socket
+import socketserver
+import struct
+import threading
+
+CONNECT, CONNACK, PUBLISH, PUBACK = 1, 2, 3, 4
+SUBSCRIBE, SUBACK, UNSUBSCRIBE, UNSUBACK = 8, 9, 10, 11
+PINGREQ, PINGRESP, DISCONNECT = 12, 13, 14
+
+
+def encode_length(n):
+    out = bytearray()
+    while True:
+        byte, n = n % 128, n // 128
+        out.append(byte | (0x80 if n else 0))
+        if not n:
+            return bytes(out)
+
+
+def encode_publish(topic, payload, qos=0, packet_id=0, dup=False):
+    """A PUBLISH packet; ``packet_id`` is required for QoS 1"""
+    if isinstance(payload, str):
+        payload = payload.encode()
+    topic = topic.encode()
+    body = struct.pack("!H", len(topic)) + topic + (struct.pack("!H", packet_id) if qos else b"") + payload
+    return bytes([PUBLISH << 4 | dup << 3 | qos << 1]) + encode_length(len(body)) + body
+
+
+def topic_matches(pattern, topic):
+    pattern_levels = pattern.split("/")
+    topic_levels = topic.split("/")
+    for i, level in enumerate(pattern_levels):
+        if level == "#":
+            return True
+        if i >= len(topic_levels) or (level != "+" and level != topic_levels[i]):
+            return False
+    return len(pattern_levels) == len(topic_levels)
+
+
+class _Session:
+    """Subscriptions and undelivered messages of one client ID"""
+
+    def __init__(self, client_id, persistent):
+        self.client_id = client_id
+        self.persistent = persistent
+        self.filters = {}        # topic filter -> granted QoS
+        self.connection = None   # _Connection while the client is online
+        self.inflight = {}       # packet id -> (topic, payload) sent at QoS 1, not acknowledged yet
+        self.pending = []        # (topic, payload, qos) published while offline
+        self._next_id = 0
+
+    def qos_for(self, topic):
+        """Granted QoS of the best matching filter, or None when nothing matches"""
+        granted = [qos for pattern, qos in self.filters.items() if topic_matches(pattern, topic)]
+        return max(granted) if granted else None
+
+    def next_packet_id(self):
+        self._next_id = self._next_id % 65535 + 1
+        return self._next_id
+
+
+class _Connection(socketserver.BaseRequestHandler):
+
+    def setup(self):
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.send_lock = threading.Lock()
+        self.session = None
+        self.rfile = self.request.makefile("rb")
+
+    def send(self, data):
+        with self.send_lock:
+            self.request.sendall(data)
+
+    def _read_packet(self):
+        header = self.rfile.read(1)
+        if not header:
+            return None, None
+        length, shift = 0, 0
+        while True:
+            byte = self.rfile.read(1)
+            if not byte:
+                return None, None
+            length |= (byte[0] & 0x7F) << shift
+            shift += 7
+            if not byte[0] & 0x80:
+                break
+        return header[0], self.rfile.read(length)
+
+    def handle(self):
+        broker = self.server.broker
+        try:
+            while True:
+                header, body = self._read_packet()
+                if header is None:
+                    return
+                kind = header >> 4
+                if kind == CONNECT:
+                    # protocol name, level, flags, keepalive, then the client ID
+                    pos = 2 + struct.unpack("!H", body[:2])[0]
+                    flags = body[pos + 1]
+                    size = struct.unpack("!H", body[pos + 4:pos + 6])[0]
+                    client_id = body[pos + 6:pos + 6 + size].decode()
+                    present = broker._connect(self, client_id, clean=bool(flags & 0x02))
+                    self.send(bytes([CONNACK << 4, 2, int(present), 0]))
+                    broker._resend(self.session)
+                elif kind == SUBSCRIBE:
+                    packet_id, pos, granted = body[:2], 2, bytearray()
+                    while pos < len(body):
+                        size = struct.unpack("!H", body[pos:pos + 2])[0]
+                        qos = min(body[pos + 2 + size] & 0x03, 1)
+                        self.session.filters[body[pos + 2:pos + 2 + size].decode()] = qos
+                        pos += 2 + size + 1
+                        granted.append(qos)
+                    broker._subscribe(self)
+                    self.send(bytes([SUBACK << 4]) + encode_length(2 + len(granted)) + packet_id + bytes(granted))
+                elif kind == UNSUBSCRIBE:
+                    self.session.filters.clear()
+                    self.send(bytes([UNSUBACK << 4, 2]) + body[:2])
+                elif kind == PUBACK:
+                    broker._acknowledge(self.session, struct.unpack("!H", body[:2])[0])
+                elif kind == PUBLISH:
+                    size = struct.unpack("!H", body[:2])[0]
+                    topic = body[2:2 + size].decode()
+                    qos = (header >> 1) & 0x03
+                    pos = 2 + size
+                    if qos:
+                        self.send(bytes([PUBACK << 4, 2]) + body[pos:pos + 2])
+                        pos += 2
+                    broker.publish(topic, body[pos:])
+                elif kind == PINGREQ:
+                    self.send(bytes([PINGRESP << 4, 0]))
+                elif kind == DISCONNECT:
+                    return
+        except (OSError, ValueError):
+            return
+
+    def finish(self):
+        self.server.broker._disconnect(self)
+        self.rfile.close()
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class FakeBroker:
+    """Threaded fake broker on ``host:port`` (port 0 picks a free one)."""
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self._server = _Server((host, port), _Connection)
+        self._server.broker = self
+        self._sessions = {}   # client ID -> _Session
+        self._lock = threading.Lock()
+        self._thread = None
+        self.published = 0
+        self.delivered = 0    # messages written to a subscriber socket, redeliveries included
+        self.redelivered = 0  # QoS 1 messages sent again after a reconnect
+        self.queued = 0       # messages held for offline persistent sessions
+        self.subscribed = threading.Event()
+
+    @property
+    def address(self):
+        return self._server.server_address
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True, name="fake-mqtt-broker")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def drop_connections(self):
+        """Close every client socket without DISCONNECT, like a network failure"""
+        with self._lock:
+            connections = [session.connection for session in self._sessions.values() if session.connection]
+        for connection in connections:
+            try:
+                connection.request.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        return len(connections)
+
+    def _connect(self, connection, client_id, clean):
+        """Attach ``connection`` to its session; returns whether a stored session was resumed"""
+        client_id = client_id or "anonymous-%x" % id(connection)
+        with self._lock:
+            session = self._sessions.get(client_id)
+            present = session is not None and session.persistent and not clean
+            if not present:
+                session = self._sessions[client_id] = _Session(client_id, persistent=not clean)
+            previous, session.connection = session.connection, connection
+            connection.session = session
+        if previous is not None and previous is not connection:
+            try:
+                previous.request.shutdown(socket.SHUT_RDWR)  # session taken over by a new connection
+            except OSError:
+                pass
+        if present and session.filters:
+            self.subscribed.set()
+        return present
+
+    def _resend(self, session):
+        """Deliver unacknowledged and queued messages of a resumed session"""
+        with self._lock:
+            inflight = list(session.inflight.items())
+            pending, session.pending = session.pending, []
+        for packet_id, (topic, payload) in inflight:
+            self.redelivered += 1
+            self._send(session, encode_publish(topic, payload, 1, packet_id, dup=True))
+        for topic, payload, qos in pending:
+            self._deliver(session, topic, payload, qos)
+
+    def _acknowledge(self, session, packet_id):
+        with self._lock:
+            session.inflight.pop(packet_id, None)
+
+    def _subscribe(self, connection):
+        self.subscribed.set()
+
+    def _disconnect(self, connection):
+        with self._lock:
+            session = connection.session
+            if session is None or session.connection is not connection:
+                return
+            session.connection = None
+            if not session.persistent:
+                del self._sessions[session.client_id]
+            online = any(s.connection and s.filters for s in self._sessions.values())
+        if not online:
+            self.subscribed.clear()
+
+    def _send(self, session, packet):
+        connection = session.connection
+        if connection is None:
+            return False
+        try:
+            connection.send(packet)
+        except OSError:
+            return False
+        self.delivered += 1
+        return True
+
+    def _deliver(self, session, topic, payload, qos):
+        with self._lock:
+            if session.connection is None:
+                session.pending.append((topic, payload, qos))
+                self.queued += 1
+                return False
+            packet_id = 0
+            if qos:
+                packet_id = session.next_packet_id()
+                session.inflight[packet_id] = (topic, payload)
+        return self._send(session, encode_publish(topic, payload, qos, packet_id))
+
+    def publish(self, topic, payload, qos=1):
+        """Deliver one message to every matching session; returns the number reached.
+
+        Each subscriber gets it at the lower of ``qos`` and its granted QoS;
+        offline persistent sessions hold it until they reconnect.
+        """
+        if isinstance(payload, str):
+            payload = payload.encode()
+        with self._lock:
+            self.published += 1
+            targets = []
+            for session in self._sessions.values():
+                granted = session.qos_for(topic)
+                if granted is not None and (session.connection or session.persistent):
+                    targets.append((session, min(granted, qos)))
+        reached = 0
+        for session, delivered_qos in targets:
+            reached += self._deliver(session, topic, payload, delivered_qos)
+        return reached
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1883)
+    args = parser.parse_args()
+    broker = FakeBroker(args.host, args.port)
+    print("fake MQTT broker listening on %s:%s" % broker.address)
+    try:
+        broker._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
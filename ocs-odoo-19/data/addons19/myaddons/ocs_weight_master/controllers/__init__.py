@@ -0,0 +1,4 @@
+from . import metrics
+from . import voucher
+from . import export
+from . import sync
@@ -0,0 +1,33 @@
+from odoo import api, fields, http
+from odoo.http import request
+
+
+class WeighbridgeExportController(http.Controller):
+
+    @http.route('/ocs_weight_master/export/transactions', type='http', auth='user', methods=['GET'])
+    def export_transactions(self, date_from, date_to, file_format='csv', archived='1', **kwargs):
+        """Stream the transactions of a report day range as CSV or XLSX.
+
+        The body is generated after this handler returns, so it runs on its
+        own cursor with the caller's uid and context; rows are written to the
+        response a chunk at a time.
+        """
+        date_from, date_to = fields.Date.to_date(date_from), fields.Date.to_date(date_to)
+        include_archived = archived != '0'
+        request.env['weighbridge.transaction'].check_access('read')
+        registry, uid, context = request.env.registry, request.env.uid, dict(request.env.context)
+        xlsx = file_format == 'xlsx'
+
+        def body():
+            with registry.cursor() as cr:
+                Export = api.Environment(cr, uid, context)['weighbridge.transaction.export']
+                chunks = Export._iter_chunks(date_from, date_to, include_archived)
+                yield from (Export._stream_xlsx(chunks) if xlsx else Export._stream_csv(chunks))
+
+        filename = 'transactions_%s_%s.%s' % (date_from, date_to, 'xlsx' if xlsx else 'csv')
+        content_type = ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet' if xlsx
+                        else 'text/csv; charset=utf-8')
+        return request.make_response(body(), headers=[
+            ('Content-Type', content_type),
+            ('Content-Disposition', http.content_disposition(filename)),
+        ])
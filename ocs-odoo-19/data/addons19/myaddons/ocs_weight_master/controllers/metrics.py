@@ -0,0 +1,29 @@
+import hmac
+
+from odoo import http
+from odoo.http import request
+
+from ..models.ingest_metrics import Exposition
+
+
+class WeightMetricsController(http.Controller):
+
+    @http.route('/ocs_weight_master/metrics', type='http', auth='public', methods=['GET'], csrf=False, save_session=False)
+    def metrics(self, token=None, **kwargs):
+        """Ingest metrics for Prometheus.
+
+        Scrapers authenticate with the ocs_weight_master.metrics_token system
+        parameter, passed as ?token= or an "Authorization: Bearer" header.
+        Without a token configured, only logged-in internal users can read it.
+        """
+        expected = request.env['ir.config_parameter'].sudo().get_param('ocs_weight_master.metrics_token')
+        if expected:
+            auth = request.httprequest.headers.get('Authorization', '')
+            given = token or (auth[7:] if auth.startswith('Bearer ') else '')
+            allowed = hmac.compare_digest(given.encode(), expected.encode())
+        else:
+            allowed = request.env.user._is_internal()
+        if not allowed:
+            return request.make_response('Forbidden\n', status=403, headers=[('Content-Type', 'text/plain')])
+        body = request.env['weight.latest'].sudo()._render_metrics()
+        return request.make_response(body, headers=[('Content-Type', Exposition.CONTENT_TYPE)])
@@ -0,0 +1,64 @@
+import hmac
+import json
+import logging
+import zlib
+
+from psycopg2 import IntegrityError
+
+from odoo import http
+from odoo.exceptions import UserError, ValidationError
+from odoo.http import request
+
+from ..models.sync import MAX_BATCH_SIZE, MAX_BODY, SYNC_KINDS, SYNC_PATH, record_error
+
+_logger = logging.getLogger(__name__)
+
+
+class WeighbridgeSyncController(http.Controller):
+
+    @http.route(SYNC_PATH, type='http', auth='public', methods=['POST'], csrf=False, save_session=False)
+    def sync_push(self, **kwargs):
+        """Receive a batch of records pushed by a site.
+
+        Sites authenticate with the ocs_weight_master.sync_token system
+        parameter as an "Authorization: Bearer" header; without a token
+        configured the endpoint is closed. The body is JSON, optionally
+        gzip-compressed, of at most MAX_BODY bytes once inflated. The batch is
+        committed before the acknowledgement is sent. Every rejection is a
+        JSON {"ok": false, "error": ...} the site shows as its last error.
+        """
+        expected = request.env['ir.config_parameter'].sudo().get_param('ocs_weight_master.sync_token')
+        auth = request.httprequest.headers.get('Authorization', '')
+        given = auth[7:] if auth.startswith('Bearer ') else ''
+        if not expected or not hmac.compare_digest(given.encode(), expected.encode()):
+            return self._reply(403, "Forbidden")
+        if (request.httprequest.content_length or 0) > MAX_BODY:
+            return self._reply(413, "Request too large")
+        data = request.httprequest.get_data()
+        try:
+            if request.httprequest.headers.get('Content-Encoding') == 'gzip':
+                inflater = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+                data = inflater.decompress(data, MAX_BODY)
+                if inflater.unconsumed_tail:
+                    return self._reply(413, "Request too large")
+            payload = json.loads(data)
+            site, kind, records = payload['site'], payload['kind'], payload['records']
+        except (zlib.error, ValueError, KeyError, TypeError):
+            return self._reply(400, "Malformed batch")
+        if not site or kind not in dict(SYNC_KINDS) or not isinstance(records, list):
+            return self._reply(400, "Malformed batch")
+        if len(records) > MAX_BATCH_SIZE:
+            return self._reply(413, "More than %s records" % MAX_BATCH_SIZE)
+        for index, values in enumerate(records):
+            if error := record_error(kind, values):
+                return self._reply(400, "Record %s: %s" % (index, error))
+        try:
+            with request.env.cr.savepoint():
+                applied, skipped = request.env['weighbridge.sync.state'].sudo()._apply_batch(site, kind, records)
+        except (UserError, ValidationError, IntegrityError) as e:
+            _logger.warning("Rejected %s batch of site %s: %s", kind, site, e)
+            return self._reply(422, "Batch rejected: %s" % e)
+        return request.make_json_response({'ok': True, 'applied': applied, 'skipped': skipped})
+
+    def _reply(self, status, error):
+        return request.make_json_response({'ok': False, 'error': error}, status=status)
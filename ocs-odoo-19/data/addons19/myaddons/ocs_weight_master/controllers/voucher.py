@@ -0,0 +1,18 @@
+from odoo import http
+from odoo.http import request
+
+
+class WeighbridgeVoucherController(http.Controller):
+
+    @http.route('/ocs_weight_master/escpos/<string:ids>', type='http', auth='user', methods=['GET'])
+    def escpos(self, ids, width=None, **kwargs):
+        """Raw ESC/POS vouchers of comma-separated transaction ids, for a local printing agent"""
+        records = request.env['weighbridge.transaction'].browse(
+            [int(i) for i in ids.split(',') if i.isdigit()]).exists()
+        records.check_access('read')
+        data = records._render_escpos(int(width) if width and width.isdigit() else None)
+        filename = 'vouchers.bin' if len(records) != 1 else '%s.bin' % records.voucher_no
+        return request.make_response(data, headers=[
+            ('Content-Type', 'application/octet-stream'),
+            ('Content-Disposition', http.content_disposition(filename)),
+        ])
@@ -1,6 +1,15 @@
 from . import weight_record
 from . import mqtt_service
 from . import mqtt_latest
+from . import weighbridge_scale
+from . import weight_history
 from . import transaction_type
 from . import driver
 from . import weighbridge_transaction
+from . import tonnage_report
+from . import voucher_report
+from . import vehicle_tare
+from . import transaction_export
+from . import plate_lookup
+from . import ingest_status
+from . import sync
@@ -0,0 +1,35 @@
+# Hot/cold split of the append-mostly tables. Old rows get active = false,
+# so the default (active) lists, searches and partial indexes only cover the
+# recent window while archived rows stay queryable with active_test=False.
+import logging
+
+_logger = logging.getLogger(__name__)
+
+ARCHIVE_BATCH_SIZE = 5000
+
+
+def archive_older_than(cr, table, cutoff, condition="TRUE", batch_size=ARCHIVE_BATCH_SIZE):
+    """Set active = false on rows of ``table`` created before ``cutoff``, oldest first.
+
+    ``condition`` is an extra SQL predicate (trusted, not user input) that
+    rows must match to be archived. Commits after each batch so a large
+    backlog neither holds one long transaction nor bloats the table in one
+    go. Returns the number of rows archived.
+    """
+    total = 0
+    while True:
+        cr.execute(f"""
+            UPDATE {table} SET active = false
+             WHERE id IN (SELECT id FROM {table}
+                           WHERE active AND create_date < %s AND ({condition})
+                        ORDER BY create_date, id
+                           LIMIT %s)
+        """, (cutoff, batch_size))
+        archived = cr.rowcount
+        cr.commit()
+        total += archived
+        if archived < batch_size:
+            break
+    if total:
+        _logger.info("Archived %s row(s) of %s created before %s.", total, table, cutoff)
+    return total
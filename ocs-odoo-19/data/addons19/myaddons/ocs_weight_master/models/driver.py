@@ -1,34 +1,140 @@
-from odoo import models, fields, api
-
-class Driver(models.Model):
-    _name = "weighbridge.driver"
-    _description = "Weighbridge Driver"
-    _order = "name"
-    _rec_name = "name"
-
-    name = fields.Char(string="Driver Name", required=True)
-    nrc = fields.Char(string="NRC", help="National Registration Card Number")
-    phone = fields.Char(string="Phone Number")
-    email = fields.Char(string="Email")
-    address = fields.Text(string="Address")
-    
-    # Link to partner if driver is also a contact
-    partner_id = fields.Many2one('res.partner', string="Related Contact", 
-                                 help="Link to contact if driver exists in contacts")
-    
-    # Additional fields
-    license_no = fields.Char(string="License Number")
-    license_expiry = fields.Date(string="License Expiry Date")
-    notes = fields.Text(string="Notes")
-    
-    # Transaction count (computed)
-    transaction_count = fields.Integer(string="Transaction Count", compute="_compute_transaction_count")
-    
-    @api.depends('name')
-    def _compute_transaction_count(self):
-        """Count transactions for this driver"""
-        for driver in self:
-            driver.transaction_count = self.env['weighbridge.transaction'].search_count([
-                ('driver_id', '=', driver.id)
-            ])
-
+import re
+
+from odoo import models, fields, api
+from odoo.fields import Domain
+from odoo.tools import SQL
+from odoo.tools.sql import has_trigram
+
+# Myanmar digits ၀-၉ as typed on Burmese keyboards, folded to ASCII
+MYANMAR_DIGITS = str.maketrans("၀၁၂၃၄၅၆၇၈၉", "0123456789")
+# Separators an NRC is written with: "12/OuKaMa(N)123456" == "12 / OUKAMA (N) 123456"
+NRC_SEPARATORS = re.compile(r"[\s/()\-_.,]+")
+# Citizenship marker spelled out, in Burmese or abbreviated: "(Naing)" == "(နိုင်)" == "(N)"
+NRC_CITIZEN = re.compile(r"\(\s*(?:N|NAING|နိုင်)\s*\)", re.IGNORECASE)
+NON_DIGITS = re.compile(r"\D+")
+MIN_KEY_LENGTH = 3  # shorter keys match too much, and trigram indexes need 3 characters
+
+
+def normalize_nrc(nrc):
+    """Case, space and separator insensitive key of an NRC number, with Myanmar digits folded"""
+    return NRC_SEPARATORS.sub("", NRC_CITIZEN.sub("N", (nrc or "").translate(MYANMAR_DIGITS))).upper()
+
+
+def normalize_phone(phone):
+    """Digits of a phone number in local form: "+95 9 450 123 456" -> "09450123456" """
+    digits = NON_DIGITS.sub("", (phone or "").translate(MYANMAR_DIGITS))
+    if digits.startswith("959") and len(digits) > 9:
+        digits = "0" + digits[2:]
+    return digits
+
+
+class Driver(models.Model):
+    _name = "weighbridge.driver"
+    _description = "Weighbridge Driver"
+    _order = "name"
+    _rec_name = "name"
+
+    name = fields.Char(string="Driver Name", required=True, index='trigram')
+    nrc = fields.Char(string="NRC", help="National Registration Card Number")
+    phone = fields.Char(string="Phone Number")
+    email = fields.Char(string="Email")
+    address = fields.Text(string="Address")
+    
+    # Link to partner if driver is also a contact
+    partner_id = fields.Many2one('res.partner', string="Related Contact", 
+                                 help="Link to contact if driver exists in contacts")
+    
+    # Additional fields
+    license_no = fields.Char(string="License Number", index='trigram')
+    license_expiry = fields.Date(string="License Expiry Date")
+    notes = fields.Text(string="Notes")
+    
+    # Normalised search keys, so "12/OuKaMa(N)123456" and "+95 9 450..." match however they are typed
+    nrc_key = fields.Char(string="NRC Key", compute="_compute_search_keys", store=True, index='trigram')
+    phone_key = fields.Char(string="Phone Key", compute="_compute_search_keys", store=True, index='trigram')
+
+    # Central instance: the site a synced driver comes from, its id and last change there
+    site_code = fields.Char(string="Site", readonly=True, copy=False)
+    site_ref = fields.Integer(string="Site Driver ID", readonly=True, copy=False)
+    site_write_date = fields.Datetime(string="Site Last Change", readonly=True, copy=False)
+
+    _site_ref_uniq = models.UniqueIndex("(site_code, site_ref) WHERE site_code IS NOT NULL")
+
+    # Transaction count, stored and recomputed only for the drivers whose transactions change.
+    # Archived tickets are history and still count, so archiving never changes it.
+    transaction_ids = fields.One2many('weighbridge.transaction', 'driver_id', string="Transactions",
+                                      context={'active_test': False})
+    transaction_count = fields.Integer(string="Transaction Count", compute="_compute_transaction_count", store=True)
+    
+    @api.depends('transaction_ids')
+    def _compute_transaction_count(self):
+        """Count transactions of the whole recordset with one grouped query"""
+        counts = dict(self.env['weighbridge.transaction'].with_context(active_test=False)._read_group(
+            [('driver_id', 'in', self.ids)], ['driver_id'], ['__count']))
+        for driver in self:
+            driver.transaction_count = counts.get(driver, 0)
+
+    @api.depends('nrc', 'phone')
+    def _compute_search_keys(self):
+        for driver in self:
+            driver.nrc_key = normalize_nrc(driver.nrc) or False
+            driver.phone_key = normalize_phone(driver.phone) or False
+
+    @api.model
+    def _search_keys(self, value):
+        """(nrc key, phone key) worth matching for a typed value; None for a key that would match noise"""
+        nrc = normalize_nrc(value)
+        phone = normalize_phone(value)
+        # A plain name like "Aung" is not an NRC fragment; an NRC always has digits or a slash
+        nrc = nrc if len(nrc) >= MIN_KEY_LENGTH and re.search(r"[\d/]", value.translate(MYANMAR_DIGITS)) else None
+        phone = phone if len(phone) >= MIN_KEY_LENGTH else None
+        return nrc, phone
+
+    @api.model
+    def _search_display_name(self, operator, value):
+        """Match the name, the license number and the normalised NRC and phone keys.
+
+        Every branch is an ilike on a trigram-indexed column, so PostgreSQL
+        ORs four GIN index scans instead of scanning the driver table.
+        """
+        if operator not in ('ilike', '=') or not isinstance(value, str) or not value.strip():
+            return super()._search_display_name(operator, value)
+        nrc, phone = self._search_keys(value)
+        domains = [[('name', operator, value)], [('license_no', operator, value)]]
+        if nrc:
+            domains.append([('nrc_key', operator, nrc)])
+        if phone:
+            domains.append([('phone_key', operator, phone)])
+        return Domain.OR(domains)
+
+    @api.model
+    def name_search(self, name='', domain=None, operator='ilike', limit=100):
+        """Driver autocomplete, best matches first.
+
+        Exact matches of the name, NRC or phone come first, then name
+        prefixes, then by trigram similarity to whichever field matched.
+        Needs pg_trgm; without it the result is in the default order.
+        """
+        if operator != 'ilike' or not (name or '').strip() or not has_trigram(self.env.cr):
+            return super().name_search(name, domain, operator, limit)
+        nrc, phone = self._search_keys(name)
+        query = self._search(Domain(domain or []) & self._search_display_name(operator, name))
+        column = lambda fname: SQL.identifier(self._table, fname)
+        query.order = SQL(
+            """CASE WHEN lower(%(name)s) = lower(%(value)s) OR %(nrc_key)s = %(nrc)s OR %(phone_key)s = %(phone)s THEN 0
+                    WHEN %(name)s ILIKE %(prefix)s THEN 1
+                    ELSE 2 END,
+               GREATEST(word_similarity(%(value)s, %(name)s),
+                        word_similarity(%(value)s, COALESCE(%(license_no)s, '')),
+                        word_similarity(%(nrc)s, COALESCE(%(nrc_key)s, '')),
+                        word_similarity(%(phone)s, COALESCE(%(phone_key)s, ''))) DESC,
+               %(name)s""",
+            name=column('name'), license_no=column('license_no'),
+            nrc_key=column('nrc_key'), phone_key=column('phone_key'),
+            value=name, prefix=name.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%',
+            nrc=nrc or '', phone=phone or '',
+        )
+        query.limit = limit
+        self.env.cr.execute(query.select(column('id')))
+        drivers = self.browse(row[0] for row in self.env.cr.fetchall())
+        return [(driver.id, driver.display_name) for driver in drivers.sudo()]
@@ -0,0 +1,100 @@
+# Plain ESC/POS byte stream for 58/80 mm thermal printers: text, bold,
+# double size, alignment and a partial cut. Kept free of Odoo imports.
+import socket
+
+ESC = b"\x1b"
+GS = b"\x1d"
+
+INIT = ESC + b"@"
+CODEPAGE_PC437 = ESC + b"t\x00"
+ALIGN_LEFT = ESC + b"a\x00"
+ALIGN_CENTER = ESC + b"a\x01"
+BOLD_ON = ESC + b"E\x01"
+BOLD_OFF = ESC + b"E\x00"
+SIZE_NORMAL = GS + b"!\x00"
+SIZE_DOUBLE = GS + b"!\x11"       # double width and height
+SIZE_TALL = GS + b"!\x01"         # double height only, keeps the line width
+FEED_AND_CUT = GS + b"V\x42\x03"  # feed 3 lines, then partial cut
+
+DEFAULT_WIDTH = 48   # characters per line in font A on 80 mm paper (32 on 58 mm)
+DEFAULT_PORT = 9100  # raw printing port of network printers
+SEND_TIMEOUT = 5
+
+
+def encode(text):
+    """Printer code page 437; characters it lacks print as '?'"""
+    return str(text).encode("cp437", errors="replace")
+
+
+class EscPosTicket:
+    """Builds a ticket line by line; ``bytes(ticket)`` is what goes to the printer."""
+
+    def __init__(self, width=DEFAULT_WIDTH):
+        self.width = max(int(width or DEFAULT_WIDTH), 16)
+        self._out = bytearray(INIT + CODEPAGE_PC437)
+
+    def __bytes__(self):
+        return bytes(self._out)
+
+    def raw(self, data):
+        self._out += data
+        return self
+
+    def title(self, text, subtitle=None):
+        self._out += ALIGN_CENTER + BOLD_ON + SIZE_DOUBLE + encode(text[:self.width // 2]) + b"\n"
+        self._out += SIZE_NORMAL + BOLD_OFF
+        if subtitle:
+            self._out += encode(subtitle[:self.width]) + b"\n"
+        self._out += ALIGN_LEFT
+        return self
+
+    def rule(self, char="-"):
+        self._out += encode(char * self.width) + b"\n"
+        return self
+
+    def line(self, label, value, bold=False):
+        """``label`` left, ``value`` right aligned; wraps the value when it does not fit"""
+        label, value = str(label), str(value if value not in (None, False) else "")
+        room = self.width - len(label) - 1
+        if len(value) <= room:
+            text = label + " " + value.rjust(room)
+        else:
+            text = label + "\n" + "\n".join(
+                value[i:i + self.width].rjust(self.width) for i in range(0, len(value), self.width))
+        if bold:
+            self._out += BOLD_ON + encode(text) + b"\n" + BOLD_OFF
+        else:
+            self._out += encode(text) + b"\n"
+        return self
+
+    def big_line(self, label, value):
+        """Double-height line for the figure the operator reads off the ticket"""
+        self._out += SIZE_TALL
+        self.line(label, value, bold=True)
+        self._out += SIZE_NORMAL
+        return self
+
+    def text(self, text, center=False):
+        if center:
+            self._out += ALIGN_CENTER
+        for paragraph in str(text).splitlines() or [""]:
+            for i in range(0, max(len(paragraph), 1), self.width):
+                self._out += encode(paragraph[i:i + self.width]) + b"\n"
+        if center:
+            self._out += ALIGN_LEFT
+        return self
+
+    def feed(self, lines=1):
+        self._out += b"\n" * lines
+        return self
+
+    def cut(self):
+        self._out += FEED_AND_CUT
+        return self
+
+
+def send(data, address, timeout=SEND_TIMEOUT):
+    """Write ``data`` to a raw network printer at "host" or "host:port"."""
+    host, _sep, port = address.strip().partition(":")
+    with socket.create_connection((host, int(port or DEFAULT_PORT)), timeout=timeout) as sock:
+        sock.sendall(data)
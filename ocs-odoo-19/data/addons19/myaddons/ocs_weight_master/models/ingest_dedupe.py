@@ -0,0 +1,46 @@
+# Bounded duplicate suppression for at-least-once MQTT delivery. Kept free
+# of Odoo imports; MqttWeightService checks every QoS 1 message against it
+# on the paho network thread.
+import time
+from collections import OrderedDict
+
+DEFAULT_CAPACITY = 16384   # keys remembered; ~100 bytes each
+DEFAULT_WINDOW = 600.0     # seconds a key is remembered
+
+
+class RecentKeys:
+    """Set of recently seen message keys with a size and an age bound.
+
+    Keys are stored as their hash, so memory per entry does not depend on
+    the payload. ``seen()`` is O(1): a dict lookup plus evicting entries
+    from the old end, each of which was inserted once. Not thread safe; use
+    it from one thread.
+    """
+
+    __slots__ = ("capacity", "window", "_keys")
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, window=DEFAULT_WINDOW):
+        self.capacity = max(int(capacity), 1)
+        self.window = float(window)
+        self._keys = OrderedDict()  # hash -> monotonic time first seen, oldest first
+
+    def __len__(self):
+        return len(self._keys)
+
+    def seen(self, key, now=None):
+        """True when ``key`` was seen within the window; otherwise remember it and return False"""
+        now = time.monotonic() if now is None else now
+        keys = self._keys
+        digest = hash(key)
+        first_seen = keys.get(digest)
+        if first_seen is not None and now - first_seen <= self.window:
+            return True
+        if first_seen is not None:
+            del keys[digest]
+        keys[digest] = now
+        while keys:
+            oldest, since = next(iter(keys.items()))
+            if len(keys) <= self.capacity and now - since <= self.window:
+                break
+            del keys[oldest]
+        return False
@@ -0,0 +1,88 @@
+# Minimal Prometheus text exposition (format 0.0.4) for the ingest pipeline.
+# Kept free of Odoo imports; MqttWeightService owns the histograms and the
+# /ocs_weight_master/metrics controller renders them.
+from bisect import bisect_left
+
+# Upper bounds in seconds; one XK3190 frame at 9600 baud is ~12.5 ms
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Cumulative latency histogram; not thread safe, callers hold their own lock."""
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self):
+        return {"bounds": list(self.bounds), "counts": list(self.counts), "sum": self.sum, "count": self.count}
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{%s}" % ",".join('%s="%s"' % (key, _escape(value)) for key, value in labels.items())
+
+
+def _number(value):
+    if value is True or value is False:
+        return "1" if value else "0"
+    if isinstance(value, float):
+        return repr(value) if value == value else "NaN"
+    return str(value)
+
+
+class Exposition:
+    """Collects metric families and renders them in the text format.
+
+    Samples of one family must be added together; ``# HELP``/``# TYPE`` are
+    written the first time a family name is seen.
+    """
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._lines = []
+        self._seen = set()
+
+    def _family(self, name, kind, help_text):
+        if name not in self._seen:
+            self._seen.add(name)
+            self._lines.append("# HELP %s %s" % (name, help_text))
+            self._lines.append("# TYPE %s %s" % (name, kind))
+
+    def counter(self, name, help_text, value, labels=None):
+        self._family(name, "counter", help_text)
+        self._lines.append("%s%s %s" % (name, _labels(labels), _number(value)))
+
+    def gauge(self, name, help_text, value, labels=None):
+        self._family(name, "gauge", help_text)
+        self._lines.append("%s%s %s" % (name, _labels(labels), _number(value)))
+
+    def histogram(self, name, help_text, snapshot, labels=None):
+        """Render a Histogram.snapshot() (per-bucket counts, made cumulative here)"""
+        self._family(name, "histogram", help_text)
+        labels = dict(labels or {})
+        cumulative = 0
+        for bound, count in zip(list(snapshot["bounds"]) + ["+Inf"], snapshot["counts"]):
+            cumulative += count
+            le = bound if bound == "+Inf" else _number(float(bound))
+            self._lines.append("%s_bucket%s %s" % (name, _labels(dict(labels, le=le)), cumulative))
+        self._lines.append("%s_sum%s %s" % (name, _labels(labels), _number(float(snapshot["sum"]))))
+        self._lines.append("%s_count%s %s" % (name, _labels(labels), snapshot["count"]))
+
+    def render(self):
+        return "\n".join(self._lines) + "\n"
@@ -0,0 +1,239 @@
+# Direct indicator ingestion: read XK3190-D10 frames from a serial port or a
+# raw TCP serial server (e.g. a Moxa NPort in TCP server mode) without going
+# through Node-RED and MQTT. Kept free of Odoo imports; MqttWeightService
+# starts one DirectSourceReader in the leader process.
+import json
+import logging
+import os
+import selectors
+import socket
+import termios
+import threading
+import time
+import tty
+
+from .xk3190 import Xk3190Decoder
+
+_logger = logging.getLogger(__name__)
+
+READ_SIZE = 4096          # bytes read per wakeup
+SELECT_TIMEOUT = 1.0      # seconds; bounds how long stop() and reconnects wait
+RECONNECT_DELAY = 5       # seconds between attempts to reopen a failed source
+TCP_CONNECT_TIMEOUT = 5   # seconds
+
+
+class DirectSource:
+    """One indicator feeding one scale; subclasses open the underlying fd."""
+
+    def __init__(self, scale_code):
+        self.scale_code = scale_code
+        self.decoder = Xk3190Decoder()
+        self._buf = bytearray(READ_SIZE)
+        self._view = memoryview(self._buf)
+        self.retry_at = 0.0
+
+    def open(self):
+        raise NotImplementedError
+
+    def fileno(self):
+        raise NotImplementedError
+
+    def _read_into(self):
+        """Read into the fixed buffer; return the byte count, 0 on EOF."""
+        raise NotImplementedError
+
+    def read(self):
+        """Return the readings decoded from whatever is available now.
+
+        The read lands in a preallocated buffer and is handed to the decoder
+        as a memoryview, so the only copy is the decoder's own stream buffer.
+        Raises EOFError when the peer went away.
+        """
+        n = self._read_into()
+        if not n:
+            raise EOFError("connection closed")
+        return self.decoder.feed(self._view[:n])
+
+    def close(self):
+        raise NotImplementedError
+
+    def describe(self):
+        raise NotImplementedError
+
+
+class SerialSource(DirectSource):
+    """A local serial device, e.g. /dev/ttyUSB0, in raw 8N1 mode."""
+
+    def __init__(self, scale_code, device, baudrate=9600):
+        super().__init__(scale_code)
+        self.device = device
+        self.baudrate = int(baudrate or 9600)
+        self._fd = None
+
+    def open(self):
+        speed = getattr(termios, "B%d" % self.baudrate, None)
+        if speed is None:
+            raise ValueError("Unsupported baud rate %s" % self.baudrate)
+        fd = os.open(self.device, os.O_RDONLY | os.O_NOCTTY | os.O_NONBLOCK)
+        try:
+            tty.setraw(fd)
+            attrs = termios.tcgetattr(fd)
+            attrs[2] |= termios.CLOCAL | termios.CREAD
+            attrs[4] = attrs[5] = speed  # ispeed, ospeed
+            termios.tcsetattr(fd, termios.TCSANOW, attrs)
+            termios.tcflush(fd, termios.TCIFLUSH)
+        except Exception:
+            os.close(fd)
+            raise
+        self._fd = fd
+
+    def fileno(self):
+        return self._fd
+
+    def _read_into(self):
+        return os.readv(self._fd, [self._buf])
+
+    def close(self):
+        fd, self._fd = self._fd, None
+        if fd is not None:
+            os.close(fd)
+
+    def describe(self):
+        return "%s @ %s baud" % (self.device, self.baudrate)
+
+
+class TcpSource(DirectSource):
+    """A serial-to-Ethernet server streaming the indicator's bytes over TCP."""
+
+    def __init__(self, scale_code, host, port):
+        super().__init__(scale_code)
+        self.host = host
+        self.port = int(port)
+        self._sock = None
+
+    def open(self):
+        sock = socket.create_connection((self.host, self.port), timeout=TCP_CONNECT_TIMEOUT)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        sock.setblocking(False)
+        self._sock = sock
+
+    def fileno(self):
+        return self._sock.fileno()
+
+    def _read_into(self):
+        return self._sock.recv_into(self._buf)
+
+    def close(self):
+        sock, self._sock = self._sock, None
+        if sock is not None:
+            sock.close()
+
+    def describe(self):
+        return "tcp://%s:%s" % (self.host, self.port)
+
+
+def build_source(config):
+    """Source for one dict returned by weighbridge.scale._get_direct_sources()"""
+    if config["source"] == "serial":
+        return SerialSource(config["code"], config["serial_device"], config["baudrate"])
+    if config["source"] == "tcp":
+        return TcpSource(config["code"], config["tcp_host"], config["tcp_port"])
+    raise ValueError("Unknown ingest source %r" % config["source"])
+
+
+def node_red_payload(weight, raw, hex_frame, timestamp):
+    """The JSON the Node-RED flow publishes, so weight.latest.raw_data looks the same"""
+    return json.dumps({"weight": weight, "raw": raw, "hex": hex_frame, "timestamp": timestamp})
+
+
+class DirectSourceReader:
+    """One thread multiplexing every direct source with a selector.
+
+    Each decoded reading is handed to ``on_reading(scale_code, weight,
+    payload, received_at, device_ts)``; that callback must not block (the MQTT
+    service passes its queue-backed enqueue). Sources that fail to open or
+    drop are closed and reopened every RECONNECT_DELAY seconds.
+    ``on_rejected(count)`` is told about frames the decoder threw away.
+    """
+
+    def __init__(self, sources, on_reading, on_rejected=None):
+        self.sources = list(sources)
+        self.on_reading = on_reading
+        self.on_rejected = on_rejected
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if not self.sources:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="OCS-Weight-Master-Direct")
+        self._thread.start()
+
+    def stop(self, timeout=SELECT_TIMEOUT * 2):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _open(self, selector, source):
+        try:
+            source.open()
+        except Exception as e:
+            source.close()
+            source.retry_at = time.monotonic() + RECONNECT_DELAY
+            _logger.warning("Could not open %s for scale '%s': %s; retrying in %ss.",
+                            source.describe(), source.scale_code, e, RECONNECT_DELAY)
+            return
+        selector.register(source.fileno(), selectors.EVENT_READ, source)
+        _logger.info("Reading scale '%s' directly from %s.", source.scale_code, source.describe())
+
+    def _drop(self, selector, source, error):
+        try:
+            selector.unregister(source.fileno())
+        except Exception:
+            pass
+        source.close()
+        source.retry_at = time.monotonic() + RECONNECT_DELAY
+        _logger.warning("Lost %s for scale '%s': %s; reopening in %ss.",
+                        source.describe(), source.scale_code, error, RECONNECT_DELAY)
+
+    def _run(self):
+        selector = selectors.DefaultSelector()
+        closed = list(self.sources)
+        try:
+            while not self._stop.is_set():
+                now = time.monotonic()
+                for source in [s for s in closed if s.retry_at <= now]:
+                    closed.remove(source)
+                    self._open(selector, source)
+                    if source.retry_at > now:
+                        closed.append(source)
+
+                for key, _events in selector.select(timeout=SELECT_TIMEOUT):
+                    source = key.data
+                    rejected = source.decoder.errors
+                    try:
+                        readings = source.read()
+                    except (BlockingIOError, InterruptedError):
+                        continue
+                    except (OSError, EOFError) as e:
+                        self._drop(selector, source, e)
+                        closed.append(source)
+                        continue
+                    if self.on_rejected and source.decoder.errors != rejected:
+                        self.on_rejected(source.decoder.errors - rejected)
+                    if not readings:
+                        continue
+                    received_at = time.time()
+                    device_ts = int(received_at * 1000)
+                    for weight, raw, hex_frame in readings:
+                        self.on_reading(source.scale_code, weight,
+                                        node_red_payload(weight, raw, hex_frame, device_ts),
+                                        received_at, device_ts)
+        except Exception:
+            _logger.exception("Direct scale reader crashed.")
+        finally:
+            for source in self.sources:
+                source.close()
+            selector.close()
@@ -0,0 +1,285 @@
+# Local write-ahead spool for decoded weight frames. Kept free of Odoo
+# imports; MqttWeightService appends every frame before it is queued and
+# acknowledges it once the writer has committed it, so frames survive a
+# database outage or a restart and are replayed from disk.
+#
+# Layout: <directory>/<first seq>.seg append-only segments of records
+#
+#     seq (u64) | length (u32) | crc32 (u32) | body (JSON list, `length` bytes)
+#
+# and <directory>/ack holding the highest committed seq. A torn record at
+# the end of the last segment (crash mid-write) is truncated on open.
+import fcntl
+import json
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+
+_logger = logging.getLogger(__name__)
+
+HEADER = struct.Struct("<QII")
+SEGMENT_SUFFIX = ".seg"
+ACK_FILE = "ack"
+LOCK_FILE = "lock"
+
+DEFAULT_SEGMENT_BYTES = 16 * 1024 * 1024
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_FSYNC_INTERVAL = 0.1   # seconds between group fsyncs; 0 = fsync every append
+ACK_SAVE_INTERVAL = 1.0        # seconds between writes of the ack file
+
+
+class SpoolLocked(Exception):
+    """Another process on this host has the spool directory open"""
+
+
+def _crc(seq, body):
+    return zlib.crc32(body, zlib.crc32(HEADER.pack(seq, len(body), 0)))
+
+
+class Spool:
+    """Bounded, segmented append-only log of frames with an ack pointer.
+
+    ``append()`` only writes into the segment's buffer; a flusher thread
+    flushes and fsyncs every ``fsync_interval`` seconds, so one fsync
+    covers every frame of the interval. When the segments outgrow
+    ``max_bytes`` the oldest one is discarded, acknowledged or not, and
+    counted in ``discarded``.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES, segment_bytes=DEFAULT_SEGMENT_BYTES,
+                 fsync_interval=DEFAULT_FSYNC_INTERVAL):
+        self.directory = directory
+        self.max_bytes = max(int(max_bytes), 2 * int(segment_bytes))
+        self.segment_bytes = int(segment_bytes)
+        self.fsync_interval = max(float(fsync_interval), 0.0)
+        self.discarded = 0        # frames lost to the disk bound
+        self.fsyncs = 0
+        self._lock = threading.Lock()
+        self._segments = []       # [first seq, path, size in bytes], oldest first
+        self._file = None         # active (last) segment, opened for append
+        self._next_seq = 1
+        self._acked = 0
+        self._saved_ack = 0
+        self._dirty = False
+        self._read_pos = None     # (last seq read, segment first seq, offset after it)
+        self._closed = False
+        self._flusher = None
+
+        os.makedirs(directory, exist_ok=True)
+        self._lock_fd = os.open(os.path.join(directory, LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(self._lock_fd)
+            raise SpoolLocked(directory)
+        self._recover()
+        if self.fsync_interval:
+            self._flusher = threading.Thread(target=self._flush_loop, daemon=True, name="OCS-Weight-Master-Spool")
+            self._flusher.start()
+
+    # -- recovery -------------------------------------------------------
+
+    def _recover(self):
+        names = sorted((name for name in os.listdir(self.directory) if name.endswith(SEGMENT_SUFFIX)),
+                       key=lambda name: int(name[:-len(SEGMENT_SUFFIX)]))
+        for name in names:
+            path = os.path.join(self.directory, name)
+            self._segments.append([int(name[:-len(SEGMENT_SUFFIX)]), path, os.path.getsize(path)])
+        try:
+            with open(os.path.join(self.directory, ACK_FILE)) as f:
+                self._acked = self._saved_ack = int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            self._acked = self._saved_ack = (self._segments[0][0] - 1) if self._segments else 0
+        if self._segments:
+            last = self._segments[-1]
+            last_seq, valid_end = last[0] - 1, 0
+            for seq, _body, end in self._scan(last[1], 0):
+                last_seq, valid_end = seq, end
+            if valid_end < last[2]:
+                _logger.warning("Truncating %s torn byte(s) at the end of spool segment %s.",
+                                last[2] - valid_end, last[1])
+                with open(last[1], "r+b") as f:
+                    f.truncate(valid_end)
+                last[2] = valid_end
+            self._next_seq = max(last_seq + 1, self._acked + 1)
+        else:
+            self._next_seq = self._acked + 1
+        self._acked = min(self._acked, self._next_seq - 1)
+        self._open_active()
+
+    def _scan(self, path, offset):
+        """Yield (seq, body, end offset) of the valid records of a segment from ``offset``"""
+        with open(path, "rb") as f:
+            f.seek(offset)
+            while True:
+                header = f.read(HEADER.size)
+                if len(header) < HEADER.size:
+                    return
+                seq, length, crc = HEADER.unpack(header)
+                body = f.read(length)
+                if len(body) < length or _crc(seq, body) != crc:
+                    return
+                offset += HEADER.size + length
+                yield seq, body, offset
+
+    def _open_active(self):
+        if not self._segments or self._segments[-1][2] >= self.segment_bytes:
+            path = os.path.join(self.directory, "%020d%s" % (self._next_seq, SEGMENT_SUFFIX))
+            self._segments.append([self._next_seq, path, 0])
+        self._file = open(self._segments[-1][1], "ab")
+
+    # -- writing --------------------------------------------------------
+
+    def append(self, record):
+        """Write one JSON-serialisable record; returns its sequence number"""
+        body = json.dumps(record, separators=(",", ":")).encode()
+        with self._lock:
+            if self._closed:
+                return 0
+            seq = self._next_seq
+            self._next_seq += 1
+            self._file.write(HEADER.pack(seq, len(body), _crc(seq, body)))
+            self._file.write(body)
+            self._segments[-1][2] += HEADER.size + len(body)
+            self._dirty = True
+            if not self.fsync_interval:
+                self._sync()
+            if self._segments[-1][2] >= self.segment_bytes:
+                self._rotate()
+            return seq
+
+    def _sync(self):
+        if self._dirty:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._dirty = False
+            self.fsyncs += 1
+
+    def _rotate(self):
+        self._sync()
+        self._file.close()
+        self._open_active()
+        self._trim()
+
+    def _trim(self):
+        """Drop fully acknowledged segments, then the oldest ones beyond max_bytes"""
+        while len(self._segments) > 1 and self._segments[1][0] - 1 <= self._acked:
+            self._remove_oldest()
+        while len(self._segments) > 1 and sum(segment[2] for segment in self._segments) > self.max_bytes:
+            lost = self._segments[1][0] - max(self._segments[0][0], self._acked + 1)
+            self.discarded += max(lost, 0)
+            self._acked = max(self._acked, self._segments[1][0] - 1)
+            _logger.warning("Weight spool exceeds %s bytes; discarded %s unreplayed frame(s) of %s.",
+                            self.max_bytes, max(lost, 0), self._segments[0][1])
+            self._remove_oldest()
+
+    def _remove_oldest(self):
+        first, path, _size = self._segments.pop(0)
+        if self._read_pos and self._read_pos[1] == first:
+            self._read_pos = None
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+    def _save_ack(self):
+        if self._acked == self._saved_ack:
+            return
+        path = os.path.join(self.directory, ACK_FILE)
+        with open(path + ".tmp", "w") as f:
+            f.write(str(self._acked))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+        self._saved_ack = self._acked
+
+    def _flush_loop(self):
+        last_ack_save = time.monotonic()
+        while not self._closed:
+            time.sleep(self.fsync_interval)
+            with self._lock:
+                if self._closed:
+                    return
+                try:
+                    self._sync()
+                    if time.monotonic() - last_ack_save >= ACK_SAVE_INTERVAL:
+                        last_ack_save = time.monotonic()
+                        self._save_ack()
+                except OSError:
+                    _logger.exception("Could not sync the weight spool in %s.", self.directory)
+
+    # -- reading --------------------------------------------------------
+
+    @property
+    def acked(self):
+        return self._acked
+
+    def ack(self, seq):
+        """Everything up to ``seq`` is committed; its segments may be deleted"""
+        with self._lock:
+            if self._closed or seq <= self._acked:
+                return
+            self._acked = min(seq, self._next_seq - 1)
+            self._trim()
+
+    def read(self, after=None, limit=1000):
+        """Up to ``limit`` (seq, record) pairs after ``after`` (default: the ack pointer)"""
+        with self._lock:
+            if self._closed:
+                return []
+            after = self._acked if after is None else after
+            if after >= self._next_seq - 1:
+                return []
+            self._file.flush()  # make buffered appends visible to the reader, no fsync needed
+            if self._read_pos and self._read_pos[0] == after:
+                _last, first, offset = self._read_pos
+            else:
+                first, offset = self._segments[0][0], 0
+                for segment in self._segments:
+                    if segment[0] <= after + 1:
+                        first = segment[0]
+            segments = [segment[:2] for segment in self._segments if segment[0] >= first]
+        records = []
+        for segment_first, path in segments:
+            if segment_first != first:
+                offset = 0
+            try:
+                for seq, body, end in self._scan(path, offset):
+                    if seq > after:
+                        records.append((seq, json.loads(body)))
+                        self._read_pos = (seq, segment_first, end)
+                        if len(records) >= limit:
+                            return records
+            except FileNotFoundError:
+                continue  # trimmed while reading
+        return records
+
+    def stats(self):
+        with self._lock:
+            return {
+                "spool_backlog": self._next_seq - 1 - self._acked,
+                "spool_bytes": sum(segment[2] for segment in self._segments),
+                "spool_segments": len(self._segments),
+                "spool_discarded": self.discarded,
+                "spool_fsyncs": self.fsyncs,
+            }
+
+    def backlog(self):
+        with self._lock:
+            return self._next_seq - 1 - self._acked
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            try:
+                self._sync()
+                self._file.close()
+                self._save_ack()
+            finally:
+                self._closed = True
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+                os.close(self._lock_fd)
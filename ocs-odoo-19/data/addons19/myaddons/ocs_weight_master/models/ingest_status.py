@@ -0,0 +1,73 @@
+from odoo import models, fields, api, _
+
+from .live_weight import LiveWeightStore
+from .mqtt_service import MqttWeightService, CONFIG_CHECK_INTERVAL, METRICS_INTERVAL
+
+
+class WeightIngestStatus(models.TransientModel):
+    _name = "weight.ingest.status"
+    _description = "MQTT Ingest Status"
+
+    leader = fields.Char(string="Leader", readonly=True, help="host:pid of the process holding the ingest lock")
+    leader_since = fields.Datetime(string="Leader Since", readonly=True)
+    connected = fields.Boolean(string="MQTT Connected", readonly=True)
+    broker = fields.Char(string="Broker", readonly=True)
+    topic = fields.Char(string="Topic", readonly=True)
+    received = fields.Integer(string="Frames Received", readonly=True)
+    history_rows = fields.Integer(string="Frames Stored", readonly=True)
+    dropped = fields.Integer(string="Frames Dropped", readonly=True)
+    write_errors = fields.Integer(string="Write Errors", readonly=True)
+    queue_depth = fields.Integer(string="Queue Depth", readonly=True)
+    spool_backlog = fields.Integer(string="Spool Backlog", readonly=True)
+    snapshot_age = fields.Float(string="Counters Age (s)", readonly=True,
+                                help="Age of the leader's counters shown here; they are broadcast every %s s" % METRICS_INTERVAL)
+    process = fields.Char(string="This Process", readonly=True)
+    designated = fields.Boolean(string="Ingest Process", readonly=True,
+                                help="Whether this process runs the MQTT service (MQTT_INGEST / ocs_weight_master_ingest)")
+    running = fields.Boolean(string="Running Here", readonly=True)
+    started_at = fields.Datetime(string="Started Here", readonly=True)
+
+    @api.model
+    def default_get(self, fields_list):
+        values = super().default_get(fields_list)
+        status = self.env['weight.latest'].get_ingest_status()
+        values.update({key: status.get(key) for key in (
+            'leader', 'leader_since', 'process', 'designated', 'running', 'started_at')})
+        # Counters and the session are the leader's; this process may be a standby
+        if status['is_leader']:
+            snapshot, age = dict(status, connected=MqttWeightService._connected), 0.0
+        else:
+            snapshot, age = LiveWeightStore.get_metrics(self.env.cr.dbname) or ({}, 0.0)
+        values.update({key: snapshot.get(key) or False for key in (
+            'connected', 'received', 'history_rows', 'dropped', 'write_errors', 'queue_depth', 'spool_backlog')})
+        values['snapshot_age'] = age
+        if status['broker']:
+            values.update(broker=status['broker'], topic=status['topic'])
+        else:
+            broker, port, topic = MqttWeightService._get_params(self.env)[:3]
+            values.update(broker="%s:%s" % (broker, port), topic=topic)
+        return values
+
+    def action_refresh(self):
+        return {
+            'type': 'ir.actions.act_window',
+            'name': _("MQTT Ingest Status"),
+            'res_model': self._name,
+            'view_mode': 'form',
+            'target': 'new',
+        }
+
+    def action_restart(self):
+        """Restart the MQTT service of every ingest process with the current settings"""
+        MqttWeightService.request_restart(self.env)
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _("Restart requested"),
+                'message': _("Ingest processes drain their queue and reconnect within %s seconds.", CONFIG_CHECK_INTERVAL),
+                'type': 'success',
+                'sticky': False,
+                'next': self.action_refresh(),
+            },
+        }
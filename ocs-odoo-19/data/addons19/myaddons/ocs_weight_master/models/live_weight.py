@@ -0,0 +1,171 @@
+import json
+import logging
+import select
+import threading
+import time
+from datetime import datetime
+
+from odoo import fields, sql_db
+
+_logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "ocs_weight_master_latest"
+METRICS_CHANNEL = "ocs_weight_master_metrics"
+LISTEN_TIMEOUT = 50      # seconds between wake-ups of an idle listener
+LISTEN_RETRY_DELAY = 5   # seconds to wait before reconnecting a failed listener
+DATETIME_KEYS = ("timestamp", "stable_since")
+
+
+class LiveWeightStore:
+    """Process-local copy of the latest weight, one entry per database and scale.
+
+    weight.latest.update_latest() sends a NOTIFY on NOTIFY_CHANNEL inside its
+    transaction; every process that reads from the store runs a listener
+    thread that applies those notifications, so each HTTP worker serves the
+    live weight from memory without a database round trip. The writing
+    process also updates its own copy from a post-commit hook.
+
+    Whenever a listener (re)connects, the entry for its database is dropped,
+    so readers fall back to the database until the next notification instead
+    of serving a value that may have been missed while disconnected.
+
+    The same listener keeps the ingest leader's latest metrics snapshot
+    (METRICS_CHANNEL), so the metrics endpoint can be served by any worker.
+    """
+
+    _lock = threading.Lock()
+    _values = {}      # dbname -> {scale_id: {"weight", "timestamp", ..., "updated_at"}}
+    _listeners = {}   # dbname -> listener thread
+    _metrics = {}     # dbname -> (leader metrics snapshot, received_at)
+
+    @classmethod
+    def get(cls, dbname, scale_id):
+        """Return the cached values of a scale plus their ``age``, or None when nothing is cached.
+
+        Values always hold ``weight`` and ``timestamp`` (the naive UTC datetime
+        stored on weight.latest) and, when known, the stability state
+        (``is_stable``, ``stable_weight``, ``stable_since``). ``age`` is the
+        number of seconds since the value was written.
+        """
+        cls.ensure_listening(dbname)
+        with cls._lock:
+            value = cls._values.get(dbname, {}).get(scale_id)
+        if value is None:
+            return None
+        result = dict(value)
+        result["age"] = max(time.time() - result.pop("updated_at"), 0.0)
+        return result
+
+    @classmethod
+    def set(cls, dbname, scale_id, values, updated_at=None):
+        """Store a scale's values, ignoring them if newer ones are already cached."""
+        if updated_at is None:
+            updated_at = time.time()
+        with cls._lock:
+            cached = cls._values.setdefault(dbname, {})
+            current = cached.get(scale_id)
+            if current and current["updated_at"] > updated_at:
+                return
+            cached[scale_id] = dict(values, updated_at=updated_at)
+
+    @classmethod
+    def forget(cls, dbname):
+        with cls._lock:
+            cls._values.pop(dbname, None)
+
+    @classmethod
+    def notify(cls, cr, scale_id, values):
+        """Publish a scale's new values to every process once ``cr`` commits."""
+        updated_at = time.time()
+        payload = json.dumps({
+            "scale_id": scale_id,
+            "values": {
+                key: fields.Datetime.to_string(value) if key in DATETIME_KEYS else value
+                for key, value in values.items()
+            },
+            "updated_at": updated_at,
+        })
+        cr.execute("SELECT pg_notify(%s, %s)", (NOTIFY_CHANNEL, payload))
+        dbname = cr.dbname
+        cr.postcommit.add(lambda: cls.set(dbname, scale_id, values, updated_at))
+
+    @classmethod
+    def notify_metrics(cls, cr, snapshot):
+        """Publish the ingest leader's metrics snapshot to every process once ``cr`` commits."""
+        cr.execute("SELECT pg_notify(%s, %s)", (METRICS_CHANNEL, json.dumps(snapshot)))
+
+    @classmethod
+    def get_metrics(cls, dbname):
+        """Return ``(snapshot, age)`` of the last leader metrics received, or None."""
+        cls.ensure_listening(dbname)
+        with cls._lock:
+            cached = cls._metrics.get(dbname)
+        if cached is None:
+            return None
+        snapshot, received_at = cached
+        return snapshot, max(time.time() - received_at, 0.0)
+
+    @classmethod
+    def ensure_listening(cls, dbname):
+        thread = cls._listeners.get(dbname)
+        if thread and thread.is_alive():
+            return
+        with cls._lock:
+            thread = cls._listeners.get(dbname)
+            if thread and thread.is_alive():
+                return
+            thread = threading.Thread(
+                target=cls._listen, args=(dbname,), daemon=True,
+                name=f"OCS-Weight-Master-Listener-{dbname}")
+            cls._listeners[dbname] = thread
+            thread.start()
+
+    @classmethod
+    def _apply(cls, dbname, payload):
+        try:
+            data = json.loads(payload)
+            values = {
+                key: (datetime.fromisoformat(value) if value else False) if key in DATETIME_KEYS else value
+                for key, value in data["values"].items()
+            }
+            cls.set(dbname, data["scale_id"], values, float(data["updated_at"]))
+        except Exception:
+            _logger.warning("Ignoring malformed live weight notification: %r", payload)
+
+    @classmethod
+    def _apply_metrics(cls, dbname, payload):
+        try:
+            snapshot = json.loads(payload)
+        except ValueError:
+            _logger.warning("Ignoring malformed ingest metrics notification.")
+            return
+        with cls._lock:
+            cls._metrics[dbname] = (snapshot, time.time())
+
+    @classmethod
+    def _listen(cls, dbname):
+        while True:
+            try:
+                with sql_db.db_connect(dbname).cursor() as cr:
+                    conn = cr._cnx
+                    cr.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                    cr.execute(f"LISTEN {METRICS_CHANNEL}")
+                    cr.commit()
+                    # Updates may have been missed before LISTEN took effect
+                    cls.forget(dbname)
+                    _logger.debug("Listening for live weight updates on %s.", dbname)
+                    while True:
+                        if select.select([conn], [], [], LISTEN_TIMEOUT) == ([], [], []):
+                            continue
+                        conn.poll()
+                        while conn.notifies:
+                            notify = conn.notifies.pop(0)
+                            if notify.channel == METRICS_CHANNEL:
+                                cls._apply_metrics(dbname, notify.payload)
+                            else:
+                                cls._apply(dbname, notify.payload)
+            except Exception:
+                cls.forget(dbname)
+                _logger.warning("Live weight listener for %s failed; retrying in %ss.",
+                                dbname, LISTEN_RETRY_DELAY, exc_info=True)
+                time.sleep(LISTEN_RETRY_DELAY)
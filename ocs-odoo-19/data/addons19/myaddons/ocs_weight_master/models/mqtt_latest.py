@@ -1,147 +1,331 @@
-from odoo import models, fields, api
-
-class MqttLatest(models.Model):
-    _name = "weight.latest"
-    _description = "Latest Weight Data (Temporary)"
-    _rec_name = "weight"
-    _table = "weight_latest"
-
-    weight = fields.Float(string="Latest MQTT Weight", digits=(16, 3), readonly=True)
-    timestamp = fields.Datetime(string="Timestamp", readonly=True)
-    raw_data = fields.Text(string="Raw Data", readonly=True)
-    input_weight = fields.Float(string="Weight", digits=(16, 3), help="Enter weight or click Fetch Data to get latest MQTT weight")
-
-    @api.model
-    def get_latest(self):
-        """Get or create the singleton record"""
-        record = self.search([], limit=1)
-        if not record:
-            record = self.create({
-                'weight': 0.0,
-                'timestamp': fields.Datetime.now(),
-                'raw_data': '',
-            })
-        return record
-
-    @api.model
-    def update_latest(self, weight, raw_data=None):
-        """Update the latest MQTT data"""
-        record = self.get_latest()
-        record.write({
-            'weight': weight,
-            'timestamp': fields.Datetime.now(),
-            'raw_data': raw_data or '',
-        })
-        return record
-
-    def action_fetch_data(self):
-        """Fetch latest MQTT weight data into the input field"""
-        self.ensure_one()
-        # Get the latest MQTT data (singleton record)
-        latest_record = self.get_latest()
-        
-        # Invalidate cache to get fresh data from database
-        latest_record.invalidate_recordset(['weight', 'timestamp'])
-        
-        # Read fresh data directly from database using SQL to bypass cache
-        self.env.cr.execute("""
-            SELECT weight, timestamp 
-            FROM weight_latest 
-            WHERE id = %s
-        """, (latest_record.id,))
-        result = self.env.cr.fetchone()
-        
-        if result:
-            fresh_weight, fresh_timestamp = result
-            
-            # Update all fields including readonly ones using sudo
-            self.sudo().write({
-                'input_weight': fresh_weight,
-                'weight': fresh_weight,
-                'timestamp': fresh_timestamp,
-            })
-            
-            message = f'Weight {fresh_weight} fetched from MQTT'
-        else:
-            message = 'No MQTT data found'
-        
-        # Return action to reload the form with updated data
-        # This will refresh the form and show the updated values
-        return {
-            'type': 'ir.actions.act_window',
-            'name': 'Entrance Form',
-            'res_model': 'weight.latest',
-            'res_id': self.id,
-            'view_mode': 'form',
-            'view_id': self.env.ref('ocs_weight_master.view_mqtt_latest_form').id,
-            'target': 'current',
-        }
-
-    def action_refresh_data(self):
-        """Refresh the form with latest MQTT data - only updates weight and timestamp"""
-        self.ensure_one()
-        # Store old values
-        old_weight = self.weight
-        old_timestamp = self.timestamp
-        
-        # Invalidate cache and read fresh data
-        self.invalidate_recordset(['weight', 'timestamp'])
-        
-        # Read fresh data from database by browsing the record again
-        fresh_record = self.browse(self.id)
-        
-        # Update the record with fresh data
-        if fresh_record.weight != old_weight or fresh_record.timestamp != old_timestamp:
-            self.write({
-                'weight': fresh_record.weight,
-                'timestamp': fresh_record.timestamp,
-            })
-            message = f'Weight updated to {fresh_record.weight}'
-        else:
-            message = f'Weight is already up to date: {fresh_record.weight}'
-        
-        # Return notification without reloading the form
-        # The form will automatically update because we wrote to the record
-        return {
-            'type': 'ir.actions.client',
-            'tag': 'display_notification',
-            'params': {
-                'title': 'Refreshed',
-                'message': message,
-                'type': 'success',
-                'sticky': False,
-            }
-        }
-
-    def action_save_to_record(self):
-        """Save the input weight data to weight.record"""
-        self.ensure_one()
-        # Use input_weight if available, otherwise use weight
-        weight_to_save = self.input_weight if self.input_weight else self.weight
-        
-        if not weight_to_save or weight_to_save == 0:
-            return {
-                'type': 'ir.actions.client',
-                'tag': 'display_notification',
-                'params': {
-                    'title': 'Warning',
-                    'message': 'No weight data to save.',
-                    'type': 'warning',
-                    'sticky': False,
-                }
-            }
-        weight_record = self.env['weight.record'].create({
-            'weight': weight_to_save,
-            'source': 'mqtt',
-        })
-        return {
-            'type': 'ir.actions.client',
-            'tag': 'display_notification',
-            'params': {
-                'title': 'Saved',
-                'message': f'Weight {weight_to_save} saved successfully.',
-                'type': 'success',
-                'sticky': False,
-            }
-        }
-
+import time
+from datetime import datetime, timezone
+
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+from .ingest_metrics import Exposition
+from .live_weight import LiveWeightStore
+from .mqtt_service import MqttWeightService, METRICS_INTERVAL
+from .weighbridge_scale import MAX_STABLE_WAIT
+
+# Bus channel the mqtt_form view subscribes to for live weight updates
+BUS_CHANNEL = "ocs_weight_master.weight_latest"
+BUS_NOTIFICATION_TYPE = "ocs_weight_master/weight_latest"
+
+class MqttLatest(models.Model):
+    _name = "weight.latest"
+    _description = "Latest Weight Data (Temporary)"
+    _rec_name = "weight"
+    _table = "weight_latest"
+
+    weight = fields.Float(string="Latest MQTT Weight", digits=(16, 3), readonly=True)
+    timestamp = fields.Datetime(string="Timestamp", readonly=True)
+    raw_data = fields.Text(string="Raw Data", readonly=True)
+    input_weight = fields.Float(string="Weight", digits=(16, 3), help="Enter weight or click Fetch Data to get latest MQTT weight")
+    scale_id = fields.Many2one('weighbridge.scale', string="Scale", readonly=True, ondelete='cascade')
+    
+    # Stability state computed by the ingest path for every frame
+    is_stable = fields.Boolean(string="Stable", readonly=True)
+    stable_weight = fields.Float(string="Stable Weight", digits=(16, 3), readonly=True)
+    stable_since = fields.Datetime(string="Stable Since", readonly=True)
+
+    _scale_uniq = models.Constraint('UNIQUE(scale_id)', "Each scale has a single latest weight row.")
+
+    @api.model
+    def get_latest(self, scale=None):
+        """Get or create the latest weight record of a scale (default scale if none given)"""
+        scale = scale or self.env['weighbridge.scale']._get_default_scale()
+        record = self.search([('scale_id', '=', scale.id)], limit=1)
+        if not record:
+            # Adopt the row created before scales existed, if any
+            record = self.search([('scale_id', '=', False)], limit=1)
+            if record:
+                record.scale_id = scale
+        if not record:
+            record = self.create({
+                'weight': 0.0,
+                'timestamp': fields.Datetime.now(),
+                'raw_data': '',
+                'scale_id': scale.id,
+            })
+        return record
+
+    @api.model
+    def update_latest(self, weight, raw_data=None, scale_code=None, stability=None, persist=True):
+        """Update the latest MQTT data and publish it to every worker's live weight store.
+
+        ``scale_code`` routes the value to that scale's row through the cached
+        weighbridge.scale index; without it the default scale is updated.
+        ``stability`` holds the detector state (is_stable, stable_weight, stable_since).
+        Open mqtt_form views are notified over the bus only when the weight
+        actually changes, so browser traffic follows the scale, not the frame rate.
+        With ``persist=False`` (the scale's write policy saw nothing new) the
+        row is left alone and only the live weight stores are refreshed.
+        """
+        if scale_code:
+            record = self.browse(self.env['weighbridge.scale']._get_latest_id(scale_code))
+            scale_id = self.env['weighbridge.scale']._get_scale_id(scale_code)
+        else:
+            record = self.get_latest()
+            scale_id = record.scale_id.id
+        changed = persist and record.weight != weight
+        timestamp = fields.Datetime.now()
+        values = {
+            'weight': weight,
+            'timestamp': timestamp,
+            **(stability or {}),
+        }
+        if persist:
+            record.write(dict(values, raw_data=raw_data or ''))
+        LiveWeightStore.notify(self.env.cr, scale_id, values)
+        if changed:
+            self.env['bus.bus']._sendone(BUS_CHANNEL, BUS_NOTIFICATION_TYPE, {
+                'id': record.id,
+                'scale_id': scale_id,
+                'weight': weight,
+                'timestamp': fields.Datetime.to_string(timestamp),
+                'is_stable': values.get('is_stable', False),
+            })
+        return record
+
+    @api.model
+    def get_live_weight(self, scale=None):
+        """Return the latest values of a scale from process memory.
+
+        The result holds weight, timestamp, is_stable, stable_weight,
+        stable_since and age (seconds). Falls back to a single query (and seeds
+        the store with its result) when this worker has not received a value
+        since its listener connected.
+        """
+        scale = scale or self.env['weighbridge.scale']._get_default_scale()
+        dbname = self.env.cr.dbname
+        live = LiveWeightStore.get(dbname, scale.id)
+        if live is not None:
+            return live
+        self.env.cr.execute("""
+            SELECT weight, timestamp, is_stable, stable_weight, stable_since
+            FROM weight_latest
+            WHERE scale_id = %s
+        """, (scale.id,))
+        result = self.env.cr.dictfetchone()
+        if not result:
+            return None
+        timestamp = result['timestamp']
+        updated_at = timestamp.replace(tzinfo=timezone.utc).timestamp() if timestamp else None
+        LiveWeightStore.set(dbname, scale.id, result, updated_at)
+        return LiveWeightStore.get(dbname, scale.id)
+
+    @api.model
+    def get_capture_weight(self, scale=None):
+        """Return the live values a fetch button should capture for a scale.
+
+        When the scale requires a stable reading, wait up to its stable wait
+        time (at most MAX_STABLE_WAIT) for the detector to settle and capture
+        the stable weight, or raise if it does not settle in time. The wait
+        polls the in-memory live weight store only, which the NOTIFY listener
+        keeps current: this transaction's snapshot would never show a newer
+        row.
+        """
+        scale = scale or self.env['weighbridge.scale']._get_default_scale()
+        live = self.get_live_weight(scale)
+        if not live or not scale.require_stable:
+            return live
+        dbname = self.env.cr.dbname
+        deadline = time.monotonic() + min(scale.stable_wait or 0.0, MAX_STABLE_WAIT)
+        while not live.get('is_stable') and time.monotonic() < deadline:
+            time.sleep(0.1)
+            live = LiveWeightStore.get(dbname, scale.id) or live
+        if not live.get('is_stable'):
+            raise UserError(_("Scale %s is not stable yet. Wait for the weight to settle and try again.", scale.name))
+        return dict(live, weight=live['stable_weight'])
+
+    @api.model
+    def get_ingest_status(self):
+        """Which process leads MQTT ingestion, plus this process's ingest counters"""
+        status = MqttWeightService.status(self.env.cr)
+        status['leader_since'] = fields.Datetime.to_string(status['leader_since']) if status['leader_since'] else False
+        status['started_at'] = fields.Datetime.to_string(
+            datetime.fromtimestamp(status['started_at'], timezone.utc).replace(tzinfo=None)) if status['started_at'] else False
+        return status
+
+    @api.model
+    def _render_metrics(self):
+        """Ingest metrics in the Prometheus text format.
+
+        Counters and histograms come from the ingest leader: read directly
+        when this process leads, otherwise from the snapshot it broadcasts
+        every METRICS_INTERVAL seconds. Per-scale ages are read from the
+        database so they are right whichever worker answers.
+        """
+        out = Exposition()
+        if MqttWeightService._lock_cr is not None:
+            snapshot, age = MqttWeightService.metrics_snapshot(), 0.0
+        else:
+            snapshot, age = LiveWeightStore.get_metrics(self.env.cr.dbname) or (None, None)
+        fresh = snapshot is not None and age <= 3 * METRICS_INTERVAL
+        out.gauge("ocs_weight_ingest_leader_up", "1 when an ingest leader reported within the last three intervals", fresh)
+        if snapshot is not None:
+            out.gauge("ocs_weight_ingest_snapshot_age_seconds", "Age of the leader metrics served here", age)
+            out.gauge("ocs_weight_ingest_leader_info", "Process currently leading ingestion", 1,
+                      {"process": snapshot["process"]})
+            out.gauge("ocs_weight_mqtt_connected", "1 while the leader's MQTT session is up", snapshot["connected"])
+            for name, key, help_text in (
+                ("ocs_weight_ingest_frames_received_total", "received", "Frames received from MQTT or direct sources"),
+                ("ocs_weight_ingest_frames_failed_total", "parse_failed", "Frames that could not be decoded"),
+                ("ocs_weight_ingest_frames_dropped_total", "dropped", "Frames evicted from the full ingest queue"),
+                ("ocs_weight_ingest_frames_unknown_scale_total", "unknown_scale", "Frames of unregistered scales, dropped"),
+                ("ocs_weight_ingest_frames_written_total", "history_rows", "Frames committed to weight.history"),
+                ("ocs_weight_ingest_latest_updates_total", "written", "weight.latest updates after coalescing"),
+                ("ocs_weight_ingest_latest_skipped_total", "latest_skipped", "weight.latest writes saved by the write policy"),
+                ("ocs_weight_ingest_transactions_total", "transactions", "Writer commits"),
+                ("ocs_weight_ingest_write_errors_total", "write_errors", "Writer batches that failed on a database error"),
+                ("ocs_weight_spool_frames_appended_total", "spooled", "Frames appended to the write-ahead spool"),
+                ("ocs_weight_spool_append_errors_total", "spool_errors", "Frames that could not be appended to the spool"),
+                ("ocs_weight_spool_frames_replayed_total", "replayed", "Frames committed from the spool by a replay"),
+                ("ocs_weight_spool_duplicates_total", "duplicates", "Replayed frames already in weight.history"),
+                ("ocs_weight_spool_frames_discarded_total", "spool_discarded", "Unreplayed frames discarded by the spool's disk bound"),
+                ("ocs_weight_spool_fsyncs_total", "spool_fsyncs", "Spool group fsyncs"),
+                ("ocs_weight_mqtt_reconnects_total", "reconnects", "MQTT connections after the first one"),
+                ("ocs_weight_mqtt_redelivered_total", "redelivered", "QoS 1 messages dropped as already received"),
+                ("ocs_weight_mqtt_disconnects_total", "disconnects", "MQTT sessions lost"),
+            ):
+                out.counter(name, help_text, snapshot.get(key, 0))
+            out.counter("ocs_weight_ingest_frames_parsed_total", "Frames decoded successfully",
+                        snapshot.get("received", 0) - snapshot.get("parse_failed", 0))
+            out.gauge("ocs_weight_ingest_queue_depth", "Frames waiting for the writer", snapshot["queue_depth"])
+            out.gauge("ocs_weight_ingest_queue_capacity", "Size of the ingest queue", snapshot["queue_capacity"])
+            out.gauge("ocs_weight_spool_backlog_frames", "Spooled frames not committed yet", snapshot.get("spool_backlog", 0))
+            out.gauge("ocs_weight_spool_bytes", "Disk used by the spool segments", snapshot.get("spool_bytes", 0))
+            out.gauge("ocs_weight_ingest_last_commit_seconds", "Duration of the last writer commit",
+                      snapshot.get("last_commit_ms", 0.0) / 1000.0)
+            for name, help_text in (
+                ("receive", "Payload timestamp to receipt by the leader"),
+                ("commit", "Receipt to writer commit"),
+                ("end_to_end", "Payload timestamp to writer commit"),
+            ):
+                if name in snapshot.get("histograms", {}):
+                    out.histogram("ocs_weight_ingest_%s_latency_seconds" % name, help_text, snapshot["histograms"][name])
+
+        self.env.cr.execute("""
+            SELECT s.code, l.weight, l.is_stable, EXTRACT(EPOCH FROM (now() AT TIME ZONE 'UTC') - l.timestamp)
+              FROM weight_latest l
+              JOIN weighbridge_scale s ON s.id = l.scale_id
+             WHERE s.active AND l.timestamp IS NOT NULL
+          ORDER BY s.code
+        """)
+        rows = self.env.cr.fetchall()
+        for code, weight, is_stable, age in rows:
+            out.gauge("ocs_weight_latest_age_seconds", "Seconds since the scale's latest weight was written",
+                      max(float(age), 0.0), {"scale": code})
+        for code, weight, is_stable, age in rows:
+            out.gauge("ocs_weight_latest_weight", "Latest weight of the scale", weight, {"scale": code})
+        for code, weight, is_stable, age in rows:
+            out.gauge("ocs_weight_latest_stable", "1 while the scale's weight is stable", bool(is_stable), {"scale": code})
+        return out.render()
+
+    def unlink(self):
+        res = super().unlink()
+        # Drop cached scale -> row routing
+        self.env.registry.clear_cache()
+        return res
+
+    def action_fetch_data(self):
+        """Fetch latest MQTT weight data into the input field"""
+        self.ensure_one()
+        # Served from the process-local live weight store, no DB round trip
+        live = self.get_capture_weight(self.scale_id)
+        
+        if live:
+            fresh_weight, fresh_timestamp = live['weight'], live['timestamp']
+            
+            # Update all fields including readonly ones using sudo
+            self.sudo().write({
+                'input_weight': fresh_weight,
+                'weight': fresh_weight,
+                'timestamp': fresh_timestamp,
+            })
+            
+            message = f'Weight {fresh_weight} fetched from MQTT'
+        else:
+            message = 'No MQTT data found'
+        
+        # Return action to reload the form with updated data
+        # This will refresh the form and show the updated values
+        return {
+            'type': 'ir.actions.act_window',
+            'name': 'Entrance Form',
+            'res_model': 'weight.latest',
+            'res_id': self.id,
+            'view_mode': 'form',
+            'view_id': self.env.ref('ocs_weight_master.view_mqtt_latest_form').id,
+            'target': 'current',
+        }
+
+    def action_refresh_data(self):
+        """Refresh the form with latest MQTT data - only updates weight and timestamp"""
+        self.ensure_one()
+        # Store old values
+        old_weight = self.weight
+        old_timestamp = self.timestamp
+        
+        # Invalidate cache and read fresh data
+        self.invalidate_recordset(['weight', 'timestamp'])
+        
+        # Read fresh data from database by browsing the record again
+        fresh_record = self.browse(self.id)
+        
+        # Update the record with fresh data
+        if fresh_record.weight != old_weight or fresh_record.timestamp != old_timestamp:
+            self.write({
+                'weight': fresh_record.weight,
+                'timestamp': fresh_record.timestamp,
+            })
+            message = f'Weight updated to {fresh_record.weight}'
+        else:
+            message = f'Weight is already up to date: {fresh_record.weight}'
+        
+        # Return notification without reloading the form
+        # The form will automatically update because we wrote to the record
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': 'Refreshed',
+                'message': message,
+                'type': 'success',
+                'sticky': False,
+            }
+        }
+
+    def action_save_to_record(self):
+        """Save the input weight data to weight.record"""
+        self.ensure_one()
+        # Use input_weight if available, otherwise use weight
+        weight_to_save = self.input_weight if self.input_weight else self.weight
+        
+        if not weight_to_save or weight_to_save == 0:
+            return {
+                'type': 'ir.actions.client',
+                'tag': 'display_notification',
+                'params': {
+                    'title': 'Warning',
+                    'message': 'No weight data to save.',
+                    'type': 'warning',
+                    'sticky': False,
+                }
+            }
+        weight_record = self.env['weight.record'].create({
+            'weight': weight_to_save,
+            'source': 'mqtt',
+        })
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': 'Saved',
+                'message': f'Weight {weight_to_save} saved successfully.',
+                'type': 'success',
+                'sticky': False,
+            }
+        }
+
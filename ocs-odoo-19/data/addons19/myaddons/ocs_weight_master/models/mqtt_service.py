@@ -1,23 +1,73 @@
 import json
 import logging
 import os
+import queue
+import socket
 import threading
 import time
+from collections import deque, namedtuple
 from datetime import datetime, timezone
 
 import paho.mqtt.client as mqtt
 
-from odoo import api, SUPERUSER_ID
+from odoo import api, sql_db, SUPERUSER_ID
+from odoo.service import server as odoo_server
+from odoo.tools import config
+
+from .ingest_dedupe import RecentKeys
+from .ingest_metrics import Histogram
+from .ingest_sources import DirectSourceReader, build_source
+from .ingest_spool import Spool, SpoolLocked
+from .live_weight import LiveWeightStore
+from .stability import StabilityDetector
 
 _logger = logging.getLogger(__name__)
 
 # Defaults; can be overridden with environment variables, system parameters, or defaults
 DEFAULT_BROKER = "192.168.101.85"
 DEFAULT_PORT = 1883
-DEFAULT_TOPIC = "weight/master"
+DEFAULT_TOPIC = "weight/+"  # one subtopic per scale, e.g. weight/master
 DEFAULT_KEEPALIVE = 60
 DEFAULT_USERNAME = None
 DEFAULT_PASSWORD = None
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_QOS = 0              # 1 = at-least-once with a persistent session
+DEFAULT_SPOOL_MAX_MB = 512     # disk bound of the write-ahead spool; 0 disables it
+DEFAULT_SPOOL_FSYNC_MS = 100   # group fsync interval of the spool; 0 = fsync every frame
+
+# Writer thread tuning
+WRITER_BATCH_SIZE = 1000     # max frames drained from the queue per transaction
+WRITER_POLL_TIMEOUT = 1.0    # seconds to block on an empty queue before re-checking the stop flag
+WRITER_RETRY_DELAY = 5       # seconds to wait before reopening the cursor after a DB error
+LATENCY_SAMPLES = 10000      # most recent publish-to-commit latencies kept for percentiles
+
+# Observability: the leader broadcasts its counters so any worker can serve
+# /ocs_weight_master/metrics, and logs one summary line per interval
+# instead of a line per batch.
+METRICS_INTERVAL = 10        # seconds between metrics snapshots sent by the leader
+SUMMARY_INTERVAL = 60        # seconds between aggregated ingest log lines
+LOG_EVERY = 1000             # repeated warnings (parse failures, drops) are logged on the 1st and every Nth
+
+# Leader election: exactly one process per database holds this session-level
+# advisory lock and runs the MQTT client; the others stand by and retry.
+LEADER_LOCK_KEY = 0x4F43535747484D51  # "OCSWGHMQ"
+LEADER_RETRY_INTERVAL = 5    # seconds between lock attempts of a standby (bounds failover time)
+LEADER_CHECK_INTERVAL = 5    # seconds between liveness checks of the leader's lock connection
+LEADER_APP_NAME = "ocs-weight-master-leader"
+
+CONFIG_CHECK_INTERVAL = 10   # seconds between checks of the MQTT settings by the supervisor
+DRAIN_TIMEOUT = 10           # seconds a stopping leader waits for the writer to empty the queue
+STOP_TIMEOUT = 30            # seconds stop() waits for the threads to end
+RESTART_PARAM = "ocs_weight_master.mqtt_restart"  # bumped to make every listener restart
+
+# One decoded reading; device_ts is the indicator-side timestamp in epoch milliseconds,
+# seq its position in the write-ahead spool (0 when it was not spooled)
+Frame = namedtuple("Frame", ["scale_code", "weight", "payload", "received_at", "device_ts", "seq"], defaults=(0,))
+
+
+def _ms_to_datetime(ms):
+    """Epoch milliseconds -> naive UTC datetime, as stored in Datetime columns"""
+    return datetime.fromtimestamp(ms / 1000.0, timezone.utc).replace(tzinfo=None)
 
 
 class MqttWeightService:
@@ -25,12 +75,83 @@ class MqttWeightService:
 
     Reads JSON payloads like:
       {"weight":84,"raw":"000000","hex":"...","timestamp":1763808861091}
-    and stores them in weight.record.
+    and stores them in the weight.latest row of the scale named by the last
+    topic level (weight/<scale>) or by an optional "scale" key in the payload.
+    One client and one writer serve every scale. Scales whose source is a
+    serial port or a TCP serial server skip Node-RED and MQTT: the leader
+    reads and decodes their XK3190-D10 frames itself (see ingest_sources.py)
+    and feeds them into the same queue.
+
+    The paho network thread only decodes frames and pushes them into a bounded
+    in-memory queue. A dedicated writer thread drains that queue with a single
+    long-lived cursor and coalesces each burst into its newest value, so one
+    slow commit can no longer stall the MQTT network loop. Before coalescing,
+    every frame goes through its scale's StabilityDetector, so the persisted
+    row also carries the stable weight, and every frame is appended to the
+    weight.history stream in one bulk insert per batch.
+
+    Every process starts the service, but only the one holding the
+    LEADER_LOCK_KEY advisory lock connects to the broker; standbys retry the
+    lock every LEADER_RETRY_INTERVAL seconds and take over when the leader's
+    connection (and so its lock) goes away.
+
+    With ocs_weight_master.mqtt_qos = 1 the client subscribes at QoS 1 under
+    a stable client ID (shared by whichever process leads) without a clean
+    session, so the broker queues what is published while the leader is
+    disconnected or changing and delivers it on reconnect. Redelivered
+    messages are dropped by a bounded RecentKeys set keyed on scale,
+    timestamp and frame hex.
+
+    The leader appends every decoded frame to a local write-ahead spool
+    (ingest_spool.py) before queueing it and acknowledges it there once the
+    writer has committed it. When a batch fails, frames are evicted from the
+    full queue, or the process restarts with frames left on disk, the writer
+    switches to replay: it reads the spool from the ack pointer in batches
+    and inserts them with duplicates (same scale and indicator timestamp)
+    filtered out. A leader that loses its database connection keeps the
+    MQTT session and the spool going until the database is back, and only
+    steps down when another process holds the lock by then.
+
+    Only designated processes run it (see _designated()): registries loaded
+    by odoo shell, upgrade or test runs and cron-only workers stay idle.
+    There a supervisor thread starts the service and re-reads its settings
+    every CONFIG_CHECK_INTERVAL seconds; when the broker, topic,
+    credentials, session, spool or direct sources change, or a restart is
+    requested, it stops the service (the queue is drained and the spool
+    closed first) and starts it again with the new settings.
     """
 
     _thread = None
+    _writer_thread = None
     _stop_flag = False
     _client = None
+    _queue = None
+    _stats_lock = threading.Lock()
+    _stats = {}
+    _lock_cr = None       # cursor whose session holds the leader lock
+    _leader_since = None
+    _detectors = {}   # scale code -> (settings, StabilityDetector), owned by the writer thread
+    _latencies = deque(maxlen=LATENCY_SAMPLES)  # ms from device timestamp to commit, per frame
+    latency_window = LATENCY_SAMPLES
+    _histograms = {}      # name -> Histogram of per-frame latencies in seconds
+    _connected = False    # MQTT session up
+    _last_metrics = 0.0   # monotonic time of the last metrics broadcast
+    _last_summary = None  # (monotonic time, stats) at the last summary line
+    _spool = None         # write-ahead Spool while this process leads
+    _ingest_lock = threading.Lock()  # keeps spool order and queue order the same
+    _replay = False       # writer must catch up from the spool before using the queue
+    _fed_seq = 0          # highest spool seq fed to the stability detectors
+    _recent = None        # RecentKeys of QoS 1 messages, owned by the paho thread
+    _persisted = {}       # scale code -> (received_at, weight, is_stable, stable_weight) last written to weight.latest
+    _unknown_scales = set()  # codes of unregistered scales already logged
+    _stop_event = threading.Event()  # set by stop(); wakes the listener thread out of its waits
+    _writer_stop = False  # set once the listener is gone, so the writer can drain the queue first
+    _in_flight = 0        # frames taken by the writer and not committed yet
+    _supervisor = None
+    _supervisor_event = threading.Event()  # set to stop the supervisor
+    _registry = None      # newest registry of this process, used by the supervisor
+    _config = None        # settings the running service was started with
+    _started_at = None
 
     @classmethod
     def _get_params(cls, env):
@@ -38,7 +159,7 @@ class MqttWeightService:
         Priority: Environment variables > System parameters > Defaults
         """
         ICP = env["ir.config_parameter"].sudo()
-        
+
         # Check environment variables first (from docker-compose)
         broker = os.getenv("MQTT_BROKER") or ICP.get_param("ocs_weight_master.mqtt_broker", DEFAULT_BROKER)
         port_str = os.getenv("MQTT_PORT") or ICP.get_param("ocs_weight_master.mqtt_port", str(DEFAULT_PORT))
@@ -46,23 +167,735 @@ class MqttWeightService:
         keepalive_str = os.getenv("MQTT_KEEPALIVE") or ICP.get_param("ocs_weight_master.mqtt_keepalive", str(DEFAULT_KEEPALIVE))
         username = os.getenv("MQTT_USERNAME") or ICP.get_param("ocs_weight_master.mqtt_username", DEFAULT_USERNAME)
         password = os.getenv("MQTT_PASSWORD") or ICP.get_param("ocs_weight_master.mqtt_password", DEFAULT_PASSWORD)
-        
+        queue_size_str = os.getenv("MQTT_QUEUE_SIZE") or ICP.get_param("ocs_weight_master.mqtt_queue_size", str(DEFAULT_QUEUE_SIZE))
+
         try:
             port = int(port_str)
         except (ValueError, TypeError):
             port = DEFAULT_PORT
-            
+
         try:
             keepalive = int(keepalive_str)
         except (ValueError, TypeError):
             keepalive = DEFAULT_KEEPALIVE
-        
-        auth_info = f"with user '{username}'" if username else "without authentication"
-        _logger.info("MQTT Configuration - Broker: %s, Port: %s, Topic: %s, %s (from %s)", 
-                    broker, port, topic, auth_info,
-                    "environment" if os.getenv("MQTT_BROKER") else "config_parameter")
-        
-        return broker, port, topic, keepalive, username, password
+
+        try:
+            queue_size = max(int(queue_size_str), 1)
+        except (ValueError, TypeError):
+            queue_size = DEFAULT_QUEUE_SIZE
+
+        return broker, port, topic, keepalive, username, password, queue_size
+
+    @classmethod
+    def _get_spool_params(cls, env):
+        """Directory, disk bound in bytes and fsync interval of the spool; None when disabled."""
+        ICP = env["ir.config_parameter"].sudo()
+        directory = (os.getenv("MQTT_SPOOL_DIR") or ICP.get_param("ocs_weight_master.spool_dir")
+                     or os.path.join(config["data_dir"], "ocs_weight_master", "spool", env.cr.dbname))
+        max_mb_str = os.getenv("MQTT_SPOOL_MAX_MB") or ICP.get_param("ocs_weight_master.spool_max_mb", str(DEFAULT_SPOOL_MAX_MB))
+        fsync_ms_str = os.getenv("MQTT_SPOOL_FSYNC_MS") or ICP.get_param("ocs_weight_master.spool_fsync_ms", str(DEFAULT_SPOOL_FSYNC_MS))
+
+        try:
+            max_mb = int(max_mb_str)
+        except (ValueError, TypeError):
+            max_mb = DEFAULT_SPOOL_MAX_MB
+
+        try:
+            fsync_ms = max(int(fsync_ms_str), 0)
+        except (ValueError, TypeError):
+            fsync_ms = DEFAULT_SPOOL_FSYNC_MS
+
+        if max_mb <= 0:
+            return None
+        return directory, max_mb * 1024 * 1024, fsync_ms / 1000.0
+
+    @classmethod
+    def _get_session_params(cls, env):
+        """Subscription QoS and client ID; QoS 1 implies a persistent session."""
+        ICP = env["ir.config_parameter"].sudo()
+        qos_str = os.getenv("MQTT_QOS") or ICP.get_param("ocs_weight_master.mqtt_qos", str(DEFAULT_QOS))
+        # One ID per database, whichever process leads, so a new leader resumes the same session
+        client_id = (os.getenv("MQTT_CLIENT_ID") or ICP.get_param("ocs_weight_master.mqtt_client_id")
+                     or f"ocs-weight-master-{env.cr.dbname}")
+
+        try:
+            qos = min(max(int(qos_str), 0), 1)
+        except (ValueError, TypeError):
+            qos = DEFAULT_QOS
+
+        return qos, client_id
+
+    @classmethod
+    def _get_config(cls, env):
+        """Everything start() reads, to compare against the running service; values only, no secrets logged"""
+        return (
+            cls._get_params(env),
+            cls._get_spool_params(env),
+            cls._get_session_params(env),
+            cls._get_direct_config(env.cr),
+            env["ir.config_parameter"].sudo().get_param(RESTART_PARAM),
+        )
+
+    @classmethod
+    def _get_direct_config(cls, cr):
+        """Settings of the serial/TCP scales, read quietly (no per-scale warnings) for change detection"""
+        cr.execute("""
+            SELECT code, source, serial_device, baudrate, tcp_host, tcp_port
+              FROM weighbridge_scale
+             WHERE active AND source IN ('serial', 'tcp')
+          ORDER BY id
+        """)
+        return tuple(cr.fetchall())
+
+    @classmethod
+    def _reset_stats(cls):
+        with cls._stats_lock:
+            cls._stats = {
+                "received": 0,       # frames delivered by the broker
+                "parse_failed": 0,   # frames that could not be decoded
+                "dropped": 0,        # frames evicted because the queue was full
+                "written": 0,        # latest rows updated (after coalescing)
+                "history_rows": 0,   # frames appended to weight.history
+                "coalesced": 0,      # frames superseded by a newer one in the same batch
+                "transactions": 0,   # writer commits
+                "write_errors": 0,   # writer batches lost to a DB error
+                "last_commit_ms": 0.0,
+                "connects": 0,       # successful MQTT (re)connections
+                "reconnects": 0,     # connections after the first one
+                "disconnects": 0,    # MQTT sessions lost
+                "spooled": 0,        # frames appended to the write-ahead spool
+                "spool_errors": 0,   # frames that could not be appended (queued without durability)
+                "replayed": 0,       # frames committed from the spool by a replay
+                "duplicates": 0,     # replayed frames already in weight.history
+                "redelivered": 0,    # QoS 1 messages dropped as already received
+                "latest_skipped": 0, # latest row writes saved by the scales' deadband/heartbeat policy
+                "unknown_scale": 0,  # frames of unregistered scales, dropped
+            }
+            cls._latencies = deque(maxlen=cls.latency_window)
+            cls._histograms = {
+                "receive": Histogram(),     # payload timestamp -> received by this process
+                "commit": Histogram(),      # received -> committed
+                "end_to_end": Histogram(),  # payload timestamp -> committed
+            }
+            cls._last_summary = None
+
+    @classmethod
+    def _incr(cls, key, amount=1):
+        with cls._stats_lock:
+            cls._stats[key] = cls._stats.get(key, 0) + amount
+
+    @classmethod
+    def stats(cls):
+        """Return a snapshot of the ingest counters plus the current queue depth."""
+        with cls._stats_lock:
+            stats = dict(cls._stats)
+        q = cls._queue
+        stats["queue_depth"] = q.qsize() if q is not None else 0
+        stats["queue_capacity"] = q.maxsize if q is not None else 0
+        spool = cls._spool
+        stats.update(spool.stats() if spool is not None else {
+            "spool_backlog": 0, "spool_bytes": 0, "spool_segments": 0, "spool_discarded": 0, "spool_fsyncs": 0})
+        latencies = sorted(cls.latency_samples())
+        for name, pct in (("latency_p50_ms", 0.50), ("latency_p99_ms", 0.99)):
+            stats[name] = latencies[min(int(len(latencies) * pct), len(latencies) - 1)] if latencies else 0.0
+        return stats
+
+    @classmethod
+    def metrics_snapshot(cls):
+        """Counters, connection state and latency histograms of this process, JSON-serialisable."""
+        stats = cls.stats()
+        with cls._stats_lock:
+            histograms = {name: histogram.snapshot() for name, histogram in cls._histograms.items()}
+        return dict(
+            stats,
+            process=cls._identity(),
+            is_leader=cls._lock_cr is not None,
+            connected=cls._connected,
+            histograms=histograms,
+            generated_at=time.time(),
+        )
+
+    @classmethod
+    def _report(cls, registry):
+        """Leader only: broadcast a metrics snapshot and log the periodic summary."""
+        if cls._lock_cr is None:
+            return
+        now = time.monotonic()
+        if now - cls._last_metrics >= METRICS_INTERVAL:
+            cls._last_metrics = now
+            try:
+                with registry.cursor() as cr:
+                    LiveWeightStore.notify_metrics(cr, cls.metrics_snapshot())
+            except Exception:
+                _logger.warning("Could not publish MQTT ingest metrics.", exc_info=True)
+        if cls._last_summary is None:
+            cls._last_summary = (now, cls.stats())
+            return
+        since, previous = cls._last_summary
+        if now - since < SUMMARY_INTERVAL:
+            return
+        stats = cls.stats()
+        cls._last_summary = (now, stats)
+        delta = {key: stats[key] - previous.get(key, 0) for key in (
+            "received", "history_rows", "written", "dropped", "parse_failed", "transactions",
+            "write_errors", "reconnects")}
+        log = _logger.info if delta["received"] or delta["write_errors"] else _logger.debug
+        log("MQTT ingest, last %ds: %s frame(s) received, %s stored, %s latest update(s) in %s commit(s); "
+            "%s dropped, %s unparsable, %s write error(s), %s reconnect(s); queue depth %s, spool backlog %s, "
+            "p50/p99 latency %.0f/%.0f ms.",
+            now - since, delta["received"], delta["history_rows"], delta["written"], delta["transactions"],
+            delta["dropped"], delta["parse_failed"], delta["write_errors"], delta["reconnects"],
+            stats["queue_depth"], stats["spool_backlog"], stats["latency_p50_ms"], stats["latency_p99_ms"])
+
+    @classmethod
+    def latency_samples(cls):
+        """Publish-to-commit latency in ms of the last ``latency_window`` frames.
+
+        Measured from the frame's own timestamp (Node-RED's Date.now(), or
+        the read time for direct scales) to the commit that persisted it.
+        """
+        with cls._stats_lock:
+            return list(cls._latencies)
+
+    @classmethod
+    def _enqueue(cls, item):
+        """Spool a decoded frame, then put it on the queue, evicting the oldest one when full.
+
+        Only the newest value matters for the live weight, so under sustained
+        overload we keep the tail of the stream rather than blocking paho.
+        Evicted frames are still in the spool and reach weight.history
+        through a replay.
+        """
+        q = cls._queue
+        with cls._ingest_lock:
+            spool = cls._spool
+            if spool is not None:
+                try:
+                    item = item._replace(seq=spool.append(list(item[:5])))
+                    cls._incr("spooled")
+                except (OSError, ValueError):
+                    cls._incr("spool_errors")
+                    errors = cls._stats.get("spool_errors", 0)
+                    if errors == 1 or errors % LOG_EVERY == 0:
+                        _logger.warning("Could not append to the weight spool (%s so far); frame queued without it.",
+                                        errors, exc_info=errors == 1)
+            while True:
+                try:
+                    q.put_nowait(item)
+                    return
+                except queue.Full:
+                    try:
+                        q.get_nowait()
+                    except queue.Empty:
+                        continue
+                    cls._incr("dropped")
+                    if spool is not None:
+                        cls._replay = True
+                    dropped = cls._stats.get("dropped", 0)
+                    if dropped == 1 or dropped % LOG_EVERY == 0:
+                        _logger.warning("MQTT ingest queue full (%s); %s frame(s) dropped so far%s.", q.maxsize, dropped,
+                                        " (kept in the spool for replay)" if spool is not None else "")
+
+    @classmethod
+    def _enqueue_direct(cls, scale_code, weight, payload, received_at, device_ts):
+        """DirectSourceReader callback: a frame decoded from a serial/TCP indicator"""
+        cls._incr("received")
+        cls._enqueue(Frame(scale_code, weight, payload, received_at, device_ts))
+
+    @classmethod
+    def _start_direct_reader(cls, registry):
+        """Open the serial/TCP scales; returns the running reader, or None."""
+        try:
+            with registry.cursor() as cr:
+                configs = api.Environment(cr, SUPERUSER_ID, {})["weighbridge.scale"]._get_direct_sources()
+        except Exception:
+            _logger.exception("Could not load the direct scale sources.")
+            return None
+        if not configs:
+            return None
+        reader = DirectSourceReader(
+            [build_source(config) for config in configs], cls._enqueue_direct,
+            on_rejected=lambda count: cls._incr("parse_failed", count))
+        reader.start()
+        return reader
+
+    @classmethod
+    def _drain(cls, first):
+        """Return ``first`` plus everything already waiting, up to WRITER_BATCH_SIZE."""
+        batch = [first]
+        q = cls._queue
+        while len(batch) < WRITER_BATCH_SIZE:
+            try:
+                batch.append(q.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    @classmethod
+    def _get_detector(cls, Scale, scale_code):
+        """Return the scale's detector, rebuilding it when its settings changed."""
+        params = Scale._get_stability_params(scale_code)
+        current = cls._detectors.get(scale_code)
+        if current is None or current[0] != params:
+            current = cls._detectors[scale_code] = (params, StabilityDetector(*params))
+        return current[1]
+
+    @classmethod
+    def _stability_values(cls, detector):
+        stable_since = detector.stable_since
+        return {
+            "is_stable": detector.is_stable,
+            "stable_weight": detector.stable_weight or 0.0,
+            "stable_since": _ms_to_datetime(stable_since) if stable_since is not None else False,
+        }
+
+    @classmethod
+    def _in_sequence(cls, batch, spool):
+        """Frames of ``batch`` not committed yet, or [] when the spool has frames they skip.
+
+        A gap means frames were evicted from the queue; the batch is then
+        left to the replay, which reads them all from the spool in order.
+        """
+        if spool is None:
+            return batch
+        expected = spool.acked + 1
+        frames = []
+        for frame in batch:
+            if frame.seq:
+                if frame.seq < expected:
+                    continue  # already committed by a replay
+                if frame.seq != expected:
+                    cls._replay = True
+                    return []
+                expected += 1
+            frames.append(frame)
+        return frames
+
+    @classmethod
+    def _should_persist(cls, Scale, frame, stability):
+        """Write policy of the latest row: a move beyond the scale's deadband, a stability change or the heartbeat.
+
+        Identical readings of an idle deck would otherwise rewrite the row
+        (a dead tuple and its WAL) for every frame. Times are the frames'
+        receipt times, so a replay applies the policy as it happened.
+        """
+        deadband, heartbeat = Scale._get_write_policy(frame.scale_code)
+        # The stable weight is a window mean that shifts a little with every
+        # frame, so it goes through the deadband like the raw weight
+        is_stable, stable_weight = stability["is_stable"], stability["stable_weight"] or 0.0
+        last = cls._persisted.get(frame.scale_code)
+        if (not heartbeat or last is None or frame.received_at - last[0] >= heartbeat
+                or abs(frame.weight - last[1]) > deadband
+                or is_stable != last[2] or abs(stable_weight - last[3]) > deadband):
+            cls._persisted[frame.scale_code] = (frame.received_at, frame.weight, is_stable, stable_weight)
+            return True
+        return False
+
+    @classmethod
+    def _write_frames(cls, env, frames, replay=False):
+        """Feed ``frames`` to the detectors, weight.history and weight.latest.
+
+        Returns (newest frame per scale, history rows appended, latest rows written).
+        """
+        Scale = env["weighbridge.scale"]
+        # Every frame feeds stability and the history stream, but only
+        # the newest of a burst updates the latest row, per scale
+        newest = {}
+        history = []
+        for frame in frames:
+            scale_id = Scale._get_scale_id(frame.scale_code)
+            if not scale_id:
+                cls._incr("unknown_scale")
+                if frame.scale_code not in cls._unknown_scales:
+                    cls._unknown_scales.add(frame.scale_code)
+                    _logger.warning("Dropping frames of unknown scale '%s'; add it under Scales or set "
+                                    "ocs_weight_master.auto_register_scales.", frame.scale_code)
+                continue
+            if not frame.seq or frame.seq > cls._fed_seq:
+                cls._get_detector(Scale, frame.scale_code).add(frame.weight, frame.device_ts)
+                cls._fed_seq = max(cls._fed_seq, frame.seq)
+            newest[frame.scale_code] = frame
+            history.append((scale_id, _ms_to_datetime(frame.device_ts), frame.weight))
+        # A replay may cover frames committed before a crash lost their ack
+        appended = env["weight.history"]._append(history, dedupe=replay)
+        Latest = env["weight.latest"]
+        persisted = 0
+        for frame in newest.values():
+            stability = cls._stability_values(cls._get_detector(Scale, frame.scale_code))
+            persist = cls._should_persist(Scale, frame, stability)
+            persisted += persist
+            Latest.update_latest(
+                frame.weight, frame.payload, scale_code=frame.scale_code, stability=stability, persist=persist)
+        return newest, appended, persisted
+
+    @classmethod
+    def _write_loop(cls, registry):
+        """Drain the queue (or replay the spool) into weight.latest with one reusable cursor."""
+        cr = None
+        q = cls._queue
+        while not cls._writer_stop:
+            cls._report(registry)
+            spool = cls._spool
+            replay = cls._replay and spool is not None
+            if replay:
+                frames = [Frame(*record, seq=seq) for seq, record in spool.read(limit=WRITER_BATCH_SIZE)]
+                if not frames:
+                    cls._replay = False
+                    _logger.info("Weight spool replay caught up.")
+                    continue
+            else:
+                try:
+                    first = q.get(timeout=WRITER_POLL_TIMEOUT)
+                except queue.Empty:
+                    continue
+                frames = cls._in_sequence(cls._drain(first), spool)
+                if not frames:
+                    continue
+
+            cls._in_flight = len(frames)
+            try:
+                if cr is None:
+                    cr = registry.cursor()
+                started = time.monotonic()
+                env = api.Environment(cr, SUPERUSER_ID, {})
+                env.invalidate_all()
+                newest, appended, persisted = cls._write_frames(env, frames, replay=replay)
+                cr.commit()
+                # A scale registered by this batch cleared the routing caches of this
+                # process only; have the other workers clear theirs as well
+                registry.signal_changes()
+                committed_ms = time.time() * 1000.0
+                elapsed_ms = (time.monotonic() - started) * 1000.0
+            except Exception:
+                cls._incr("write_errors")
+                if spool is not None and frames[-1].seq:
+                    cls._replay = True
+                    _logger.exception("Failed to write %s frame(s); they stay in the spool, retrying in %ss.",
+                                      len(frames), WRITER_RETRY_DELAY)
+                else:
+                    _logger.exception("Failed to write %s MQTT frame(s); reopening cursor in %ss.",
+                                      len(frames), WRITER_RETRY_DELAY)
+                if cr is not None:
+                    try:
+                        cr.rollback()
+                        cr.close()
+                    except Exception:
+                        pass
+                    cr = None
+                # A rolled back scale registration must not stay in the routing cache,
+                # nor a rolled back latest row write in the write policy
+                registry.clear_cache()
+                cls._persisted = {}
+                cls._in_flight = 0
+                time.sleep(WRITER_RETRY_DELAY)
+                continue
+
+            if spool is not None and frames[-1].seq:
+                spool.ack(frames[-1].seq)
+            cls._in_flight = 0
+            with cls._stats_lock:
+                cls._stats["written"] += persisted
+                cls._stats["latest_skipped"] += len(newest) - persisted
+                cls._stats["history_rows"] += appended
+                cls._stats["coalesced"] += len(frames) - len(newest)
+                cls._stats["transactions"] += 1
+                cls._stats["last_commit_ms"] = elapsed_ms
+                if replay:
+                    # Replayed frames waited out an outage; keep them out of the live latency figures
+                    cls._stats["replayed"] += len(frames)
+                    cls._stats["duplicates"] += len(frames) - appended
+                else:
+                    cls._latencies.extend(committed_ms - frame.device_ts for frame in frames)
+                    receive, commit, end_to_end = (
+                        cls._histograms["receive"], cls._histograms["commit"], cls._histograms["end_to_end"])
+                    committed_at = committed_ms / 1000.0
+                    for frame in frames:
+                        device_at = frame.device_ts / 1000.0
+                        receive.observe(max(frame.received_at - device_at, 0.0))
+                        commit.observe(committed_at - frame.received_at)
+                        end_to_end.observe(max(committed_at - device_at, 0.0))
+            _logger.debug("Updated latest weight of %s scale(s) from %s (%s frame(s) coalesced, queue depth %s).",
+                          len(newest), "the spool" if replay else "MQTT", len(frames), q.qsize())
+
+        if cr is not None:
+            try:
+                cr.close()
+            except Exception:
+                pass
+
+    @classmethod
+    def _identity(cls):
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    @classmethod
+    def _acquire_leadership(cls, dbname, raise_on_error=False):
+        """Try to take the leader lock on a dedicated connection; return True on success.
+
+        Database errors count as a failed attempt unless ``raise_on_error``.
+        """
+        cr = None
+        try:
+            cr = sql_db.db_connect(dbname).cursor()
+            cr.execute("SELECT pg_try_advisory_lock(%s)", (LEADER_LOCK_KEY,))
+            acquired = cr.fetchone()[0]
+            if acquired:
+                # Make the holder identifiable from pg_stat_activity
+                cr.execute("SET application_name = %s", (f"{LEADER_APP_NAME} {cls._identity()}"[:63],))
+            cr.commit()
+        except Exception:
+            # The lock may have been taken before the failure
+            if cr is not None:
+                cls._close_lock_cursor(cr)
+            if raise_on_error:
+                raise
+            _logger.warning("Could not check MQTT ingest leadership.", exc_info=True)
+            return False
+        if not acquired:
+            try:
+                cr.close()
+            except Exception:
+                pass
+            return False
+        cls._lock_cr = cr
+        cls._leader_since = time.time()
+        _logger.info("This process (%s) is now the MQTT ingest leader.", cls._identity())
+        return True
+
+    @staticmethod
+    def _close_lock_cursor(cr):
+        """Close a cursor that may hold the leader lock, its connection included.
+
+        cr.close() gives the connection back to Odoo's pool, where the
+        session-level lock would outlive the cursor and keep every process
+        (this one included) standing by. Closing the connection ends the
+        session and the lock with it; the pool drops closed connections.
+        """
+        try:
+            cr._cnx.close()
+        except Exception:
+            pass
+        try:
+            cr.close()
+        except Exception:
+            pass
+
+    @classmethod
+    def _still_leader(cls):
+        """The lock lives as long as its connection; a failed ping means it is gone."""
+        try:
+            cls._lock_cr.execute("SELECT 1")
+            cls._lock_cr.commit()
+            return True
+        except Exception:
+            _logger.warning("Lost the MQTT ingest leader connection.", exc_info=True)
+            return False
+
+    @classmethod
+    def _hold_through_outage(cls, dbname):
+        """Keep ingesting into the spool after the lock connection died; True once the lock is retaken.
+
+        While the database is unreachable nobody else can take the lock
+        either, so the MQTT session stays up and frames go to the spool.
+        Returns False (step down) without a spool, or when another process
+        holds the lock once the database answers again.
+        """
+        if cls._spool is None:
+            _logger.warning("No weight spool to bridge the outage; stepping down.")
+            return False
+        dead, cls._lock_cr = cls._lock_cr, None
+        cls._close_lock_cursor(dead)
+        _logger.warning("Database unreachable; MQTT ingestion continues into the spool at %s.", cls._spool.directory)
+        while not cls._stop_flag:
+            try:
+                if cls._acquire_leadership(dbname, raise_on_error=True):
+                    return True
+            except Exception:
+                cls._stop_event.wait(LEADER_RETRY_INTERVAL)
+                continue
+            _logger.warning("Another process took over MQTT ingestion during the outage; stepping down.")
+            return False
+        return False
+
+    @classmethod
+    def _open_spool(cls, params):
+        """Open this host's spool for the new leader; returns it, or None when disabled or unusable.
+
+        A leader on this host that is stepping down may still have it open;
+        wait for it, as it steps down within LEADER_RETRY_INTERVAL.
+        """
+        if params is None:
+            return None
+        directory, max_bytes, fsync_interval = params
+        while not cls._stop_flag:
+            try:
+                spool = Spool(directory, max_bytes=max_bytes, fsync_interval=fsync_interval)
+            except SpoolLocked:
+                _logger.info("Weight spool %s is still open in another process; retrying in %ss.",
+                             directory, LEADER_RETRY_INTERVAL)
+                cls._stop_event.wait(LEADER_RETRY_INTERVAL)
+                continue
+            except OSError:
+                _logger.exception("Could not open the weight spool in %s; ingesting without it.", directory)
+                return None
+            backlog = spool.backlog()
+            cls._fed_seq = spool.acked
+            cls._replay = backlog > 0
+            if backlog:
+                _logger.info("Weight spool %s holds %s uncommitted frame(s); replaying them.", directory, backlog)
+            cls._spool = spool
+            return spool
+        return None
+
+    @classmethod
+    def _release_leadership(cls):
+        cr, cls._lock_cr, cls._leader_since = cls._lock_cr, None, None
+        cls._connected = False
+        if cr is None:
+            return
+        try:
+            cr.execute("SELECT pg_advisory_unlock(%s)", (LEADER_LOCK_KEY,))
+            cr.execute("RESET application_name")
+            cr.commit()
+        except Exception:
+            # Not unlocked: the connection must not go back to the pool
+            cls._close_lock_cursor(cr)
+        else:
+            try:
+                cr.close()
+            except Exception:
+                pass
+        _logger.info("This process (%s) released MQTT ingest leadership.", cls._identity())
+
+    @classmethod
+    def status(cls, cr):
+        """Leadership and ingest counters, as seen from this process.
+
+        ``leader`` is the host:pid of whichever process currently holds the
+        lock, on any node, or False when no process does.
+        """
+        cr.execute("""
+            SELECT a.application_name, a.backend_start
+              FROM pg_locks l
+              JOIN pg_stat_activity a ON a.pid = l.pid
+             WHERE l.locktype = 'advisory' AND l.granted
+               AND l.database = (SELECT oid FROM pg_database WHERE datname = current_database())
+               AND l.classid = %s::oid AND l.objid = %s::oid AND l.objsubid = 1
+        """, (LEADER_LOCK_KEY >> 32, LEADER_LOCK_KEY & 0xFFFFFFFF))
+        row = cr.fetchone()
+        leader, leader_since = False, False
+        if row:
+            name, leader_since = row[0] or "", row[1]
+            leader = name[len(LEADER_APP_NAME):].strip() if name.startswith(LEADER_APP_NAME) else "unknown"
+        config = cls._config[1][0] if cls._config else None
+        return dict(
+            cls.stats(),
+            process=cls._identity(),
+            designated=cls._designated(),
+            running=bool(cls._thread and cls._thread.is_alive()),
+            connected=cls._connected,
+            started_at=cls._started_at or False,
+            broker="%s:%s" % config[:2] if config else False,
+            topic=config[2] if config else False,
+            is_leader=cls._lock_cr is not None,
+            leader=leader,
+            leader_since=leader_since,
+        )
+
+    @classmethod
+    def _designated(cls):
+        """Whether this process should run the MQTT service.
+
+        ``MQTT_INGEST`` (environment) or ``ocs_weight_master_ingest`` (Odoo
+        configuration file) set to 1/0 forces it on or off. By default only
+        processes serving HTTP run it: not odoo shell or scripts, not runs
+        with --stop-after-init (-i/-u) or --test-enable, not --no-http cron
+        workers, cron threads, prefork cron workers or the gevent (websocket)
+        process.
+        """
+        setting = os.getenv("MQTT_INGEST") or config.get("ocs_weight_master_ingest")
+        if setting not in (None, "", "auto"):
+            return str(setting).strip().lower() in ("1", "true", "yes", "on")
+        if config.get("test_enable") or config.get("stop_after_init") or not config.get("http_enable", True):
+            return False
+        running = odoo_server.server
+        if running is None or isinstance(running, odoo_server.GeventServer):
+            return False
+        if isinstance(running, odoo_server.PreforkServer) and cls._is_cron_worker(running):
+            return False
+        return getattr(threading.current_thread(), "type", None) != "cron"
+
+    @staticmethod
+    def _is_cron_worker(server):
+        """Whether this process is a WorkerCron forked by the prefork ``server``.
+
+        Forked workers inherit the master's server object. WorkerCron.start()
+        closes its listening socket; the master and HTTP workers keep it open.
+        Cron workers are recycled by limit_time_real_cron and the memory
+        limits, so a leader there would fail over again and again.
+        """
+        if os.getpid() == server.pid:
+            return False
+        sock = getattr(server, "socket", None)
+        return sock is None or sock.fileno() == -1
+
+    @classmethod
+    def ensure_started(cls, env):
+        """Start the supervisor of this process if it is designated to ingest; cheap otherwise.
+
+        Called on every registry load. The supervisor starts the service
+        from its own thread, so loading the registry never waits on it.
+        """
+        if not cls._designated():
+            _logger.debug("Not an ingest process; the MQTT service stays off here.")
+            return
+        cls._registry = env.registry
+        if cls._supervisor and cls._supervisor.is_alive():
+            return
+        cls._supervisor_event.clear()
+        cls._supervisor = threading.Thread(target=cls._supervise, daemon=True, name="OCS-Weight-Master-Supervisor")
+        cls._supervisor.start()
+
+    @classmethod
+    def _supervise(cls):
+        """Start the service, then restart it whenever its settings or the registry change"""
+        while not cls._supervisor_event.is_set():
+            try:
+                registry = cls._registry.check_signaling()  # picks up set_param() from other workers
+                with registry.cursor() as cr:
+                    env = api.Environment(cr, SUPERUSER_ID, {})
+                    running = cls._thread and cls._thread.is_alive()
+                    current = (registry, cls._get_config(env))
+                    if running and current != cls._config:
+                        _logger.info("MQTT settings changed; restarting the MQTT service.")
+                        if not cls._stop_threads():
+                            raise RuntimeError("the MQTT service did not stop in time")
+                        running = False
+                    if not running and not cls._supervisor_event.is_set():
+                        cls.start(env)
+            except Exception:
+                _logger.warning("MQTT service supervisor check failed; retrying in %ss.",
+                                CONFIG_CHECK_INTERVAL, exc_info=True)
+            cls._supervisor_event.wait(CONFIG_CHECK_INTERVAL)
+
+    @classmethod
+    def request_restart(cls, env):
+        """Make every running service restart within CONFIG_CHECK_INTERVAL, e.g. after changing settings"""
+        env["ir.config_parameter"].sudo().set_param(RESTART_PARAM, str(time.time()))
+
+    @classmethod
+    def _wait_drained(cls, timeout):
+        """Wait until the writer has committed everything queued; False when ``timeout`` ran out"""
+        q = cls._queue
+        deadline = time.monotonic() + timeout
+        while (q is not None and not q.empty() or cls._in_flight) and time.monotonic() < deadline:
+            if not (cls._writer_thread and cls._writer_thread.is_alive()) or (cls._replay and cls._spool is not None):
+                break  # nobody to drain it, or the writer is replaying and the queued frames are in the spool
+            time.sleep(0.05)
+        drained = q is None or (q.empty() and not cls._in_flight)
+        if not drained:
+            _logger.warning("Stopping with %s frame(s) still queued%s.", q.qsize(),
+                            " (they stay in the spool)" if cls._spool is not None else "")
+        return drained
 
     @classmethod
     def start(cls, env):
@@ -70,13 +903,28 @@ class MqttWeightService:
             _logger.info("MQTT listener already running.")
             return
 
-        broker, port, topic, keepalive, username, password = cls._get_params(env)
+        cls._config = (env.registry, cls._get_config(env))
+        (broker, port, topic, keepalive, username, password, queue_size), spool_params, (qos, client_id) = \
+            cls._config[1][:3]
+        _logger.info("MQTT configuration: broker %s:%s, topic %s, %s, QoS %s (from %s).",
+                     broker, port, topic, f"user '{username}'" if username else "no authentication", qos,
+                     "environment" if os.getenv("MQTT_BROKER") else "system parameters")
+        dbname = env.cr.dbname
+        registry = env.registry
         cls._stop_flag = False
+        cls._stop_event.clear()
+        cls._writer_stop = False
+        cls._in_flight = 0
+        cls._queue = queue.Queue(maxsize=queue_size)
+        cls._replay = False
+        cls._started_at = time.time()
+        cls._reset_stats()
 
         def _run():
-            _logger.info("Starting OCS Weight Master MQTT listener: %s:%s topic=%s", broker, port, topic)
-
-            client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+            client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=client_id if qos else "",
+                                 clean_session=not qos)
+            cls._recent = RecentKeys() if qos else None
+            client.reconnect_delay_set(min_delay=1, max_delay=30)
             cls._client = client
 
             # Set username and password if provided
@@ -85,49 +933,125 @@ class MqttWeightService:
 
             def on_connect(client, userdata, flags, reason_code, properties=None):
                 if reason_code == 0:
-                    _logger.info("MQTT connected.")
-                    client.subscribe(topic, qos=0)
+                    _logger.info("MQTT connected%s.", (" as %s (%s session)" % (
+                        client_id, "resumed" if flags.session_present else "new")) if qos else "")
+                    cls._connected = True
+                    with cls._stats_lock:
+                        cls._stats["connects"] += 1
+                        cls._stats["reconnects"] += cls._stats["connects"] > 1
+                    client.subscribe(topic, qos=qos)
                 else:
                     _logger.error("MQTT connect failed: %s", reason_code)
 
+            def on_disconnect(client, userdata, disconnect_flags, reason_code, properties=None):
+                if cls._connected:
+                    cls._incr("disconnects")
+                    _logger.warning("MQTT disconnected: %s", reason_code)
+                cls._connected = False
+
             def on_message(client, userdata, msg):
+                # Runs on the paho network thread: decode and enqueue only, never touch the DB here
+                cls._incr("received")
                 try:
                     payload = msg.payload.decode("utf-8", errors="replace")
                     data = json.loads(payload)
-
                     weight = float(data.get("weight", 0))
-                    
-                    registry = env.registry
-                    with registry.cursor() as cr:
-                        thread_env = api.Environment(cr, SUPERUSER_ID, {})
-                        # Update latest MQTT data instead of creating records
-                        thread_env["weight.latest"].update_latest(weight, payload)
-                        cr.commit()
-
-                    _logger.info("Updated latest weight %.3f from MQTT.", weight)
-
+                    scale_code = str(data.get("scale") or msg.topic.rstrip("/").rsplit("/", 1)[-1])
+                    received_at = time.time()
+                    device_ts = int(data.get("timestamp") or received_at * 1000)
                 except Exception:
-                    _logger.exception("Failed to process MQTT message: %r", msg.payload)
+                    cls._incr("parse_failed")
+                    failed = cls._stats.get("parse_failed", 0)
+                    if failed == 1 or failed % LOG_EVERY == 0:
+                        _logger.warning("Failed to decode MQTT message (%s so far): %r", failed, msg.payload)
+                    return
+                # paho acknowledges a QoS 1 message once this callback returns, i.e. after it was spooled
+                recent = cls._recent
+                if recent is not None and "timestamp" in data and recent.seen(
+                        (scale_code, device_ts, str(data.get("hex") or data.get("raw") or ""))):
+                    cls._incr("redelivered")
+                    return
+                cls._enqueue(Frame(scale_code, weight, payload, received_at, device_ts))
 
             client.on_connect = on_connect
+            client.on_disconnect = on_disconnect
             client.on_message = on_message
 
             while not cls._stop_flag:
+                if not cls._acquire_leadership(dbname):
+                    cls._stop_event.wait(LEADER_RETRY_INTERVAL)
+                    continue
+                _logger.info("Starting OCS Weight Master MQTT listener: %s:%s topic=%s", broker, port, topic)
+                direct_reader = None
+                spool = None
                 try:
-                    client.connect(broker, port, keepalive=keepalive)
-                    client.loop_forever(retry_first_connection=True)
+                    spool = cls._open_spool(spool_params)
+                    direct_reader = cls._start_direct_reader(registry)
+                    # paho's network thread connects and reconnects on its own
+                    client.connect_async(broker, port, keepalive=keepalive)
+                    client.loop_start()
+                    while not cls._stop_flag and (cls._still_leader() or cls._hold_through_outage(dbname)):
+                        cls._stop_event.wait(LEADER_CHECK_INTERVAL)
                 except Exception as e:
-                    _logger.warning("MQTT error: %s. Reconnecting in 5 seconds...", e)
-                    time.sleep(5)
+                    _logger.warning("MQTT error: %s.", e)
+                finally:
+                    if direct_reader is not None:
+                        direct_reader.stop()
+                    try:
+                        client.disconnect()
+                        client.loop_stop()
+                    except Exception:
+                        pass
+                    # Nothing feeds the queue any more; let the writer commit what is left
+                    cls._wait_drained(DRAIN_TIMEOUT)
+                    if spool is not None:
+                        with cls._ingest_lock:
+                            cls._spool = None
+                        spool.close()
+                    cls._release_leadership()
 
+        cls._writer_thread = threading.Thread(
+            target=cls._write_loop, args=(registry,), daemon=True, name="OCS-Weight-Master-Writer")
+        cls._writer_thread.start()
         cls._thread = threading.Thread(target=_run, daemon=True, name="OCS-Weight-Master-MQTT")
         cls._thread.start()
 
     @classmethod
-    def stop(cls):
+    def _stop_threads(cls, timeout=STOP_TIMEOUT):
+        """Stop the listener and the writer and wait for both; True when they ended within ``timeout``.
+
+        The listener disconnects, waits for the writer to drain the queue,
+        closes the spool and releases the leader lock before it ends; the
+        writer is stopped after that.
+        """
+        listener, writer = cls._thread, cls._writer_thread
+        deadline = time.monotonic() + timeout
         cls._stop_flag = True
+        cls._stop_event.set()
         try:
             if cls._client:
                 cls._client.disconnect()
         except Exception:
             pass
+        if listener is not None:
+            listener.join(max(deadline - time.monotonic(), 0))
+        cls._writer_stop = True
+        if writer is not None:
+            writer.join(max(deadline - time.monotonic(), 0))
+        alive = [thread.name for thread in (listener, writer) if thread is not None and thread.is_alive()]
+        if alive:
+            _logger.warning("MQTT service threads still running after %ss: %s.", timeout, ", ".join(alive))
+            return False
+        cls._thread = cls._writer_thread = cls._client = None
+        cls._config = cls._started_at = None
+        return True
+
+    @classmethod
+    def stop(cls, timeout=STOP_TIMEOUT):
+        """Stop the supervisor and the service of this process; True when everything ended in time"""
+        cls._supervisor_event.set()
+        supervisor = cls._supervisor
+        stopped = cls._stop_threads(timeout)
+        if supervisor is not None and supervisor is not threading.current_thread():
+            supervisor.join(timeout)
+        return stopped
@@ -0,0 +1,14 @@
+from odoo import models, fields
+
+
+class WeighbridgePlateLookup(models.TransientModel):
+    _name = "weighbridge.plate.lookup"
+    _description = "Exit by Plate"
+
+    plate = fields.Char(string="Plate", required=True,
+                        help="Vehicle No as typed or scanned; case, spaces and dashes are ignored")
+
+    def action_open(self):
+        """Open the exit form of the newest open transaction of the plate"""
+        self.ensure_one()
+        return self.env['weighbridge.transaction'].action_open_by_plate(self.plate)
@@ -0,0 +1,109 @@
+# Streaming stable-weight detection for the MQTT ingest path.
+# Kept free of Odoo imports so it can be benchmarked on its own
+# (see benchmarks/bench_stability.py).
+import math
+
+DEFAULT_WINDOW = 10          # samples
+DEFAULT_TOLERANCE = 1.0      # standard deviation, in weight units
+DEFAULT_MIN_DURATION_MS = 0  # extra hold time once the window is steady
+STABLE_DIGITS = 3            # decimals of the reported stable weight, as stored on transactions
+
+# Recompute the window sums from scratch every RESYNC_EVERY * window samples
+# so floating point drift of the incremental update cannot accumulate.
+RESYNC_EVERY = 64
+
+
+class StabilityDetector:
+    """Rolling mean/variance over the last ``window`` samples of one scale.
+
+    Each ``add()`` is O(1): the ring buffer slot being overwritten is removed
+    from the running mean and sum of squared deviations (sliding Welford
+    update) and the new sample added. A reading is stable once the window is
+    full, its standard deviation is within ``tolerance`` and that has held for
+    at least ``min_duration_ms``. The stable weight is the window mean, not
+    the last (noisy) sample.
+    """
+
+    __slots__ = (
+        "window", "tolerance", "min_duration_ms",
+        "_buf", "_pos", "_count", "_mean", "_m2", "_since_resync",
+        "_steady_since", "is_stable", "stable_weight", "stable_since",
+    )
+
+    def __init__(self, window=DEFAULT_WINDOW, tolerance=DEFAULT_TOLERANCE, min_duration_ms=DEFAULT_MIN_DURATION_MS):
+        self.window = max(int(window or DEFAULT_WINDOW), 2)
+        self.tolerance = max(float(tolerance or 0.0), 0.0)
+        self.min_duration_ms = max(int(min_duration_ms or 0), 0)
+        self._buf = [0.0] * self.window
+        self._pos = 0
+        self._count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._since_resync = 0
+        self._steady_since = None
+        self.is_stable = False
+        self.stable_weight = None
+        self.stable_since = None
+
+    @property
+    def mean(self):
+        return self._mean
+
+    @property
+    def stddev(self):
+        if self._count < 2:
+            return 0.0
+        return math.sqrt(max(self._m2, 0.0) / self._count)
+
+    def _resync(self):
+        values = self._buf if self._count == self.window else self._buf[:self._count]
+        mean = math.fsum(values) / len(values)
+        self._mean = mean
+        self._m2 = math.fsum((v - mean) ** 2 for v in values)
+        self._since_resync = 0
+
+    def add(self, weight, ts_ms):
+        """Feed one reading taken at ``ts_ms`` (epoch milliseconds); return is_stable."""
+        weight = float(weight)
+        if self._count < self.window:
+            # Growing window: plain Welford update
+            self._buf[self._pos] = weight
+            self._count += 1
+            delta = weight - self._mean
+            self._mean += delta / self._count
+            self._m2 += delta * (weight - self._mean)
+        else:
+            # Full window: replace the oldest sample
+            old = self._buf[self._pos]
+            self._buf[self._pos] = weight
+            old_mean = self._mean
+            self._mean = old_mean + (weight - old) / self.window
+            self._m2 += (weight - old) * (weight - self._mean + old - old_mean)
+        self._pos = (self._pos + 1) % self.window
+
+        self._since_resync += 1
+        if self._since_resync >= RESYNC_EVERY * self.window:
+            self._resync()
+
+        steady = self._count == self.window and self.stddev <= self.tolerance
+        if not steady:
+            self._steady_since = None
+            self.is_stable = False
+            return False
+        if self._steady_since is None:
+            self._steady_since = ts_ms
+        if ts_ms - self._steady_since < self.min_duration_ms:
+            self.is_stable = False
+            return False
+        if not self.is_stable:
+            self.stable_since = ts_ms
+        self.is_stable = True
+        self.stable_weight = round(self._mean, STABLE_DIGITS)
+        return True
+
+    def state(self):
+        return {
+            "is_stable": self.is_stable,
+            "stable_weight": self.stable_weight,
+            "stable_since": self.stable_since,
+        }
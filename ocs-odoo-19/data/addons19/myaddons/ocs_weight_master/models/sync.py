@@ -0,0 +1,402 @@
+# Site -> central replication. Every site pushes the types, drivers and
+# transactions changed since its last acknowledged (write_date, id) watermark
+# to a central instance running this module, which upserts them by code,
+# (site, driver id) and (site, voucher number).
+import gzip
+import json
+import logging
+from datetime import date, datetime, timedelta
+
+import requests
+
+from odoo import models, fields, api, _
+from odoo.fields import Command
+from odoo.tools import SQL
+
+_logger = logging.getLogger(__name__)
+
+SYNC_PATH = '/ocs_weight_master/sync/push'
+# Pushed in this order, so the central side knows a transaction's type and driver
+SYNC_KINDS = [
+    ('type', 'weighbridge.transaction.type'),
+    ('driver', 'weighbridge.driver'),
+    ('transaction', 'weighbridge.transaction'),
+]
+DEFAULT_BATCH_SIZE = 500
+MAX_BATCH_SIZE = 2000           # records per request, enforced by the receiving side too
+DEFAULT_SETTLE_SECONDS = 60     # rows written more recently may belong to a transaction not yet committed
+DEFAULT_MAX_BATCHES = 20        # per kind and run, so a long backlog is spread over several runs
+MAX_BODY = 64 * 1024 * 1024     # largest request body the receiving side inflates
+TIMEOUT = (10, 120)             # connect, read (seconds)
+EPOCH = datetime(1970, 1, 1)
+
+TYPE_FIELDS = ['code', 'name', 'description', 'sequence', 'active']
+DRIVER_FIELDS = ['name', 'nrc', 'phone', 'email', 'address', 'license_no', 'license_expiry', 'notes']
+TRANSACTION_FIELDS = [
+    'voucher_no', 'vehicle_no', 'type', 'driver_name', 'driver_nrc', 'driver_phone', 'company_name',
+    'deliver_to', 'remark1', 'remark2', 'entrance_weight', 'exit_weight', 'entrance_date', 'exit_date',
+    'state', 'tare_source',
+]
+# Keys every pushed record carries, and the one the upsert matches on (never empty)
+RECORD_KEYS = {
+    'type': set(TYPE_FIELDS) | {'write_date'},
+    'driver': set(DRIVER_FIELDS) | {'ref', 'write_date'},
+    'transaction': set(TRANSACTION_FIELDS) | {
+        'type_code', 'driver_ref', 'partner', 'responsible', 'products', 'scale', 'write_date'},
+}
+MATCH_KEYS = {'type': 'code', 'driver': 'ref', 'transaction': 'voucher_no'}
+
+
+def _jsonable(value):
+    """Field value as sent to the central side: dates as Odoo strings, the rest as is"""
+    if isinstance(value, datetime):
+        return fields.Datetime.to_string(value)
+    if isinstance(value, date):
+        return fields.Date.to_string(value)
+    return value
+
+
+def record_error(kind, values):
+    """Why a pushed record of ``kind`` cannot be applied, or None if it can"""
+    if not isinstance(values, dict):
+        return "not an object"
+    missing = RECORD_KEYS[kind] - values.keys()
+    if missing:
+        return "missing %s" % ", ".join(sorted(missing))
+    if not values[MATCH_KEYS[kind]]:
+        return "empty %s" % MATCH_KEYS[kind]
+    try:
+        if not fields.Datetime.to_datetime(values['write_date']):
+            return "empty write_date"
+    except (ValueError, TypeError):
+        return "invalid write_date"
+    if kind == 'transaction' and not (isinstance(values['products'], list) and all(
+            isinstance(product, list) and len(product) == 2 for product in values['products'])):
+        return "products must be [internal reference, name] pairs"
+    return None
+
+
+class WeighbridgeSyncState(models.Model):
+    _name = "weighbridge.sync.state"
+    _description = "Central Sync Progress"
+    _order = "id"
+    _rec_name = "kind"
+
+    kind = fields.Selection([
+        ('type', 'Transaction Types'),
+        ('driver', 'Drivers'),
+        ('transaction', 'Transactions'),
+    ], string="Records", required=True, readonly=True)
+    watermark_date = fields.Datetime(string="Synced Up To", readonly=True,
+                                     help="Last modification date the central instance has acknowledged")
+    watermark_id = fields.Integer(string="Last Record ID", readonly=True)
+    pending = fields.Integer(string="Pending", compute="_compute_pending",
+                             help="Records changed since the watermark, including ones still settling")
+    records_pushed = fields.Integer(string="Records Pushed", readonly=True)
+    last_sync = fields.Datetime(string="Last Push", readonly=True)
+    last_error = fields.Text(string="Last Error", readonly=True)
+
+    _kind_uniq = models.UniqueIndex("(kind)")
+
+    def _compute_pending(self):
+        for state in self:
+            watermark_date, watermark_id = state._get_watermark()
+            self.env.cr.execute(SQL(
+                "SELECT count(*) FROM %s WHERE (write_date, id) > (%s, %s)",
+                SQL.identifier(self.env[dict(SYNC_KINDS)[state.kind]]._table), watermark_date, watermark_id,
+            ))
+            state.pending = self.env.cr.fetchone()[0]
+
+    def _get_watermark(self):
+        """(write_date, id) of the last acknowledged record, read in full precision.
+
+        The ORM rounds datetimes to the second; a rounded watermark would
+        send the rest of that second again on every run.
+        """
+        self.ensure_one()
+        self.env.cr.execute("SELECT watermark_date, watermark_id FROM weighbridge_sync_state WHERE id = %s", [self.id])
+        watermark_date, watermark_id = self.env.cr.fetchone()
+        return watermark_date or EPOCH, watermark_id or 0
+
+    # ------------------------------------------------------------------
+    # Site side
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _get_params(self):
+        ICP = self.env['ir.config_parameter'].sudo()
+
+        def number(key, default):
+            try:
+                return int(ICP.get_param(key, default))
+            except (ValueError, TypeError):
+                return default
+
+        return {
+            'url': (ICP.get_param('ocs_weight_master.sync_url') or '').rstrip('/'),
+            'token': ICP.get_param('ocs_weight_master.sync_token') or '',
+            'site': ICP.get_param('ocs_weight_master.site_code') or self.env.cr.dbname,
+            'batch_size': min(max(number('ocs_weight_master.sync_batch_size', DEFAULT_BATCH_SIZE), 1), MAX_BATCH_SIZE),
+            'settle': timedelta(seconds=max(number('ocs_weight_master.sync_settle_seconds', DEFAULT_SETTLE_SECONDS), 0)),
+            'max_batches': max(number('ocs_weight_master.sync_max_batches', DEFAULT_MAX_BATCHES), 1),
+        }
+
+    @api.model
+    def _get_states(self):
+        """One progress row per kind, in push order"""
+        states = self.search([])
+        missing = [kind for kind, _model in SYNC_KINDS if kind not in states.mapped('kind')]
+        if missing:
+            states |= self.create([{'kind': kind} for kind in missing])
+        order = [kind for kind, _model in SYNC_KINDS]
+        return states.sorted(lambda state: order.index(state.kind))
+
+    @api.model
+    def _cron_push(self):
+        """Push everything changed since the watermarks to ocs_weight_master.sync_url (unset = off)"""
+        params = self._get_params()
+        if not params['url']:
+            return
+        # One cutoff for every kind: a driver written between the driver and
+        # transaction passes must not have its transactions pushed before it
+        params['settled'] = fields.Datetime.now() - params['settle']
+        for state in self._get_states():
+            if not state._push(params):
+                # Later kinds refer to this one; they wait for the next run
+                break
+
+    def _push(self, params):
+        """Send this kind's backlog in batches of ``batch_size``; False if a batch failed.
+
+        Records are taken in (write_date, id) order after the watermark, up
+        to the run's ``settled`` cutoff, ``settle`` seconds back, so rows of
+        transactions still open cannot commit behind it. Each acknowledged batch moves the
+        watermark and is committed on its own, so a dropped link costs at most
+        the batch in flight: it is sent again on the next run and upserted
+        to the same result.
+        """
+        self.ensure_one()
+        Model = self.env[dict(SYNC_KINDS)[self.kind]].sudo().with_context(active_test=False)
+        export = getattr(self, '_export_%s' % self.kind)
+        for _batch in range(params['max_batches']):
+            watermark_date, watermark_id = self._get_watermark()
+            self.env.cr.execute(SQL(
+                """SELECT id, write_date FROM %(table)s
+                    WHERE (write_date, id) > (%(date)s, %(id)s) AND write_date < %(settled)s
+                 ORDER BY write_date, id
+                    LIMIT %(limit)s""",
+                table=SQL.identifier(Model._table), date=watermark_date, id=watermark_id,
+                settled=params['settled'], limit=params['batch_size'],
+            ))
+            rows = self.env.cr.fetchall()
+            if not rows:
+                break
+            try:
+                self._post(params, {
+                    'site': params['site'],
+                    'kind': self.kind,
+                    'records': export(Model.browse([record_id for record_id, _date in rows])),
+                })
+            except (requests.RequestException, ValueError) as e:
+                _logger.warning("Sync of %s to %s failed: %s", self.kind, params['url'], e)
+                self.env.invalidate_all()
+                self.last_error = str(e)
+                self.env.cr.commit()
+                return False
+            last_id, last_date = rows[-1]
+            self.env.cr.execute("""
+                UPDATE weighbridge_sync_state
+                   SET watermark_date = %s, watermark_id = %s, records_pushed = records_pushed + %s,
+                       last_sync = now() AT TIME ZONE 'UTC', last_error = NULL
+                 WHERE id = %s
+            """, (last_date, last_id, len(rows), self.id))
+            self.env.cr.commit()
+            self.env.invalidate_all()
+            if len(rows) < params['batch_size']:
+                break
+        return True
+
+    @api.model
+    def _post(self, params, payload):
+        """POST a gzipped JSON batch; raises with the central side's reason unless it acknowledged it"""
+        response = requests.post(
+            params['url'] + SYNC_PATH,
+            data=gzip.compress(json.dumps(payload).encode()),
+            headers={
+                'Content-Type': 'application/json',
+                'Content-Encoding': 'gzip',
+                'Authorization': 'Bearer %s' % params['token'],
+            },
+            timeout=TIMEOUT,
+        )
+        try:
+            result = response.json()
+        except ValueError:
+            result = None
+        if not isinstance(result, dict):
+            # Not this module answering, e.g. a proxy error page
+            raise ValueError("HTTP %s: unexpected reply %r" % (response.status_code, response.text[:200]))
+        if not response.ok or not result.get('ok'):
+            # Rejections come as JSON with the reason
+            raise ValueError(result.get('error') or "HTTP %s" % response.status_code)
+        return result
+
+    @api.model
+    def _export_type(self, types):
+        return [dict({fname: _jsonable(trans_type[fname]) for fname in TYPE_FIELDS},
+                     write_date=_jsonable(trans_type.write_date))
+                for trans_type in types]
+
+    @api.model
+    def _export_driver(self, drivers):
+        return [dict({fname: _jsonable(driver[fname]) for fname in DRIVER_FIELDS},
+                     ref=driver.id, write_date=_jsonable(driver.write_date))
+                for driver in drivers]
+
+    @api.model
+    def _export_transaction(self, transactions):
+        """Transactions with their relations by name: ids mean nothing on the central side"""
+        return [dict(
+            {fname: _jsonable(record[fname]) for fname in TRANSACTION_FIELDS},
+            type_code=record.type_id.code or False,
+            driver_ref=record.driver_id.id or False,
+            partner=record.partner_id.name or False,
+            responsible=record.responsible_id.name or False,
+            products=[[product.default_code or False, product.name] for product in record.product_ids],
+            scale=record.scale_id.name or False,
+            write_date=_jsonable(record.write_date),
+        ) for record in transactions]
+
+    def action_sync_now(self):
+        """Run the push cron now instead of waiting for its next run"""
+        self.env.ref('ocs_weight_master.ir_cron_weighbridge_sync_push')._trigger()
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _("Sync started"),
+                'message': _("Changed records are pushed in the background; reload to see the progress."),
+                'type': 'success',
+                'sticky': False,
+            },
+        }
+
+    # ------------------------------------------------------------------
+    # Central side
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _apply_batch(self, site, kind, records):
+        """Upsert a batch pushed by ``site``; returns (applied, skipped).
+
+        A batch may arrive twice when the acknowledgement of the first copy
+        was lost; records not newer than the stored copy are skipped. Batches
+        of one site are applied one at a time, so a retry racing the original
+        cannot insert the same record twice.
+        """
+        self.env.cr.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", ['ocs_weight_master.sync:%s' % site])
+        applied = getattr(self, '_import_%s' % kind)(site, records)
+        return applied, len(records) - applied
+
+    @api.model
+    def _is_stale(self, record, values):
+        """Whether the stored copy of a site record is as new as the pushed one"""
+        return bool(record.site_write_date) and fields.Datetime.to_datetime(values['write_date']) <= record.site_write_date
+
+    @api.model
+    def _match_names(self, model, names, fname='name'):
+        """{name: id} of existing records named exactly so, lowest id first; nothing is created"""
+        names = list({name for name in names if name})
+        if not names:
+            return {}
+        found = self.env[model].with_context(active_test=False).search([(fname, 'in', names)], order='id desc')
+        return {record[fname]: record.id for record in found}
+
+    @api.model
+    def _import_type(self, site, records):
+        """Types are shared by all sites and matched on their code"""
+        Type = self.env['weighbridge.transaction.type'].with_context(active_test=False)
+        existing = {trans_type.code: trans_type for trans_type in Type.search([('code', 'in', [r['code'] for r in records])])}
+        to_create, applied = [], 0
+        for values in records:
+            vals = {fname: values.get(fname) for fname in TYPE_FIELDS}
+            trans_type = existing.get(vals['code'])
+            if not trans_type:
+                to_create.append(vals)
+            elif any(trans_type[fname] != vals[fname] for fname in TYPE_FIELDS):
+                trans_type.write(vals)
+            else:
+                continue
+            applied += 1
+        Type.create(to_create)
+        return applied
+
+    @api.model
+    def _import_driver(self, site, records):
+        Driver = self.env['weighbridge.driver']
+        existing = {driver.site_ref: driver for driver in Driver.search(
+            [('site_code', '=', site), ('site_ref', 'in', [r['ref'] for r in records])])}
+        to_create, applied = [], 0
+        for values in records:
+            driver = existing.get(values['ref'])
+            if driver and self._is_stale(driver, values):
+                continue
+            vals = dict({fname: values.get(fname) for fname in DRIVER_FIELDS}, site_write_date=values['write_date'])
+            if driver:
+                driver.write(vals)
+            else:
+                to_create.append(dict(vals, site_code=site, site_ref=values['ref']))
+            applied += 1
+        created = Driver.create(to_create)
+        # Link the transactions that arrived before their driver
+        driver_ids = {driver.site_ref: driver.id for driver in created}
+        waiting = self.env['weighbridge.transaction'].with_context(active_test=False).search(
+            [('site_code', '=', site), ('driver_id', '=', False), ('site_driver_ref', 'in', list(driver_ids))])
+        for record in waiting:
+            record.driver_id = driver_ids[record.site_driver_ref]
+        return applied
+
+    @api.model
+    def _import_transaction(self, site, records):
+        """Upsert on (site, voucher number), resolving relations with one query per model"""
+        Transaction = self.env['weighbridge.transaction'].with_context(active_test=False)
+        existing = {record.voucher_no: record for record in Transaction.search(
+            [('site_code', '=', site), ('voucher_no', 'in', [r['voucher_no'] for r in records])])}
+        types = self._match_names('weighbridge.transaction.type', [r['type_code'] for r in records], 'code')
+        drivers = {driver.site_ref: driver.id for driver in self.env['weighbridge.driver'].search(
+            [('site_code', '=', site), ('site_ref', 'in', [r['driver_ref'] for r in records if r['driver_ref']])])}
+        partners = self._match_names('res.partner', [r['partner'] for r in records])
+        employees = self._match_names('hr.employee', [r['responsible'] for r in records])
+        scales = self._match_names('weighbridge.scale', [r['scale'] for r in records])
+        products = [product for r in records for product in r['products']]
+        product_codes = self._match_names('product.product', [code for code, _name in products], 'default_code')
+        product_names = self._match_names('product.product', [name for code, name in products if code not in product_codes])
+
+        to_create, applied = [], 0
+        for values in records:
+            record = existing.get(values['voucher_no'])
+            if record and self._is_stale(record, values):
+                continue
+            vals = {fname: values.get(fname) for fname in TRANSACTION_FIELDS}
+            vals.update(
+                site_driver_ref=values['driver_ref'] or False,
+                partner_id=partners.get(values['partner'], False),
+                responsible_id=employees.get(values['responsible'], False),
+                scale_id=scales.get(values['scale'], False),
+                product_ids=[Command.set([product_id for product_id in {
+                    product_codes.get(code) or product_names.get(name) for code, name in values['products']
+                } if product_id])],
+                site_write_date=values['write_date'],
+            )
+            if values['type_code'] in types:
+                vals['type_id'] = types[values['type_code']]
+            # A driver not pushed yet keeps the stored link; _import_driver sets it on arrival
+            if values['driver_ref'] in drivers or not values['driver_ref']:
+                vals['driver_id'] = drivers.get(values['driver_ref'], False)
+            if record:
+                record.write(vals)
+            else:
+                to_create.append(dict(vals, site_code=site))
+            applied += 1
+        Transaction.create(to_create)
+        return applied
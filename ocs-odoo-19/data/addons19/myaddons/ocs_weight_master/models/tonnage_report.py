@@ -0,0 +1,201 @@
+import logging
+
+from odoo import models, fields, api
+
+_logger = logging.getLogger(__name__)
+
+# Transactions whose net weight counts towards tonnage
+DONE_STATES = ('exit', 'completed')
+REFRESH_LOCK_KEY = 0x4F435354_4F4E4E45  # "OCSTONNE": one refresher at a time
+
+
+class TonnageDaily(models.Model):
+    _name = "weighbridge.tonnage.daily"
+    _description = "Daily Tonnage"
+    _order = "day desc"
+    _log_access = False
+
+    day = fields.Date(string="Day", required=True, index=True)
+    partner_id = fields.Many2one('res.partner', string="Customer", readonly=True)
+    type_id = fields.Many2one('weighbridge.transaction.type', string="Type", readonly=True)
+    transaction_count = fields.Integer(string="Transactions", readonly=True)
+    net_weight = fields.Float(string="Net Weight", digits=(16, 3), readonly=True)
+
+    @api.model
+    def _mark_dirty(self, days):
+        """Queue day buckets for the next refresh; called by weighbridge.transaction"""
+        days = sorted({day for day in days if day})
+        if days:
+            self.env.cr.execute("""
+                INSERT INTO weighbridge_tonnage_dirty (day)
+                     SELECT unnest(%s::date[])
+                ON CONFLICT (day) DO NOTHING
+            """, (days,))
+
+    @api.model
+    def _refresh_days(self, days):
+        """Recompute both rollups for the given days from weighbridge.transaction"""
+        if not days:
+            return
+        cr = self.env.cr
+        product_field = self.env['weighbridge.transaction']._fields['product_ids']
+        self.env['weighbridge.transaction'].flush_model()
+        cr.execute("DELETE FROM weighbridge_tonnage_daily WHERE day = ANY(%s)", (days,))
+        cr.execute("""
+            INSERT INTO weighbridge_tonnage_daily (day, partner_id, type_id, transaction_count, net_weight)
+                 SELECT report_day, partner_id, type_id, count(*), sum(net_weight)
+                   FROM weighbridge_transaction
+                  WHERE report_day = ANY(%s) AND state IN %s
+               GROUP BY report_day, partner_id, type_id
+        """, (days, DONE_STATES))
+        cr.execute("DELETE FROM weighbridge_tonnage_daily_product WHERE day = ANY(%s)", (days,))
+        cr.execute(f"""
+            INSERT INTO weighbridge_tonnage_daily_product (day, partner_id, type_id, product_id, transaction_count, net_weight)
+                 SELECT t.report_day, t.partner_id, t.type_id, rel."{product_field.column2}", count(*), sum(t.net_weight)
+                   FROM weighbridge_transaction t
+                   JOIN "{product_field.relation}" rel ON rel."{product_field.column1}" = t.id
+                  WHERE t.report_day = ANY(%s) AND t.state IN %s
+               GROUP BY t.report_day, t.partner_id, t.type_id, rel."{product_field.column2}"
+        """, (days, DONE_STATES))
+        self.invalidate_model()
+        self.env['weighbridge.tonnage.daily.product'].invalidate_model()
+
+    @api.model
+    def _refresh_dirty(self):
+        """Refresh the queued days; returns how many were refreshed.
+
+        Serialised with a transaction-level advisory lock: when another
+        transaction is already refreshing, return at once and let readers
+        use the rollup as it is.
+        """
+        cr = self.env.cr
+        cr.execute("SELECT pg_try_advisory_xact_lock(%s)", (REFRESH_LOCK_KEY,))
+        if not cr.fetchone()[0]:
+            return 0
+        cr.execute("DELETE FROM weighbridge_tonnage_dirty RETURNING day")
+        days = [row[0] for row in cr.fetchall()]
+        self._refresh_days(days)
+        return len(days)
+
+    @api.model
+    def _cron_refresh(self):
+        refreshed = self._refresh_dirty()
+        if refreshed:
+            _logger.info("Refreshed tonnage rollups of %s day(s).", refreshed)
+
+    @api.model
+    def _rebuild_all(self):
+        """Rebuild both rollups from scratch (install, or after a bulk fix)"""
+        cr = self.env.cr
+        self.env['weighbridge.transaction'].flush_model()
+        cr.execute("SELECT DISTINCT report_day FROM weighbridge_transaction WHERE report_day IS NOT NULL")
+        days = [row[0] for row in cr.fetchall()]
+        cr.execute("DELETE FROM weighbridge_tonnage_daily")
+        cr.execute("DELETE FROM weighbridge_tonnage_daily_product")
+        cr.execute("DELETE FROM weighbridge_tonnage_dirty")
+        self._refresh_days(days)
+        _logger.info("Rebuilt tonnage rollups over %s day(s).", len(days))
+
+    @api.model
+    def get_dashboard(self, start_date=None, end_date=None, interval='day', limit=10):
+        """Tonnage figures between two dates (inclusive) from the rollup tables.
+
+        ``interval`` is 'day' or 'month'. Returns totals, a time series, the
+        top ``limit`` customers and products, and the split by type, each as
+        lists ready for a chart. Read only: days changed since the last
+        refresh cron run show their previous figures until the next one.
+        """
+        cr = self.env.cr
+        where, params = ["TRUE"], []
+        if start_date:
+            where.append("d.day >= %s")
+            params.append(fields.Date.to_date(start_date))
+        if end_date:
+            where.append("d.day <= %s")
+            params.append(fields.Date.to_date(end_date))
+        where = " AND ".join(where)
+        bucket = "date_trunc('month', d.day)::date" if interval == 'month' else "d.day"
+
+        cr.execute(f"""
+            SELECT coalesce(sum(d.transaction_count), 0), coalesce(sum(d.net_weight), 0)
+              FROM weighbridge_tonnage_daily d WHERE {where}
+        """, params)
+        count, net_weight = cr.fetchone()
+
+        cr.execute(f"""
+            SELECT {bucket}, sum(d.transaction_count), sum(d.net_weight)
+              FROM weighbridge_tonnage_daily d WHERE {where}
+          GROUP BY 1 ORDER BY 1
+        """, params)
+        series = [{'date': fields.Date.to_string(day), 'count': int(n), 'net_weight': weight}
+                  for day, n, weight in cr.fetchall()]
+
+        cr.execute(f"""
+            SELECT d.partner_id, sum(d.transaction_count), sum(d.net_weight)
+              FROM weighbridge_tonnage_daily d WHERE {where}
+          GROUP BY d.partner_id ORDER BY 3 DESC NULLS LAST LIMIT %s
+        """, params + [limit])
+        rows = cr.fetchall()
+        partners = self.env['res.partner'].browse([pid for pid, _n, _w in rows if pid])
+        names = dict(zip(partners.ids, partners.mapped('display_name')))
+        customers = [{'id': pid or False, 'name': names.get(pid, 'Undefined'), 'count': int(n), 'net_weight': weight}
+                     for pid, n, weight in rows]
+
+        cr.execute(f"""
+            SELECT d.product_id, sum(d.transaction_count), sum(d.net_weight)
+              FROM weighbridge_tonnage_daily_product d WHERE {where}
+          GROUP BY d.product_id ORDER BY 3 DESC NULLS LAST LIMIT %s
+        """, params + [limit])
+        rows = cr.fetchall()
+        products = self.env['product.product'].browse([pid for pid, _n, _w in rows])
+        names = dict(zip(products.ids, products.mapped('display_name')))
+        top_products = [{'id': pid, 'name': names.get(pid, ''), 'count': int(n), 'net_weight': weight}
+                        for pid, n, weight in rows]
+
+        cr.execute(f"""
+            SELECT d.type_id, sum(d.transaction_count), sum(d.net_weight)
+              FROM weighbridge_tonnage_daily d WHERE {where}
+          GROUP BY d.type_id ORDER BY 3 DESC NULLS LAST
+        """, params)
+        rows = cr.fetchall()
+        types = self.env['weighbridge.transaction.type'].with_context(active_test=False).browse(
+            [tid for tid, _n, _w in rows if tid])
+        names = dict(zip(types.ids, types.mapped('name')))
+        by_type = [{'id': tid or False, 'name': names.get(tid, 'Undefined'), 'count': int(n), 'net_weight': weight}
+                   for tid, n, weight in rows]
+
+        return {
+            'transaction_count': int(count),
+            'net_weight': net_weight,
+            'series': series,
+            'customers': customers,
+            'products': top_products,
+            'types': by_type,
+        }
+
+
+class TonnageDailyProduct(models.Model):
+    _name = "weighbridge.tonnage.daily.product"
+    _description = "Daily Tonnage per Product"
+    _order = "day desc"
+    _log_access = False
+
+    day = fields.Date(string="Day", required=True, index=True)
+    partner_id = fields.Many2one('res.partner', string="Customer", readonly=True)
+    type_id = fields.Many2one('weighbridge.transaction.type', string="Type", readonly=True)
+    product_id = fields.Many2one('product.product', string="Product", readonly=True)
+    transaction_count = fields.Integer(string="Transactions", readonly=True,
+                                       help="Transactions carrying the product")
+    net_weight = fields.Float(string="Net Weight", digits=(16, 3), readonly=True,
+                              help="Net weight of the transactions carrying the product; a ticket with "
+                                   "several products counts in full under each of them")
+
+
+class TonnageDirty(models.Model):
+    _name = "weighbridge.tonnage.dirty"
+    _description = "Tonnage Days Pending Refresh"
+    _log_access = False
+
+    day = fields.Date(string="Day", required=True)
+
+    _day_uniq = models.UniqueIndex("(day)")
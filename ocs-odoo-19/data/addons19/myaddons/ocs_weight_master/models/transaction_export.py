@@ -0,0 +1,147 @@
+import csv
+import io
+import tempfile
+import uuid
+from urllib.parse import urlencode
+
+import pytz
+import xlsxwriter
+
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+
+EXPORT_CHUNK = 2000           # rows per fetch from the server-side cursor
+XLSX_MAX_ROWS = 1048576       # rows per worksheet, header included
+STREAM_BLOCK = 64 * 1024
+
+COLUMNS = [
+    "Voucher No", "Vehicle No", "Type", "State", "Scale",
+    "Entrance Date", "Entrance Weight", "Exit Date", "Exit Weight", "Net Weight", "Tare Source",
+    "Driver", "NRC", "Phone", "Customer", "Company Name", "Responsible",
+    "Products", "Deliver To", "Remark 1", "Remark 2", "Report Day", "Archived",
+]
+
+
+class WeighbridgeTransactionExport(models.TransientModel):
+    _name = "weighbridge.transaction.export"
+    _description = "Transaction Export"
+
+    date_from = fields.Date(string="From", required=True,
+                            default=lambda self: fields.Date.context_today(self).replace(month=1, day=1))
+    date_to = fields.Date(string="To", required=True, default=fields.Date.context_today)
+    file_format = fields.Selection([
+        ('xlsx', 'Excel (XLSX)'),
+        ('csv', 'CSV'),
+    ], string="Format", default='xlsx', required=True)
+    include_archived = fields.Boolean(string="Include Archived", default=True)
+
+    def action_export(self):
+        """Download the transactions of the report days in range, streamed by the export controller"""
+        self.ensure_one()
+        if self.date_from > self.date_to:
+            raise UserError(_("The start date must not be after the end date."))
+        query = urlencode({
+            'date_from': fields.Date.to_string(self.date_from),
+            'date_to': fields.Date.to_string(self.date_to),
+            'file_format': self.file_format,
+            'archived': int(self.include_archived),
+        })
+        return {
+            'type': 'ir.actions.act_url',
+            'url': f'/ocs_weight_master/export/transactions?{query}',
+            'target': 'self',
+        }
+
+    @api.model
+    def _iter_chunks(self, date_from, date_to, include_archived=True, chunk_size=EXPORT_CHUNK):
+        """Yield lists of export rows (see COLUMNS) for transactions by report day, in id order.
+
+        Ids come from a named (server-side) cursor, so PostgreSQL hands
+        them over ``chunk_size`` at a time instead of the whole result at
+        once. Each chunk is read through the ORM: its drivers, customers,
+        types and products are fetched with one query per model. The cache
+        is then dropped, so memory stays flat regardless of the range.
+        Record rules apply; dates are in the report timezone.
+        """
+        Transaction = self.env['weighbridge.transaction'].with_context(active_test=not include_archived)
+        Transaction.check_access('read')
+        query = Transaction._search([('report_day', '>=', date_from), ('report_day', '<=', date_to)], order='id')
+        tz = Transaction._get_report_tz()
+
+        def local(value):
+            return pytz.utc.localize(value).astimezone(tz).replace(tzinfo=None) if value else ''
+
+        states = dict(Transaction._fields['state']._description_selection(self.env))
+        sources = dict(Transaction._fields['tare_source']._description_selection(self.env))
+        # The named cursor shares the transaction (and snapshot) of the ORM reads below
+        ids_cursor = self.env.cr._cnx.cursor(name=f"ocs_export_{uuid.uuid4().hex}")
+        try:
+            ids_cursor.itersize = chunk_size
+            sql = query.select('id')
+            ids_cursor.execute(sql.code, sql.params)
+            while True:
+                ids = [row[0] for row in ids_cursor.fetchmany(chunk_size)]
+                if not ids:
+                    break
+                yield [(
+                    record.voucher_no, record.vehicle_no, record.type_id.name or '', states.get(record.state, ''),
+                    record.scale_id.name or '',
+                    local(record.entrance_date), record.entrance_weight,
+                    local(record.exit_date), record.exit_weight, record.net_weight,
+                    sources.get(record.tare_source, ''),
+                    record.driver_id.name or record.driver_name or '', record.driver_nrc or '',
+                    record.driver_phone or '',
+                    record.partner_id.name or '', record.company_name or '', record.responsible_id.name or '',
+                    ", ".join(record.product_ids.mapped('display_name')), record.deliver_to or '',
+                    record.remark1 or '', record.remark2 or '', fields.Date.to_string(record.report_day) or '',
+                    'Yes' if not record.active else '',
+                ) for record in Transaction.browse(ids)]
+                self.env.invalidate_all()
+        finally:
+            ids_cursor.close()
+
+    @api.model
+    def _stream_csv(self, chunks):
+        """Encode chunks as UTF-8 CSV (with BOM, for Excel) one chunk at a time"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        buffer.write('\ufeff')
+        writer.writerow(COLUMNS)
+        for chunk in chunks:
+            writer.writerows(chunk)
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue().encode('utf-8')
+
+    @api.model
+    def _stream_xlsx(self, chunks):
+        """Write chunks to an XLSX file in constant memory, then stream the file.
+
+        xlsxwriter's constant_memory mode flushes every row to a temporary
+        file as soon as the next one starts, so the worker only holds one
+        chunk; the zip container can only be sent once it is complete.
+        Rows beyond a worksheet's limit continue on a new worksheet.
+        """
+        with tempfile.NamedTemporaryFile(suffix='.xlsx') as target:
+            workbook = xlsxwriter.Workbook(target.name, {
+                'constant_memory': True,
+                'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+            })
+            bold = workbook.add_format({'bold': True})
+            sheet, row = None, XLSX_MAX_ROWS
+            for chunk in chunks:
+                for values in chunk:
+                    if row >= XLSX_MAX_ROWS:
+                        sheet = workbook.add_worksheet(_("Transactions") if sheet is None else None)
+                        sheet.write_row(0, 0, COLUMNS, bold)
+                        sheet.freeze_panes(1, 0)
+                        row = 1
+                    sheet.write_row(row, 0, values)
+                    row += 1
+            if sheet is None:
+                workbook.add_worksheet(_("Transactions")).write_row(0, 0, COLUMNS, bold)
+            workbook.close()
+            target.seek(0)
+            while block := target.read(STREAM_BLOCK):
+                yield block
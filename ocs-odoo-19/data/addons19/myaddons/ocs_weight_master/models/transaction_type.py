@@ -1,25 +1,60 @@
-from odoo import models, fields, api
-
-class TransactionType(models.Model):
-    _name = "weighbridge.transaction.type"
-    _description = "Weighbridge Transaction Type"
-    _order = "sequence, name"
-    _rec_name = "name"
-
-    name = fields.Char(string="Type Name", required=True)
-    code = fields.Char(string="Code", required=True, help="Internal code (e.g., 'in', 'out', 'in_out', 'visit')")
-    description = fields.Text(string="Description")
-    sequence = fields.Integer(string="Sequence", default=10, help="Order in which types appear")
-    active = fields.Boolean(string="Active", default=True)
-    
-    # Transaction count (computed)
-    transaction_count = fields.Integer(string="Transaction Count", compute="_compute_transaction_count")
-    
-    @api.depends('code')
-    def _compute_transaction_count(self):
-        """Count transactions for this type"""
-        for trans_type in self:
-            trans_type.transaction_count = self.env['weighbridge.transaction'].search_count([
-                ('type', '=', trans_type.code)
-            ])
-
+from odoo import models, fields, api
+from odoo.tools import ormcache
+
+class TransactionType(models.Model):
+    _name = "weighbridge.transaction.type"
+    _description = "Weighbridge Transaction Type"
+    _order = "sequence, name"
+    _rec_name = "name"
+
+    name = fields.Char(string="Type Name", required=True)
+    code = fields.Char(string="Code", required=True, help="Internal code (e.g., 'in', 'out', 'in_out', 'visit')")
+    description = fields.Text(string="Description")
+    sequence = fields.Integer(string="Sequence", default=10, help="Order in which types appear")
+    active = fields.Boolean(string="Active", default=True)
+    
+    # Transaction count, stored and recomputed only for the types whose transactions change.
+    # Archived tickets are history and still count, so archiving never changes it.
+    transaction_ids = fields.One2many('weighbridge.transaction', 'type_id', string="Transactions",
+                                      context={'active_test': False})
+    transaction_count = fields.Integer(string="Transaction Count", compute="_compute_transaction_count", store=True)
+    
+    @api.depends('transaction_ids')
+    def _compute_transaction_count(self):
+        """Count transactions of the whole recordset with one grouped query"""
+        counts = dict(self.env['weighbridge.transaction'].with_context(active_test=False)._read_group(
+            [('type_id', 'in', self.ids)], ['type_id'], ['__count']))
+        for trans_type in self:
+            trans_type.transaction_count = counts.get(trans_type, 0)
+
+    @api.model
+    @ormcache()
+    def _get_code_map(self):
+        """{code: id} of the active types, cached per process for create() and imports"""
+        return {trans_type.code: trans_type.id for trans_type in self.search([])}
+
+    @api.model
+    @ormcache()
+    def _get_default_type_id(self):
+        """Type of transactions created without one: 'In', else the first active type"""
+        type_record = self.env.ref('ocs_weight_master.transaction_type_in', raise_if_not_found=False)
+        if not type_record or not type_record.active:
+            type_record = self.search([('code', '=', 'in')], limit=1) or self.search([], limit=1)
+        return type_record.id or False
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        # Code and default type lookups are cached per process
+        self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
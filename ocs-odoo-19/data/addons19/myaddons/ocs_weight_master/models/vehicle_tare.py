@@ -0,0 +1,100 @@
+from datetime import timedelta
+
+from odoo import models, fields, api
+
+DEFAULT_TARE_VALIDITY_DAYS = 30
+TARE_AVERAGE_SAMPLES = 5  # the average follows roughly the last N tares, so refits and fuel show up
+
+
+class VehicleTare(models.Model):
+    _name = "weighbridge.vehicle.tare"
+    _description = "Vehicle Tare"
+    _order = "last_tare_date desc"
+    _rec_name = "vehicle_no"
+
+    vehicle_key = fields.Char(string="Plate Key", required=True, readonly=True,
+                              help="Vehicle No without case, spaces or dashes")
+    vehicle_no = fields.Char(string="Vehicle No", required=True)
+    last_tare = fields.Float(string="Last Tare", digits=(16, 3))
+    average_tare = fields.Float(string="Average Tare", digits=(16, 3),
+                                help="Running average over about the last %s weighings" % TARE_AVERAGE_SAMPLES)
+    tare_count = fields.Integer(string="Weighings")
+    last_tare_date = fields.Datetime(string="Last Weighed")
+    expiry_date = fields.Datetime(string="Valid Until",
+                                  help="After this the tare is no longer offered for single-pass weighing")
+    transaction_id = fields.Many2one('weighbridge.transaction', string="Last Transaction", readonly=True,
+                                     ondelete='set null')
+
+    _vehicle_key_uniq = models.UniqueIndex("(vehicle_key)")
+
+    @api.model
+    def _get_validity(self):
+        days = self.env['ir.config_parameter'].sudo().get_param(
+            'ocs_weight_master.tare_validity_days', DEFAULT_TARE_VALIDITY_DAYS)
+        try:
+            return timedelta(days=int(days))
+        except (ValueError, TypeError):
+            return timedelta(days=DEFAULT_TARE_VALIDITY_DAYS)
+
+    @api.model
+    def lookup(self, vehicle_key, at=None):
+        """Valid tare of a plate key as a dict (last, average, date, expiry), or None.
+
+        One probe of the unique vehicle_key index; expired tares are ignored.
+        """
+        if not vehicle_key:
+            return None
+        self.env.cr.execute("""
+            SELECT last_tare, average_tare, last_tare_date, expiry_date
+              FROM weighbridge_vehicle_tare
+             WHERE vehicle_key = %s AND (expiry_date IS NULL OR expiry_date > %s)
+        """, (vehicle_key, at or fields.Datetime.now()))
+        row = self.env.cr.fetchone()
+        if not row:
+            return None
+        return dict(zip(('last_tare', 'average_tare', 'date', 'expiry_date'), row))
+
+    @api.model
+    def _record(self, transactions):
+        """Fold the empty weighing of completed two-pass transactions into the registry.
+
+        The tare of a transaction is the lower of its two weighings. A
+        transaction already folded in (the registry's last one) is skipped,
+        so editing it again does not count twice.
+        """
+        validity = self._get_validity()
+        by_key = {}
+        for record in transactions.sorted(lambda r: r.exit_date or r.entrance_date or r.create_date):
+            by_key.setdefault(record.vehicle_key, []).append(record)
+        existing = {tare.vehicle_key: tare for tare in self.search([('vehicle_key', 'in', list(by_key))])}
+        for key, records in by_key.items():
+            tare = existing.get(key)
+            for record in records:
+                if tare and tare.transaction_id == record:
+                    continue
+                weight = min(record.entrance_weight, record.exit_weight)
+                weighed_at = min(filter(None, (record.entrance_date, record.exit_date)), default=fields.Datetime.now())
+                if tare and tare.last_tare_date and weighed_at < tare.last_tare_date:
+                    continue  # an older ticket edited later must not replace a newer tare
+                if not tare:
+                    tare = existing[key] = self.create({
+                        'vehicle_key': key,
+                        'vehicle_no': record.vehicle_no,
+                        'last_tare': weight,
+                        'average_tare': weight,
+                        'tare_count': 1,
+                        'last_tare_date': weighed_at,
+                        'expiry_date': weighed_at + validity,
+                        'transaction_id': record.id,
+                    })
+                    continue
+                count = tare.tare_count + 1
+                tare.write({
+                    'vehicle_no': record.vehicle_no,
+                    'last_tare': weight,
+                    'average_tare': tare.average_tare + (weight - tare.average_tare) / min(count, TARE_AVERAGE_SAMPLES),
+                    'tare_count': count,
+                    'last_tare_date': weighed_at,
+                    'expiry_date': weighed_at + validity,
+                    'transaction_id': record.id,
+                })
@@ -0,0 +1,113 @@
+from odoo import models, api
+from odoo.tools import SQL
+from odoo.tools.lru import LRU
+
+VOUCHER_CACHE_SIZE = 512  # rendered vouchers kept per process
+
+
+class WeighbridgeVoucherReport(models.AbstractModel):
+    """Report values for the voucher templates with per-record rendering cache.
+
+    Each voucher is rendered once from its document template and kept keyed
+    by everything the rendering depends on: the database, the transaction
+    and the newest write_date of it and its products (names are printed), the
+    newest write_date of the template and the views inheriting it, and the
+    company, language and timezone. The dates are read in full precision, so
+    a capture and a print in the same second still render again. A reprint of
+    an unchanged ticket is a dictionary lookup and a batch print only renders
+    the tickets that are new or changed.
+    """
+    _name = "weighbridge.voucher.report"
+    _description = "Weighbridge Voucher Report"
+
+    _document_template = None
+    _voucher_cache = LRU(VOUCHER_CACHE_SIZE)
+
+    def _register_hook(self):
+        # Registry (re)load, e.g. after a module upgrade: templates may have changed
+        super()._register_hook()
+        self._voucher_cache.clear()
+
+    @api.model
+    def _get_stamps(self, docs):
+        """{record id: newest write_date of the transaction and its products}, in full precision"""
+        self.env.flush_all()
+        field = docs._fields['product_ids']
+        self.env.cr.execute(SQL(
+            """SELECT t.id, max(GREATEST(t.write_date, pp.write_date, pt.write_date))
+                 FROM weighbridge_transaction t
+            LEFT JOIN %(rel)s rel ON rel.%(column1)s = t.id
+            LEFT JOIN product_product pp ON pp.id = rel.%(column2)s
+            LEFT JOIN product_template pt ON pt.id = pp.product_tmpl_id
+                WHERE t.id = ANY(%(ids)s)
+             GROUP BY t.id""",
+            rel=SQL.identifier(field.relation), column1=SQL.identifier(field.column1),
+            column2=SQL.identifier(field.column2), ids=docs.ids,
+        ))
+        return dict(self.env.cr.fetchall())
+
+    @api.model
+    def _get_template_stamp(self):
+        """Newest write_date of the document template and the views inheriting it"""
+        view = self.env.ref(self._document_template)
+        self.env.cr.execute("""
+            WITH RECURSIVE tree(id) AS (
+                SELECT %s
+                 UNION
+                SELECT v.id FROM ir_ui_view v JOIN tree ON v.inherit_id = tree.id
+            )
+            SELECT max(write_date) FROM ir_ui_view WHERE id IN (SELECT id FROM tree)
+        """, [view.id])
+        return self.env.cr.fetchone()[0]
+
+    @api.model
+    def _render_vouchers(self, docs):
+        """{record id: Markup} of every voucher in ``docs``, rendered on cache miss only"""
+        QWeb = self.env['ir.qweb']
+        context_key = (
+            self.env.cr.dbname, self._document_template, self._get_template_stamp(),
+            self.env.company.id, self.env.lang, self.env.context.get('tz') or self.env.user.tz,
+        )
+        stamps = self._get_stamps(docs)
+        rendered = {}
+        for doc in docs:
+            key = (context_key, doc.id, stamps.get(doc.id))
+            try:
+                html = self._voucher_cache[key]
+            except KeyError:
+                html = self._voucher_cache[key] = QWeb._render(self._document_template, {
+                    'o': doc,
+                    'docs': docs,
+                    'doc_model': docs._name,
+                    'res_company': self.env.company,
+                    'user': self.env.user,
+                })
+            rendered[doc.id] = html
+        return rendered
+
+    @api.model
+    def _get_report_values(self, docids, data=None):
+        docs = self.env['weighbridge.transaction'].browse(docids)
+        return {
+            'doc_ids': docids,
+            'doc_model': 'weighbridge.transaction',
+            'docs': docs,
+            'data': data,
+            'voucher_html': self._render_vouchers(docs),
+        }
+
+
+class WeighbridgeTransactionReport(models.AbstractModel):
+    _name = "report.ocs_weight_master.weighbridge_transaction_report"
+    _inherit = "weighbridge.voucher.report"
+    _description = "Weighbridge Transaction Voucher"
+
+    _document_template = "ocs_weight_master.weighbridge_transaction_report_document"
+
+
+class WeighbridgeTransactionEntranceReport(models.AbstractModel):
+    _name = "report.ocs_weight_master.weighbridge_transaction_entrance_report"
+    _inherit = "weighbridge.voucher.report"
+    _description = "Weighbridge Entrance Voucher"
+
+    _document_template = "ocs_weight_master.weighbridge_transaction_entrance_report_document"
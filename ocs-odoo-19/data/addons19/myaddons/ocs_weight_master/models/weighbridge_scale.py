@@ -0,0 +1,174 @@
+import logging
+
+from odoo import models, fields, api
+from odoo.tools import ormcache, str2bool
+
+from .stability import DEFAULT_WINDOW, DEFAULT_TOLERANCE, DEFAULT_MIN_DURATION_MS
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_WRITE_HEARTBEAT = 10  # seconds
+# A fetch button holds an HTTP worker while it waits; stay well below limit_time_real
+MAX_STABLE_WAIT = 10  # seconds
+
+
+class WeighbridgeScale(models.Model):
+    _name = "weighbridge.scale"
+    _description = "Weighbridge Scale"
+    _order = "sequence, name"
+    _rec_name = "name"
+
+    name = fields.Char(string="Scale Name", required=True)
+    code = fields.Char(string="Scale ID", required=True,
+                       help="Last level of the MQTT topic the scale publishes on, e.g. 'master' for weight/master")
+    sequence = fields.Integer(string="Sequence", default=10)
+    active = fields.Boolean(string="Active", default=True)
+    latest_id = fields.Many2one('weight.latest', string="Latest Weight", compute="_compute_latest_id")
+    weight = fields.Float(string="Latest Weight", digits=(16, 3), related="latest_id.weight")
+    timestamp = fields.Datetime(string="Timestamp", related="latest_id.timestamp")
+    is_stable = fields.Boolean(string="Stable", related="latest_id.is_stable")
+    
+    # Stability detection
+    stability_window = fields.Integer(string="Stability Window", default=DEFAULT_WINDOW,
+                                      help="Number of consecutive readings the spread is measured over")
+    stability_tolerance = fields.Float(string="Stability Tolerance", digits=(16, 3), default=DEFAULT_TOLERANCE,
+                                       help="Maximum standard deviation of the window for the weight to count as stable")
+    stability_min_ms = fields.Integer(string="Minimum Stable Time (ms)", default=DEFAULT_MIN_DURATION_MS,
+                                      help="How long the window must stay within tolerance before the weight is stable")
+    require_stable = fields.Boolean(string="Require Stable Weight",
+                                    help="Fetch buttons capture the stable weight and refuse to capture while the scale is moving")
+    stable_wait = fields.Float(string="Stable Wait (s)", default=3.0,
+                               help="How long a fetch button waits for the scale to settle before giving up "
+                                    "(at most %s seconds)" % MAX_STABLE_WAIT)
+
+    # When the ingest writer rewrites the weight.latest row
+    write_deadband = fields.Float(string="Write Deadband", digits=(16, 3), default=0.0,
+                                  help="The latest weight row is only rewritten when the weight moves more than this "
+                                       "from the last stored value (0 = any change), when stability changes, "
+                                       "or after the heartbeat. The live weight in memory is always current.")
+    write_heartbeat = fields.Integer(string="Write Heartbeat (s)", default=DEFAULT_WRITE_HEARTBEAT,
+                                     help="Rewrite the latest weight row at least this often while readings arrive, "
+                                          "so a stale row stays detectable. 0 rewrites it for every reading.")
+
+    # Where the readings come from
+    source = fields.Selection([
+        ('mqtt', 'MQTT (Node-RED)'),
+        ('serial', 'Serial Port'),
+        ('tcp', 'TCP Serial Server'),
+    ], string="Source", default='mqtt', required=True,
+        help="Serial and TCP scales are read and decoded directly by the ingest leader; "
+             "changes take effect when the leader restarts")
+    serial_device = fields.Char(string="Serial Device", help="e.g. /dev/ttyUSB0")
+    baudrate = fields.Integer(string="Baud Rate", default=9600)
+    tcp_host = fields.Char(string="Serial Server Host")
+    tcp_port = fields.Integer(string="Serial Server Port", default=4001)
+
+    _code_uniq = models.Constraint('UNIQUE(code)', "Scale ID must be unique.")
+    _stable_wait_range = models.Constraint(
+        'CHECK(stable_wait >= 0 AND stable_wait <= %s)' % MAX_STABLE_WAIT,
+        "Stable Wait must be between 0 and %s seconds." % MAX_STABLE_WAIT,
+    )
+
+    def _compute_latest_id(self):
+        latest_by_scale = {
+            latest.scale_id.id: latest
+            for latest in self.env['weight.latest'].search([('scale_id', 'in', self.ids)])
+        }
+        for scale in self:
+            scale.latest_id = latest_by_scale.get(scale.id, False)
+
+    @api.model
+    def _get_default_scale(self):
+        """Scale used by transactions and forms that do not name one"""
+        scale = self.env.ref('ocs_weight_master.scale_master', raise_if_not_found=False)
+        if not scale or not scale.active:
+            scale = self.search([], limit=1)
+        return scale
+
+    @api.model
+    def code_from_topic(self, topic):
+        """weight/<code> -> <code>"""
+        return (topic or '').rstrip('/').rsplit('/', 1)[-1]
+
+    @api.model
+    @ormcache('code')
+    def _get_scale_id(self, code):
+        """Return the scale id for a scale ID, or False for an unknown scale.
+
+        Unknown scales are only registered when the
+        ocs_weight_master.auto_register_scales system parameter is set;
+        otherwise anyone able to publish on the broker could create scales.
+        Cached per process so routing an incoming frame is a dict lookup; the
+        cache is cleared whenever scales or system parameters change.
+        """
+        scale = self.with_context(active_test=False).search([('code', '=', code)], limit=1)
+        if not scale:
+            auto_register = self.env['ir.config_parameter'].sudo().get_param('ocs_weight_master.auto_register_scales')
+            if not str2bool(auto_register or '0', False):
+                return False
+            _logger.info("Registering new weighbridge scale '%s' from MQTT.", code)
+            scale = self.create({'name': code, 'code': code})
+        return scale.id
+
+    @api.model
+    @ormcache('code')
+    def _get_latest_id(self, code):
+        """Return the weight.latest row id for a scale ID, cached like _get_scale_id()"""
+        return self.env['weight.latest'].get_latest(self.browse(self._get_scale_id(code))).id
+
+    @api.model
+    @ormcache('code')
+    def _get_stability_params(self, code):
+        """(window, tolerance, min_duration_ms) of a scale ID, cached per process"""
+        scale = self.with_context(active_test=False).search([('code', '=', code)], limit=1)
+        if not scale:
+            return DEFAULT_WINDOW, DEFAULT_TOLERANCE, DEFAULT_MIN_DURATION_MS
+        return scale.stability_window, scale.stability_tolerance, scale.stability_min_ms
+
+    @api.model
+    @ormcache('code')
+    def _get_write_policy(self, code):
+        """(deadband, heartbeat seconds) of a scale ID, cached per process"""
+        scale = self.with_context(active_test=False).search([('code', '=', code)], limit=1)
+        if not scale:
+            return 0.0, DEFAULT_WRITE_HEARTBEAT
+        return scale.write_deadband, scale.write_heartbeat
+
+    @api.model
+    def _get_direct_sources(self):
+        """Settings of the active scales read over serial or TCP instead of MQTT"""
+        scales = self.search([('source', 'in', ('serial', 'tcp'))])
+        sources = []
+        for scale in scales:
+            if scale.source == 'serial' and not scale.serial_device:
+                _logger.warning("Scale '%s' reads from serial but has no device set; skipping.", scale.code)
+                continue
+            if scale.source == 'tcp' and not (scale.tcp_host and scale.tcp_port):
+                _logger.warning("Scale '%s' reads from TCP but has no host/port set; skipping.", scale.code)
+                continue
+            sources.append({
+                'code': scale.code,
+                'source': scale.source,
+                'serial_device': scale.serial_device,
+                'baudrate': scale.baudrate,
+                'tcp_host': scale.tcp_host,
+                'tcp_port': scale.tcp_port,
+            })
+        return sources
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        # Routing and stability settings are cached per process
+        self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
@@ -1,278 +1,555 @@
-from odoo import models, fields, api
-from datetime import datetime
-
-class WeighbridgeTransaction(models.Model):
-    _name = "weighbridge.transaction"
-    _description = "Weighbridge Transaction"
-    _order = "create_date desc, id desc"
-    _rec_name = "voucher_no"
-
-    voucher_no = fields.Char(string="Voucher No", required=True, readonly=True, copy=False, default='New')
-    vehicle_no = fields.Char(string="Vehicle No", required=True)
-    
-    # Driver - Many2one relationship
-    driver_id = fields.Many2one('weighbridge.driver', string="Driver", help="Select driver")
-    
-    # Driver fields (can be filled from driver_id or entered manually)
-    driver_name = fields.Char(string="Driver Name")
-    driver_nrc = fields.Char(string="NRC")
-    driver_phone = fields.Char(string="Phone Number")
-    
-    # Company/Customer
-    company_name = fields.Char(string="Company Name")
-    partner_id = fields.Many2one('res.partner', string="Customer", help="Select customer")
-    
-    # Responsible Employee
-    responsible_id = fields.Many2one('hr.employee', string="Responsible", help="Select employee")
-    
-    deliver_to = fields.Text(string="Deliver To")
-    
-    # Transaction Type - Many2one relationship
-    # Note: required=False initially to avoid initialization issues, validation in create()
-    type_id = fields.Many2one('weighbridge.transaction.type', string="Type", required=False)
-    
-    # Keep type as Selection for backward compatibility during migration
-    # Will be synced with type_id via onchange
-    type = fields.Selection([
-        ('in', 'In'),
-        ('out', 'Out'),
-        ('in_out', 'In-Out'),
-        ('visit', 'Visit')
-    ], string="Type Code", required=False)
-    
-    @api.model
-    def _default_type_id(self):
-        """Default to 'In' type - safe to call after model initialization"""
-        try:
-            type_record = self.env['weighbridge.transaction.type'].search([('code', '=', 'in')], limit=1)
-            if not type_record:
-                # Fallback: return first active type if 'in' doesn't exist
-                type_record = self.env['weighbridge.transaction.type'].search([('active', '=', True)], limit=1)
-            return type_record.id if type_record else False
-        except Exception:
-            # During module installation, table might not exist yet
-            return False
-    
-    product_ids = fields.Many2many('product.product', string="Products")
-    
-    remark1 = fields.Text(string="Remark 1")
-    remark2 = fields.Text(string="Remark 2")
-    
-    entrance_weight = fields.Float(string="Entrance Weight", digits=(16, 3))
-    exit_weight = fields.Float(string="Exit Weight", digits=(16, 3))
-    net_weight = fields.Float(string="Net Weight", digits=(16, 3), compute="_compute_net_weight", store=True)
-    
-    entrance_date = fields.Datetime(string="Entrance Date")
-    exit_date = fields.Datetime(string="Exit Date")
-    
-    state = fields.Selection([
-        ('draft', 'Draft'),
-        ('entrance', 'Entrance'),
-        ('exit', 'Exit'),
-        ('completed', 'Completed')
-    ], string="State", default='draft', required=True)
-    
-    @api.depends('entrance_weight', 'exit_weight', 'type')
-    def _compute_net_weight(self):
-        for record in self:
-            if record.type == 'in':
-                record.net_weight = record.entrance_weight or 0.0
-            elif record.type == 'out':
-                record.net_weight = record.exit_weight or 0.0
-            elif record.type == 'in_out':
-                record.net_weight = (record.exit_weight or 0.0) - (record.entrance_weight or 0.0)
-            else:
-                record.net_weight = 0.0
-
-    @api.onchange('partner_id')
-    def _onchange_partner_id(self):
-        """Update company_name when partner is selected"""
-        if self.partner_id:
-            self.company_name = self.partner_id.name
-
-    @api.onchange('driver_id')
-    def _onchange_driver_id(self):
-        """Update driver fields when driver is selected"""
-        if self.driver_id:
-            self.driver_name = self.driver_id.name
-            self.driver_nrc = self.driver_id.nrc
-            self.driver_phone = self.driver_id.phone
-        else:
-            # Clear fields if driver is removed
-            self.driver_name = False
-            self.driver_nrc = False
-            self.driver_phone = False
-
-    @api.onchange('type_id')
-    def _onchange_type_id(self):
-        """Sync type field when type_id is selected"""
-        if self.type_id:
-            self.type = self.type_id.code
-
-    @api.onchange('type')
-    def _onchange_type(self):
-        """Sync type_id when type is selected"""
-        if self.type:
-            type_record = self.env['weighbridge.transaction.type'].search([('code', '=', self.type)], limit=1)
-            if type_record:
-                self.type_id = type_record
-
-    @api.model_create_multi
-    def create(self, vals_list):
-        """Override create to generate voucher numbers and set default type"""
-        for vals in vals_list:
-            if vals.get('voucher_no', 'New') == 'New':
-                # Generate voucher number: YYYYMMDDHHMMSS (datetime only)
-                now = datetime.now()
-                vals['voucher_no'] = now.strftime('%Y%m%d%H%M%S')
-            
-            # Set default type_id if not provided (required field)
-            if not vals.get('type_id'):
-                try:
-                    # Try to get default type from context first
-                    if self.env.context.get('default_type_id'):
-                        vals['type_id'] = self.env.context.get('default_type_id')
-                    else:
-                        # Try XML ID reference first (fastest, no DB query)
-                        try:
-                            type_ref = self.env.ref('ocs_weight_master.transaction_type_in', raise_if_not_found=False)
-                            if type_ref:
-                                vals['type_id'] = type_ref.id
-                        except Exception:
-                            pass
-                        
-                        # Fallback to search method
-                        if not vals.get('type_id'):
-                            default_type_id = self._default_type_id()
-                            if default_type_id:
-                                vals['type_id'] = default_type_id
-                except Exception:
-                    # If all else fails, try to get any active type
-                    try:
-                        any_type = self.env['weighbridge.transaction.type'].search([('active', '=', True)], limit=1)
-                        if any_type:
-                            vals['type_id'] = any_type.id
-                    except Exception:
-                        pass
-            
-            # Ensure type_id is set (required field validation)
-            if not vals.get('type_id'):
-                raise ValueError("Transaction type is required. Please select a type.")
-            
-            # Sync type field with type_id
-            if vals.get('type_id') and not vals.get('type'):
-                try:
-                    type_record = self.env['weighbridge.transaction.type'].browse(vals['type_id'])
-                    if type_record.exists():
-                        vals['type'] = type_record.code
-                except Exception:
-                    pass
-            
-            # Sync type_id with type field (if type is provided but type_id is not)
-            if vals.get('type') and not vals.get('type_id'):
-                try:
-                    type_record = self.env['weighbridge.transaction.type'].search([('code', '=', vals['type'])], limit=1)
-                    if type_record:
-                        vals['type_id'] = type_record.id
-                except Exception:
-                    pass
-        return super(WeighbridgeTransaction, self).create(vals_list)
-
-    def action_fetch_entrance_weight(self):
-        """Fetch entrance weight from latest MQTT data"""
-        self.ensure_one()
-        latest_record = self.env['weight.latest'].get_latest()
-        
-        # Invalidate cache to get fresh data
-        latest_record.invalidate_recordset(['weight', 'timestamp'])
-        
-        # Read fresh data from database
-        self.env.cr.execute("""
-            SELECT weight, timestamp 
-            FROM weight_latest 
-            WHERE id = %s
-        """, (latest_record.id,))
-        result = self.env.cr.fetchone()
-        
-        if result:
-            fresh_weight, fresh_timestamp = result
-            self.write({
-                'entrance_weight': fresh_weight,
-                'entrance_date': fresh_timestamp,
-                'state': 'entrance',
-            })
-            message = f'Entrance weight {fresh_weight} fetched successfully'
-        else:
-            message = 'No weight data found'
-        
-        # Reload the form to show updated data
-        return {
-            'type': 'ir.actions.act_window',
-            'name': 'Entrance Form',
-            'res_model': 'weighbridge.transaction',
-            'res_id': self.id,
-            'view_mode': 'form',
-            'view_id': self.env.ref('ocs_weight_master.view_weighbridge_transaction_entrance_form').id,
-            'target': 'current',
-        }
-
-    def action_fetch_exit_weight(self):
-        """Fetch exit weight from latest MQTT data"""
-        self.ensure_one()
-        latest_record = self.env['weight.latest'].get_latest()
-        
-        # Invalidate cache to get fresh data
-        latest_record.invalidate_recordset(['weight', 'timestamp'])
-        
-        # Read fresh data from database
-        self.env.cr.execute("""
-            SELECT weight, timestamp 
-            FROM weight_latest 
-            WHERE id = %s
-        """, (latest_record.id,))
-        result = self.env.cr.fetchone()
-        
-        if result:
-            fresh_weight, fresh_timestamp = result
-            self.write({
-                'exit_weight': fresh_weight,
-                'exit_date': fresh_timestamp,
-                'state': 'exit' if self.state == 'entrance' else 'completed',
-            })
-            message = f'Exit weight {fresh_weight} fetched successfully'
-        else:
-            message = 'No weight data found'
-        
-        # Reload the form to show updated data
-        return {
-            'type': 'ir.actions.act_window',
-            'name': 'Exit Form',
-            'res_model': 'weighbridge.transaction',
-            'res_id': self.id,
-            'view_mode': 'form',
-            'view_id': self.env.ref('ocs_weight_master.view_weighbridge_transaction_exit_form').id,
-            'target': 'current',
-        }
-
-    def action_print_entrance(self):
-        """Open entrance form report in new window for POS printing"""
-        self.ensure_one()
-        report = self.env.ref('ocs_weight_master.action_report_weighbridge_transaction_entrance')
-        url = f'/report/html/{report.report_name}/{self.id}'
-        return {
-            'type': 'ir.actions.act_url',
-            'url': url,
-            'target': 'new',
-        }
-
-    def action_print_all_data(self):
-        """Open full transaction report in new window for POS printing"""
-        self.ensure_one()
-        report = self.env.ref('ocs_weight_master.action_report_weighbridge_transaction')
-        url = f'/report/html/{report.report_name}/{self.id}'
-        return {
-            'type': 'ir.actions.act_url',
-            'url': url,
-            'target': 'new',
-        }
-
+import re
+from datetime import timedelta
+
+import pytz
+
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+
+from . import escpos
+from .archive import archive_older_than
+from .tonnage_report import DONE_STATES
+
+# Separators operators and ANPR cameras disagree on: "YGN 1A-2345" == "ygn1a2345"
+PLATE_SEPARATORS = re.compile(r"[\s\-_./\\]+")
+
+
+# Fields that move a transaction's net weight between tonnage rollup rows
+TONNAGE_FIELDS = {
+    'state', 'entrance_weight', 'exit_weight', 'type', 'type_id', 'partner_id', 'product_ids',
+    'entrance_date', 'exit_date',
+}
+# Fields that can make a transaction a new tare observation
+TARE_FIELDS = {'state', 'entrance_weight', 'exit_weight', 'type', 'type_id', 'vehicle_no'}
+
+DEFAULT_ARCHIVE_DAYS = 90  # completed tickets older than this leave the default lists
+
+
+def normalize_plate(plate):
+    """Case, space and dash insensitive key of a vehicle plate"""
+    return PLATE_SEPARATORS.sub("", plate or "").upper()
+
+
+class WeighbridgeTransaction(models.Model):
+    _name = "weighbridge.transaction"
+    _description = "Weighbridge Transaction"
+    _order = "create_date desc, id desc"
+    _rec_name = "voucher_no"
+
+    voucher_no = fields.Char(string="Voucher No", required=True, readonly=True, copy=False, default='New')
+    vehicle_no = fields.Char(string="Vehicle No", required=True)
+    vehicle_key = fields.Char(string="Plate Key", compute="_compute_vehicle_key", store=True, index='trigram',
+                              help="Vehicle No without case, spaces or dashes, used for plate lookups")
+    plate = fields.Char(string="Plate", compute="_compute_plate", search="_search_plate")
+    
+    # Driver - Many2one relationship
+    driver_id = fields.Many2one('weighbridge.driver', string="Driver", help="Select driver")
+    
+    # Driver fields (can be filled from driver_id or entered manually)
+    driver_name = fields.Char(string="Driver Name")
+    driver_nrc = fields.Char(string="NRC")
+    driver_phone = fields.Char(string="Phone Number")
+    
+    # Company/Customer
+    company_name = fields.Char(string="Company Name")
+    partner_id = fields.Many2one('res.partner', string="Customer", help="Select customer")
+    
+    # Responsible Employee
+    responsible_id = fields.Many2one('hr.employee', string="Responsible", help="Select employee")
+    
+    deliver_to = fields.Text(string="Deliver To")
+    
+    # Transaction Type - Many2one relationship
+    # Note: required=False initially to avoid initialization issues, validation in create()
+    type_id = fields.Many2one('weighbridge.transaction.type', string="Type", required=False)
+    
+    # Keep type as Selection for backward compatibility during migration
+    # Will be synced with type_id via onchange
+    type = fields.Selection([
+        ('in', 'In'),
+        ('out', 'Out'),
+        ('in_out', 'In-Out'),
+        ('visit', 'Visit')
+    ], string="Type Code", required=False)
+    
+    @api.model
+    def _default_type_id(self):
+        """Default to 'In' type - safe to call after model initialization"""
+        try:
+            return self.env['weighbridge.transaction.type']._get_default_type_id()
+        except Exception:
+            # During module installation, table might not exist yet
+            return False
+    
+    @api.model
+    def _default_scale_id(self):
+        return self.env['weighbridge.scale']._get_default_scale().id
+    
+    product_ids = fields.Many2many('product.product', string="Products")
+    
+    # Scale the fetch buttons read from
+    scale_id = fields.Many2one('weighbridge.scale', string="Scale", default=lambda self: self._default_scale_id())
+    
+    remark1 = fields.Text(string="Remark 1")
+    remark2 = fields.Text(string="Remark 2")
+    
+    entrance_weight = fields.Float(string="Entrance Weight", digits=(16, 3))
+    exit_weight = fields.Float(string="Exit Weight", digits=(16, 3))
+    net_weight = fields.Float(string="Net Weight", digits=(16, 3), compute="_compute_net_weight", store=True)
+    
+    entrance_date = fields.Datetime(string="Entrance Date")
+    exit_date = fields.Datetime(string="Exit Date")
+    # Local calendar day the tonnage counts on: exit, else entrance, else creation
+    report_day = fields.Date(string="Report Day", compute="_compute_report_day", store=True, index=True)
+    
+    state = fields.Selection([
+        ('draft', 'Draft'),
+        ('entrance', 'Entrance'),
+        ('exit', 'Exit'),
+        ('completed', 'Completed')
+    ], string="State", default='draft', required=True)
+    
+    # Single-pass weighing: the empty weight comes from the vehicle tare registry
+    tare_source = fields.Selection([
+        ('weighed', 'Weighed'),
+        ('stored', 'Stored Tare'),
+    ], string="Tare Source", default='weighed', required=True, copy=False,
+        help="Stored Tare: the entrance weight was taken from the vehicle's registered tare instead of the scale")
+    stored_tare = fields.Float(string="Stored Tare", digits=(16, 3), compute="_compute_stored_tare")
+    stored_tare_date = fields.Datetime(string="Tare Weighed On", compute="_compute_stored_tare")
+
+    active = fields.Boolean(string="Active", default=True, copy=False,
+                            help="Completed tickets are archived after ocs_weight_master.archive_after_days; "
+                                 "use the Archived filter to search them")
+
+    # Central instance: the site a synced transaction comes from, its last change and driver id there
+    site_code = fields.Char(string="Site", readonly=True, copy=False)
+    site_write_date = fields.Datetime(string="Site Last Change", readonly=True, copy=False)
+    site_driver_ref = fields.Integer(string="Site Driver ID", readonly=True, copy=False)
+
+    # Both match _order: the partial one serves the default (active) lists, the full one archive searches
+    _active_order_idx = models.Index("(create_date DESC, id DESC) WHERE active")
+    _order_idx = models.Index("(create_date DESC, id DESC)")
+    # Exit lookups only look at open transactions, so the index skips the completed history
+    _vehicle_key_open_idx = models.Index("(vehicle_key, create_date DESC, id DESC) WHERE state != 'completed'")
+    # Exact plate searches over the whole history; partial ones use the trigram index of the field
+    _vehicle_key_idx = models.Index("(vehicle_key)")
+    # Sites push changes in (write_date, id) order after a watermark
+    _sync_order_idx = models.Index("(write_date, id)")
+    # A pushed voucher is upserted on its site; local vouchers have no site
+    _site_voucher_uniq = models.UniqueIndex("(site_code, voucher_no) WHERE site_code IS NOT NULL")
+
+    @api.model
+    def _get_report_tz(self):
+        """Timezone of the tonnage day buckets: system parameter, else the company's"""
+        tz = (self.env['ir.config_parameter'].sudo().get_param('ocs_weight_master.report_tz')
+              or self.env.company.partner_id.tz or 'UTC')
+        try:
+            return pytz.timezone(tz)
+        except pytz.UnknownTimeZoneError:
+            return pytz.utc
+
+    @api.depends('exit_date', 'entrance_date', 'create_date')
+    def _compute_report_day(self):
+        tz = self._get_report_tz()
+        for record in self:
+            moment = record.exit_date or record.entrance_date or record.create_date
+            record.report_day = pytz.utc.localize(moment).astimezone(tz).date() if moment else False
+
+    @api.depends('vehicle_no')
+    def _compute_vehicle_key(self):
+        for record in self:
+            record.vehicle_key = normalize_plate(record.vehicle_no)
+
+    @api.depends('vehicle_no')
+    def _compute_stored_tare(self):
+        Tare = self.env['weighbridge.vehicle.tare']
+        use_average = self.env['ir.config_parameter'].sudo().get_param('ocs_weight_master.tare_use') == 'average'
+        for record in self:
+            tare = Tare.lookup(normalize_plate(record.vehicle_no))
+            record.stored_tare = (tare['average_tare'] if use_average else tare['last_tare']) if tare else 0.0
+            record.stored_tare_date = tare['date'] if tare else False
+
+    def _compute_plate(self):
+        for record in self:
+            record.plate = record.vehicle_no
+
+    def _search_plate(self, operator, value):
+        """Exact or partial match on the normalised key: "ygn 1a" finds YGN-1A 2345"""
+        if operator == '=' and isinstance(value, str):
+            return [('vehicle_key', '=', normalize_plate(value))]
+        if operator in ('ilike', 'like') and isinstance(value, str):
+            return [('vehicle_key', 'ilike', normalize_plate(value))]
+        return [('vehicle_no', operator, value)]
+
+    @api.model
+    def find_open_by_plate(self, plate, states=('entrance',), limit=1):
+        """Most recent open transactions of a plate, newest first.
+
+        Plain SQL so the predicate matches the partial _vehicle_key_open_idx
+        index; the ORM would turn != into "!= OR IS NULL".
+        """
+        key = normalize_plate(plate)
+        if not key:
+            return self.browse()
+        self.env.cr.execute("""
+            SELECT id
+              FROM weighbridge_transaction
+             WHERE vehicle_key = %s AND state != 'completed' AND state = ANY(%s)
+          ORDER BY create_date DESC, id DESC
+             LIMIT %s
+        """, (key, list(states), limit))
+        return self.browse([row[0] for row in self.env.cr.fetchall()])
+
+    @api.model
+    def action_open_by_plate(self, plate):
+        """Open the exit form of the truck with this plate, for scanners and quick entry"""
+        record = self.find_open_by_plate(plate)
+        if not record:
+            return {
+                'type': 'ir.actions.client',
+                'tag': 'display_notification',
+                'params': {
+                    'title': _('Not Found'),
+                    'message': _('No open transaction for plate %s.', plate),
+                    'type': 'warning',
+                    'sticky': False,
+                }
+            }
+        return {
+            'type': 'ir.actions.act_window',
+            'name': 'Exit Form',
+            'res_model': 'weighbridge.transaction',
+            'res_id': record.id,
+            'view_mode': 'form',
+            'view_id': self.env.ref('ocs_weight_master.view_weighbridge_transaction_exit_form').id,
+            'target': 'current',
+        }
+
+    @api.depends('entrance_weight', 'exit_weight', 'type')
+    def _compute_net_weight(self):
+        for record in self:
+            if record.type == 'in':
+                record.net_weight = record.entrance_weight or 0.0
+            elif record.type == 'out':
+                record.net_weight = record.exit_weight or 0.0
+            elif record.type == 'in_out':
+                record.net_weight = (record.exit_weight or 0.0) - (record.entrance_weight or 0.0)
+            else:
+                record.net_weight = 0.0
+
+    @api.onchange('partner_id')
+    def _onchange_partner_id(self):
+        """Update company_name when partner is selected"""
+        if self.partner_id:
+            self.company_name = self.partner_id.name
+
+    @api.onchange('driver_id')
+    def _onchange_driver_id(self):
+        """Update driver fields when driver is selected"""
+        if self.driver_id:
+            self.driver_name = self.driver_id.name
+            self.driver_nrc = self.driver_id.nrc
+            self.driver_phone = self.driver_id.phone
+        else:
+            # Clear fields if driver is removed
+            self.driver_name = False
+            self.driver_nrc = False
+            self.driver_phone = False
+
+    @api.onchange('type_id')
+    def _onchange_type_id(self):
+        """Sync type field when type_id is selected"""
+        if self.type_id:
+            self.type = self.type_id.code
+
+    @api.onchange('type')
+    def _onchange_type(self):
+        """Sync type_id when type is selected"""
+        if self.type:
+            type_id = self.env['weighbridge.transaction.type']._get_code_map().get(self.type)
+            if type_id:
+                self.type_id = type_id
+
+    @api.model
+    def _allocate_vouchers(self, count):
+        """Return ``count`` voucher numbers from the weighbridge.transaction sequence.
+
+        A standard sequence hands out the whole block with one nextval() query;
+        no-gap and date-range sequences go through ir.sequence one by one.
+        """
+        if not count:
+            return []
+        sequence = self.env['ir.sequence'].sudo().search([('code', '=', self._name)], limit=1)
+        if not sequence:
+            # Timestamps would collide between concurrent or same-second creates
+            raise UserError(_("The voucher sequence (code %s) is missing. Restore it under "
+                              "Settings > Technical > Sequences or upgrade the module.", self._name))
+        if sequence.implementation != 'standard' or sequence.use_date_range:
+            return [sequence.next_by_id() for _i in range(count)]
+        self.env.cr.execute("SELECT nextval(%s) FROM generate_series(1, %s)",
+                            ('ir_sequence_%03d' % sequence.id, count))
+        return [sequence.get_next_char(number) for number, in self.env.cr.fetchall()]
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        """Override create to generate voucher numbers and set default type.
+
+        Types are resolved through the cached code map of
+        weighbridge.transaction.type and vouchers are allocated for the whole
+        batch at once, so creating many rows costs no extra queries per row.
+        """
+        Type = self.env['weighbridge.transaction.type']
+        code_to_id = Type._get_code_map()
+        id_to_code = {type_id: code for code, type_id in code_to_id.items()}
+
+        needs_voucher = [vals for vals in vals_list if vals.get('voucher_no', 'New') == 'New']
+        for vals, voucher in zip(needs_voucher, self._allocate_vouchers(len(needs_voucher))):
+            vals['voucher_no'] = voucher
+
+        for vals in vals_list:
+            # Sync type_id with type field (if type is provided but type_id is not)
+            if vals.get('type') and not vals.get('type_id'):
+                vals['type_id'] = code_to_id.get(vals['type'], False)
+
+            # Set default type_id if not provided (required field)
+            if not vals.get('type_id'):
+                vals['type_id'] = self.env.context.get('default_type_id') or self._default_type_id()
+
+            # Ensure type_id is set (required field validation)
+            if not vals.get('type_id'):
+                raise ValueError("Transaction type is required. Please select a type.")
+
+            # Sync type field with type_id
+            if not vals.get('type'):
+                code = id_to_code.get(vals['type_id'])
+                if code is None:
+                    # Archived type: not in the cached map of active types
+                    code = Type.browse(vals['type_id']).exists().code
+                if code:
+                    vals['type'] = code
+        records = super(WeighbridgeTransaction, self).create(vals_list)
+        self.env['weighbridge.tonnage.daily']._mark_dirty(records.mapped('report_day'))
+        records._record_tares()
+        return records
+
+    def write(self, vals):
+        tracked = not TONNAGE_FIELDS.isdisjoint(vals)
+        days = set(self.mapped('report_day')) if tracked else set()
+        res = super().write(vals)
+        if tracked:
+            days.update(self.mapped('report_day'))
+            self.env['weighbridge.tonnage.daily']._mark_dirty(days)
+        if not TARE_FIELDS.isdisjoint(vals):
+            self._record_tares()
+        return res
+
+    def _record_tares(self):
+        """Feed completed two-pass In-Out weighings to the vehicle tare registry"""
+        weighed = self.filtered(lambda r: r.state in DONE_STATES and r.type == 'in_out' and r.tare_source == 'weighed'
+                                and r.vehicle_key and r.entrance_weight > 0 and r.exit_weight > 0)
+        if weighed:
+            self.env['weighbridge.vehicle.tare'].sudo()._record(weighed)
+
+    def unlink(self):
+        days = set(self.mapped('report_day'))
+        res = super().unlink()
+        self.env['weighbridge.tonnage.daily']._mark_dirty(days)
+        return res
+
+    @api.model
+    def _cron_archive(self):
+        """Archive completed tickets created before ocs_weight_master.archive_after_days (0 = never)"""
+        days = int(self.env['ir.config_parameter'].sudo().get_param(
+            'ocs_weight_master.archive_after_days', DEFAULT_ARCHIVE_DAYS))
+        if days > 0:
+            archive_older_than(self.env.cr, self._table, fields.Datetime.now() - timedelta(days=days),
+                               condition="state = 'completed'")
+            self.invalidate_model(['active'])
+
+    @api.model
+    def bulk_create(self, vals_list, batch_size=1000):
+        """Create many transactions, e.g. when importing historical tickets.
+
+        Rows are created ``batch_size`` at a time (one voucher block, one
+        multi-row INSERT per batch) and the environment cache is flushed and
+        cleared between batches so memory stays flat. ``type`` may be given
+        as a code instead of ``type_id``. Rows with a ``voucher_no`` keep it.
+        Returns the created records.
+        """
+        ids = []
+        for start in range(0, len(vals_list), batch_size):
+            batch = self.create([dict(vals) for vals in vals_list[start:start + batch_size]])
+            ids.extend(batch.ids)
+            self.env.flush_all()
+            self.env.invalidate_all()
+        return self.browse(ids)
+
+    def _capture(self, kind):
+        """Stamp a weighing on the transaction and return the values it wrote.
+
+        ``kind`` is 'entrance' or 'exit' (the live scale weight) or
+        'stored_tare' (the vehicle's registered tare as entrance weight). The
+        row is locked first, so two clients capturing at once cannot both
+        move the state on from the same value. Returns an empty dict when the
+        scale has no weight yet.
+        """
+        self.ensure_one()
+        self.env.cr.execute("SELECT id FROM weighbridge_transaction WHERE id = %s FOR UPDATE", [self.id])
+        self.invalidate_recordset(['state'])
+        if kind == 'stored_tare':
+            if not self.stored_tare:
+                raise UserError(_("No valid stored tare for vehicle %s. Weigh it on entrance.", self.vehicle_no))
+            vals = {
+                'entrance_weight': self.stored_tare,
+                'entrance_date': fields.Datetime.now(),
+                'tare_source': 'stored',
+                'state': 'entrance',
+            }
+        else:
+            # Served from the process-local live weight store, no DB round trip
+            live = self.env['weight.latest'].get_capture_weight(self.scale_id)
+            if not live:
+                return {}
+            if kind == 'entrance':
+                vals = {
+                    'entrance_weight': live['weight'],
+                    'entrance_date': live['timestamp'],
+                    'tare_source': 'weighed',
+                    'state': 'entrance',
+                }
+            else:
+                vals = {
+                    'exit_weight': live['weight'],
+                    'exit_date': live['timestamp'],
+                    'state': 'exit' if self.state == 'entrance' else 'completed',
+                }
+        self.write(vals)
+        return vals
+
+    def capture_weight(self, kind):
+        """Capture a weighing and return the changed fields.
+
+        The capture form controller calls this instead of the Fetch / Use
+        Stored Tare button actions, whose window action makes the client
+        reload the view; it applies the returned values to the open record
+        instead. Returns ``{'values': ..., 'message': ...}`` with values in
+        ``web_read`` format, or ``values`` False when the scale has no
+        weight yet.
+        """
+        self.ensure_one()
+        vals = self._capture(kind)
+        if not vals:
+            return {'values': False, 'message': _("No weight data found")}
+        fnames = list(vals) + ['net_weight', 'stored_tare', 'stored_tare_date']
+        weight = vals.get('exit_weight', vals.get('entrance_weight'))
+        return {
+            'values': self.web_read({fname: {} for fname in fnames})[0],
+            'message': _("%(kind)s weight %(weight)s captured",
+                         kind=_("Exit") if kind == 'exit' else _("Entrance"), weight=weight),
+        }
+
+    def _reload_form(self, name, view_xmlid):
+        return {
+            'type': 'ir.actions.act_window',
+            'name': name,
+            'res_model': 'weighbridge.transaction',
+            'res_id': self.id,
+            'view_mode': 'form',
+            'view_id': self.env.ref(view_xmlid).id,
+            'target': 'current',
+        }
+
+    def action_fetch_entrance_weight(self):
+        """Fetch entrance weight from latest MQTT data"""
+        self._capture('entrance')
+        # Reload the form to show updated data (the capture form controller calls capture_weight instead)
+        return self._reload_form('Entrance Form', 'ocs_weight_master.view_weighbridge_transaction_entrance_form')
+
+    def action_use_stored_tare(self):
+        """Single-pass weighing: take the entrance weight from the vehicle's stored tare"""
+        self._capture('stored_tare')
+        return self._reload_form('Entrance Form', 'ocs_weight_master.view_weighbridge_transaction_entrance_form')
+
+    def action_fetch_exit_weight(self):
+        """Fetch exit weight from latest MQTT data"""
+        self._capture('exit')
+        return self._reload_form('Exit Form', 'ocs_weight_master.view_weighbridge_transaction_exit_form')
+
+    def action_print_entrance(self):
+        """Open entrance form report in new window for POS printing; several records print as one batch"""
+        report = self.env.ref('ocs_weight_master.action_report_weighbridge_transaction_entrance')
+        url = f'/report/html/{report.report_name}/{",".join(map(str, self.ids))}'
+        return {
+            'type': 'ir.actions.act_url',
+            'url': url,
+            'target': 'new',
+        }
+
+    def action_print_all_data(self):
+        """Open full transaction report in new window for POS printing; several records print as one batch"""
+        report = self.env.ref('ocs_weight_master.action_report_weighbridge_transaction')
+        url = f'/report/html/{report.report_name}/{",".join(map(str, self.ids))}'
+        return {
+            'type': 'ir.actions.act_url',
+            'url': url,
+            'target': 'new',
+        }
+
+    def _render_escpos(self, width=None):
+        """ESC/POS bytes of the vouchers in ``self``, one cut ticket per record.
+
+        Thermal printers print text mode in their own code page, so names in
+        Myanmar script come out as '?'; the HTML voucher remains the way to
+        print those.
+        """
+        if width is None:
+            width = self.env['ir.config_parameter'].sudo().get_param('ocs_weight_master.escpos_width')
+        company = self.env.company
+        data = bytearray()
+        for record in self:
+            ticket = escpos.EscPosTicket(width)
+            ticket.title(company.name or '', record.type_id.name or '')
+            ticket.rule()
+            ticket.line('Voucher No', record.voucher_no, bold=True)
+            ticket.line('Vehicle No', record.vehicle_no, bold=True)
+            if record.driver_name:
+                ticket.line('Driver', record.driver_name)
+            if record.partner_id or record.company_name:
+                ticket.line('Customer', record.partner_id.name or record.company_name)
+            if record.product_ids:
+                ticket.line('Products', ', '.join(record.product_ids.mapped('name')))
+            ticket.rule()
+            if record.entrance_date:
+                ticket.line('Entrance', fields.Datetime.context_timestamp(record, record.entrance_date).strftime('%Y-%m-%d %H:%M'))
+            ticket.line('Entrance Weight', f'{record.entrance_weight:,.0f} kg')
+            if record.exit_date:
+                ticket.line('Exit', fields.Datetime.context_timestamp(record, record.exit_date).strftime('%Y-%m-%d %H:%M'))
+                ticket.line('Exit Weight', f'{record.exit_weight:,.0f} kg')
+                ticket.rule('=')
+                ticket.big_line('Net Weight', f'{record.net_weight:,.0f} kg')
+            ticket.rule()
+            if record.remark1:
+                ticket.text(record.remark1)
+            ticket.cut()
+            data += bytes(ticket)
+        return bytes(data)
+
+    def action_print_escpos(self):
+        """Send the vouchers straight to the thermal printer set in ocs_weight_master.escpos_printer"""
+        address = self.env['ir.config_parameter'].sudo().get_param('ocs_weight_master.escpos_printer')
+        if not address:
+            raise UserError(_("Set the system parameter ocs_weight_master.escpos_printer to the printer's host[:port] first."))
+        try:
+            escpos.send(self._render_escpos(), address)
+        except OSError as e:
+            raise UserError(_("Could not reach the printer at %(address)s: %(error)s", address=address, error=e))
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'message': _("%s voucher(s) sent to the printer.", len(self)),
+                'type': 'success',
+                'sticky': False,
+            },
+        }
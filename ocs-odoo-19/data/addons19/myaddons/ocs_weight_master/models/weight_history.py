@@ -0,0 +1,150 @@
+import logging
+from datetime import timedelta
+
+from psycopg2.extras import execute_values
+
+from odoo import models, fields, api
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_RAW_DAYS = 7          # keep every frame this long
+DEFAULT_ROLLUP_DAYS = 365     # keep per-second rollups this long (0 = forever)
+DEFAULT_SERIES_POINTS = 1000  # buckets returned by get_series() when not specified
+
+
+class WeightHistory(models.Model):
+    _name = "weight.history"
+    _description = "Raw Weight Stream"
+    _order = "timestamp desc"
+    _log_access = False
+
+    scale_id = fields.Many2one('weighbridge.scale', string="Scale", required=True, ondelete='cascade')
+    timestamp = fields.Datetime(string="Timestamp", required=True, help="Indicator-side time of the reading")
+    weight = fields.Float(string="Weight", digits=(16, 3), required=True)
+
+    # Rows arrive in time order, so a BRIN index stays tiny and still prunes time windows
+    _timestamp_brin = models.Index("USING brin (timestamp)")
+
+    @api.model
+    def _append(self, rows, dedupe=False):
+        """Bulk insert (scale_id, timestamp, weight) tuples in one statement; returns the rows inserted.
+
+        With ``dedupe``, rows whose scale and timestamp are already stored
+        (or repeated in ``rows``) are skipped. The lookup covers only the
+        batch's time range, which the BRIN index narrows to a few blocks.
+        """
+        if dedupe and rows:
+            self.env.cr.execute("""
+                SELECT scale_id, timestamp FROM weight_history
+                 WHERE scale_id = ANY(%s) AND timestamp BETWEEN %s AND %s
+            """, (list({row[0] for row in rows}), min(row[1] for row in rows), max(row[1] for row in rows)))
+            seen = set(self.env.cr.fetchall())
+            unique = []
+            for row in rows:
+                if (row[0], row[1]) not in seen:
+                    seen.add((row[0], row[1]))
+                    unique.append(row)
+            rows = unique
+        if not rows:
+            return 0
+        execute_values(self.env.cr._obj, """
+            INSERT INTO weight_history (scale_id, timestamp, weight) VALUES %s
+        """, rows, page_size=len(rows))
+        return len(rows)
+
+    @api.model
+    def get_series(self, scale_id, start, end, points=DEFAULT_SERIES_POINTS):
+        """Downsample a scale's stream over [start, end) into at most ``points`` buckets.
+
+        Raw rows and per-second rollups are aggregated in SQL, so charting a
+        whole day returns ``points`` rows instead of every frame. Each bucket
+        is a dict with time (bucket start), min, max, avg and count.
+        """
+        start = fields.Datetime.to_datetime(start)
+        end = fields.Datetime.to_datetime(end)
+        step = max((end - start).total_seconds() / max(int(points), 1), 1.0)
+        self.env.cr.execute("""
+            WITH buckets AS (
+                SELECT floor(extract(epoch FROM timestamp - %(start)s) / %(step)s)::bigint AS idx,
+                       min(weight) AS weight_min, max(weight) AS weight_max,
+                       sum(weight) AS weight_sum, count(*) AS samples
+                  FROM weight_history
+                 WHERE scale_id = %(scale_id)s AND timestamp >= %(start)s AND timestamp < %(end)s
+              GROUP BY idx
+             UNION ALL
+                SELECT floor(extract(epoch FROM bucket - %(start)s) / %(step)s)::bigint AS idx,
+                       min(weight_min), max(weight_max),
+                       sum(weight_avg * samples), sum(samples)
+                  FROM weight_history_rollup
+                 WHERE scale_id = %(scale_id)s AND bucket >= %(start)s AND bucket < %(end)s
+              GROUP BY idx
+            )
+            SELECT idx, min(weight_min), max(weight_max), sum(weight_sum) / sum(samples), sum(samples)
+              FROM buckets
+          GROUP BY idx
+          ORDER BY idx
+        """, {'scale_id': scale_id, 'start': start, 'end': end, 'step': step})
+        return [{
+            'time': fields.Datetime.to_string(start + timedelta(seconds=idx * step)),
+            'min': weight_min,
+            'max': weight_max,
+            'avg': weight_avg,
+            'count': int(samples),
+        } for idx, weight_min, weight_max, weight_avg, samples in self.env.cr.fetchall()]
+
+    @api.model
+    def _cron_rollup(self):
+        """Roll raw frames older than the raw retention into per-second buckets.
+
+        Works one day at a time and commits after each, so a long backlog
+        does not hold one huge transaction.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        raw_days = int(ICP.get_param('ocs_weight_master.history_raw_days', DEFAULT_RAW_DAYS))
+        rollup_days = int(ICP.get_param('ocs_weight_master.history_rollup_days', DEFAULT_ROLLUP_DAYS))
+        cr = self.env.cr
+        cutoff = fields.Datetime.now() - timedelta(days=raw_days)
+        while True:
+            cr.execute("SELECT min(timestamp) FROM weight_history")
+            oldest = cr.fetchone()[0]
+            if not oldest or oldest >= cutoff:
+                break
+            chunk_end = min(oldest.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1), cutoff)
+            cr.execute("""
+                INSERT INTO weight_history_rollup AS r (scale_id, bucket, weight_min, weight_max, weight_avg, samples)
+                     SELECT scale_id, date_trunc('second', timestamp), min(weight), max(weight), avg(weight), count(*)
+                       FROM weight_history
+                      WHERE timestamp < %(end)s
+                   GROUP BY scale_id, date_trunc('second', timestamp)
+                ON CONFLICT (scale_id, bucket) DO UPDATE
+                        SET weight_min = LEAST(r.weight_min, EXCLUDED.weight_min),
+                            weight_max = GREATEST(r.weight_max, EXCLUDED.weight_max),
+                            weight_avg = (r.weight_avg * r.samples + EXCLUDED.weight_avg * EXCLUDED.samples)
+                                         / (r.samples + EXCLUDED.samples),
+                            samples = r.samples + EXCLUDED.samples
+            """, {'end': chunk_end})
+            buckets = cr.rowcount
+            cr.execute("DELETE FROM weight_history WHERE timestamp < %s", (chunk_end,))
+            _logger.info("Rolled up %s raw weight frame(s) before %s into %s bucket(s).", cr.rowcount, chunk_end, buckets)
+            cr.commit()
+        if rollup_days > 0:
+            cr.execute("DELETE FROM weight_history_rollup WHERE bucket < %s",
+                       (fields.Datetime.now() - timedelta(days=rollup_days),))
+            cr.commit()
+
+
+class WeightHistoryRollup(models.Model):
+    _name = "weight.history.rollup"
+    _description = "Per-second Weight Rollup"
+    _order = "bucket desc"
+    _log_access = False
+
+    scale_id = fields.Many2one('weighbridge.scale', string="Scale", required=True, ondelete='cascade')
+    bucket = fields.Datetime(string="Second", required=True)
+    weight_min = fields.Float(string="Min Weight", digits=(16, 3))
+    weight_max = fields.Float(string="Max Weight", digits=(16, 3))
+    weight_avg = fields.Float(string="Average Weight", digits=(16, 3))
+    samples = fields.Integer(string="Samples")
+
+    _scale_bucket_uniq = models.UniqueIndex("(scale_id, bucket)")
+    _bucket_brin = models.Index("USING brin (bucket)")
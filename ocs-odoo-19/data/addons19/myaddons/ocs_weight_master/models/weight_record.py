@@ -1,6 +1,11 @@
+from datetime import timedelta
+
 from odoo import models, fields, api
+from .archive import archive_older_than
 from .mqtt_service import MqttWeightService
 
+DEFAULT_ARCHIVE_DAYS = 30  # records older than this leave the default lists
+
 class WeightRecord(models.Model):
     _name = "weight.record"
     _description = "Incoming Weight from MQTT"
@@ -12,11 +17,29 @@ class WeightRecord(models.Model):
         ('manual', 'Manual')
     ], string="Source", default='mqtt', required=True)
     create_date = fields.Datetime(readonly=True)
+    active = fields.Boolean(string="Active", default=True,
+                            help="Records are archived after ocs_weight_master.record_archive_days")
+
+    # Match _order: hot window, hot MQTT records (get_latest_mqtt_record) and the archive
+    _active_order_idx = models.Index("(create_date DESC, id DESC) WHERE active")
+    _active_mqtt_order_idx = models.Index("(create_date DESC, id DESC) WHERE active AND source = 'mqtt'")
+    _order_idx = models.Index("(create_date DESC, id DESC)")
 
     @api.model
     def get_latest_mqtt_record(self):
-        """Returns the latest MQTT weight record"""
-        return self.search([('source', '=', 'mqtt')], limit=1, order='create_date desc, id desc')
+        """Returns the latest MQTT weight record, from the archive only when no recent one exists"""
+        domain = [('source', '=', 'mqtt')]
+        return (self.search(domain, limit=1, order='create_date desc, id desc')
+                or self.with_context(active_test=False).search(domain, limit=1, order='create_date desc, id desc'))
+
+    @api.model
+    def _cron_archive(self):
+        """Archive records created before ocs_weight_master.record_archive_days (0 = never)"""
+        days = int(self.env['ir.config_parameter'].sudo().get_param(
+            'ocs_weight_master.record_archive_days', DEFAULT_ARCHIVE_DAYS))
+        if days > 0:
+            archive_older_than(self.env.cr, self._table, fields.Datetime.now() - timedelta(days=days))
+            self.invalidate_model(['active'])
 
     def action_open_mqtt_form(self):
         """Action to open the latest MQTT record in form view"""
@@ -49,5 +72,5 @@ class WeightRecord(models.Model):
     @api.model
     def _register_hook(self):
         res = super()._register_hook()
-        MqttWeightService.start(self.env)
+        MqttWeightService.ensure_started(self.env)
         return res
@@ -0,0 +1,124 @@
+# XK3190-D10 continuous mode (tF 0) frame decoder.
+# Python port of the "XK3190-D10" function node in flows.json; kept free of
+# Odoo imports so it can be used and benchmarked standalone.
+#
+# Frame layout (12 bytes):
+#   0      STX 0x02
+#   1      sign '+' or '-'
+#   2..7   six ASCII digits
+#   8      decimal places, ASCII '0'..'4'
+#   9..10  XOR of bytes 1..8 as two ASCII hex nibbles
+#   11     ETX 0x03
+
+FRAME_LEN = 12
+STX = 0x02
+ETX = 0x03
+MAX_BUFFER = 4096  # bytes kept while hunting for a frame start; older noise is discarded
+
+
+def _nibble(b):
+    if 0x30 <= b <= 0x39:
+        return b - 0x30
+    if 0x41 <= b <= 0x46:
+        return b - 0x37
+    return None
+
+
+def decode_frame(data, offset=0):
+    """Decode the 12-byte frame starting at ``offset`` of a bytes-like buffer.
+
+    Returns ``(weight, raw)`` where ``raw`` is the signed digit string with
+    the decimal point inserted, or raises ValueError naming the failed check.
+    Reads ``data`` through memoryview slices; the frame is never copied.
+    """
+    view = data if isinstance(data, memoryview) else memoryview(data)
+    if len(view) - offset < FRAME_LEN:
+        raise ValueError("length")
+    if view[offset] != STX or view[offset + 11] != ETX:
+        raise ValueError("stx/etx")
+    # XOR of bytes 1..8: fold them as one 64-bit integer instead of a byte loop
+    xor = int.from_bytes(view[offset + 1:offset + 9], "little")
+    xor ^= xor >> 32
+    xor ^= xor >> 16
+    xor ^= xor >> 8
+    hi, lo = _nibble(view[offset + 9]), _nibble(view[offset + 10])
+    if hi is None or lo is None or ((hi << 4) | lo) != (xor & 0xFF):
+        raise ValueError("xor")
+    try:
+        digits = str(view[offset + 2:offset + 8], "ascii")
+    except UnicodeDecodeError:
+        raise ValueError("digit") from None
+    if not digits.isdigit():
+        raise ValueError("digit")
+
+    dp = view[offset + 8] - 0x30
+    if dp < 0 or dp > 4:
+        dp = 0
+    value = int(digits)
+    if dp:
+        digits = digits[:-dp] + "." + digits[-dp:]
+    weight = value / (10 ** dp) if dp else float(value)
+    if view[offset + 1] == 0x2D:  # '-'
+        weight = -weight
+        digits = "-" + digits
+    return weight, digits
+
+
+class Xk3190Decoder:
+    """Incremental decoder over a byte stream that may split or corrupt frames.
+
+    ``feed()`` appends the new chunk (bytes or a memoryview over a read
+    buffer) to an internal bytearray, decodes every complete frame in place
+    by offset (no per-frame copies) and trims the consumed prefix once per
+    call. On a bad STX/ETX or checksum it resyncs on the next STX byte.
+    """
+
+    __slots__ = ("_buf", "frames", "resyncs", "errors")
+
+    def __init__(self):
+        self._buf = bytearray()
+        self.frames = 0     # frames decoded
+        self.resyncs = 0    # times the stream was realigned on a later STX
+        self.errors = 0     # aligned frames rejected by a digit or XOR check
+
+    def feed(self, data):
+        """Consume ``data`` and return a list of ``(weight, raw, hex)`` tuples."""
+        buf = self._buf
+        buf += data
+        out = []
+        pos = 0
+        end = len(buf)
+        view = memoryview(buf)
+        try:
+            while True:
+                start = buf.find(STX, pos)
+                if start < 0:
+                    pos = end
+                    break
+                if start != pos:
+                    self.resyncs += 1
+                if end - start < FRAME_LEN:
+                    pos = start
+                    break
+                if buf[start + 11] != ETX:
+                    # Not a frame boundary after all: look for the next STX
+                    pos = start + 1
+                    continue
+                try:
+                    weight, raw = decode_frame(view, start)
+                except ValueError:
+                    self.errors += 1
+                    pos = start + 1
+                    continue
+                out.append((weight, raw, view[start:start + FRAME_LEN].hex()))
+                self.frames += 1
+                pos = start + FRAME_LEN
+        finally:
+            # Slices above were temporaries, so this drops the last export
+            # and the buffer can be trimmed below
+            view.release()
+        if pos:
+            del buf[:pos]
+        if len(buf) > MAX_BUFFER:
+            del buf[:-FRAME_LEN]
+        return out
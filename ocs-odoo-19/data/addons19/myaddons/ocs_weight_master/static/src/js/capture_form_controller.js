@@ -0,0 +1,63 @@
+/** @odoo-module **/
+
+import { FormController } from "@web/views/form/form_controller";
+import { formView } from "@web/views/form/form_view";
+import { registry } from "@web/core/registry";
+import { useService } from "@web/core/utils/hooks";
+import { deserializeDateTime } from "@web/core/l10n/dates";
+
+// Button method -> capture kind of weighbridge.transaction.capture_weight
+const CAPTURE_BUTTONS = {
+    action_fetch_entrance_weight: "entrance",
+    action_fetch_exit_weight: "exit",
+    action_use_stored_tare: "stored_tare",
+};
+
+export class CaptureFormController extends FormController {
+    setup() {
+        super.setup();
+        this.orm = useService("orm");
+        this.notification = useService("notification");
+    }
+
+    async beforeExecuteActionButton(clickParams) {
+        const kind = clickParams.type === "object" && CAPTURE_BUTTONS[clickParams.name];
+        if (!kind) {
+            return super.beforeExecuteActionButton(...arguments);
+        }
+        // One small RPC instead of running the button's window action, which
+        // reloads the view and restarts the action
+        const record = this.model.root;
+        if (!(await record.save())) {
+            return false;
+        }
+        const { values, message } = await this.orm.call(
+            "weighbridge.transaction",
+            "capture_weight",
+            [[record.resId], kind]
+        );
+        if (values) {
+            // The capture is already saved server side: apply the returned
+            // fields this view shows, then save without reloading so the
+            // record is clean again without re-reading every field
+            const changes = {};
+            for (const [fname, value] of Object.entries(values)) {
+                if (fname !== "id" && fname in record.activeFields) {
+                    const isDate = value && record.fields[fname].type === "datetime";
+                    changes[fname] = isDate ? deserializeDateTime(value) : value;
+                }
+            }
+            await record.update(changes);
+            await record.save({ reload: false });
+            this.notification.add(message, { type: "success" });
+        } else {
+            this.notification.add(message, { type: "warning" });
+        }
+        return false;
+    }
+}
+
+registry.category("views").add("weighbridge_capture_form", {
+    ...formView,
+    Controller: CaptureFormController,
+});